@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth import get_user_model
-from .models import Warehouse, Product, Stock
+from .models import Warehouse, Product, Stock, StockStripe, StockMovement, StockSnapshot, IdempotencyKey, Reservation, Tombstone
+from .reservations import release_reservation
+from .services import StockMutationError
 
 User = get_user_model()
 
@@ -23,7 +25,52 @@ class UserAdmin(BaseUserAdmin):
     search_fields = ('username', 'email', 'first_name', 'last_name')
     ordering = ('username',)
 
+class StockAdmin(admin.ModelAdmin):
+    """
+    Количества меняются только через api.services, которые пишут каждое
+    изменение в журнал движений (api/ledger.py). Удаление разрешено: остаток
+    закрывается движением в журнале (api/signals.py).
+    """
+    list_display = ('id', 'warehouse', 'product', 'quantity', 'reserved', 'stripe_count')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+class ReadOnlyAdmin(StockAdmin):
+    """Полосы и движения журнала только просматриваются."""
+    list_display = ('__str__',)
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+class ReservationAdmin(StockAdmin):
+    """
+    Резервы только просматриваются и отменяются: отмена идёт через
+    release_reservation и возвращает количество в Stock.reserved.
+    """
+    list_display = ('id', 'user', 'stock', 'quantity', 'expires_at')
+
+    def delete_model(self, request, obj):
+        try:
+            release_reservation(obj.pk, obj.user_id)
+        except StockMutationError:
+            # Резерв уже подтверждён или снят параллельно
+            pass
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            self.delete_model(request, obj)
+
 admin.site.register(User, UserAdmin)
 admin.site.register(Warehouse)
 admin.site.register(Product)
-admin.site.register(Stock)
+admin.site.register(Stock, StockAdmin)
+admin.site.register(StockStripe, ReadOnlyAdmin)
+admin.site.register(StockMovement, ReadOnlyAdmin)
+admin.site.register(StockSnapshot)
+admin.site.register(IdempotencyKey)
+admin.site.register(Reservation, ReservationAdmin)
+admin.site.register(Tombstone)
@@ -0,0 +1,194 @@
+# api/async_views.py
+"""
+Асинхронные (ASGI) представления для чтения и изменения остатков.
+
+DRF 3.15 выполняет представления синхронно, и под ASGI-сервером каждый
+запрос уходит в пул потоков. Эти представления написаны на async def и
+обращаются к базе через асинхронный ORM (aget, aupdate, async for), а к
+кэшам — через их асинхронные методы, поэтому число одновременных запросов
+ограничено соединениями, а не размером пула потоков. Ответы совпадают по
+формату с синхронными эндпоинтами.
+"""
+import asyncio
+import functools
+import json
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed, MethodNotAllowed
+from .authentication import aauthenticate, CachedTokenAuthentication
+from .cache import astock_detail_context
+from .changefeed import broker, catch_up, format_event, options, RESET_EVENT
+from .models import Stock, Warehouse
+from .serializers import StockSerializer, STOCK_VALUES, stock_rows
+from .services import asupply_stock, aconsume_stock, StockMutationError, FORBIDDEN
+
+NOT_AUTHENTICATED = 'Вы не аутентифицированы. Пожалуйста, войдите в систему.'
+
+
+def _json(data, status=200, **kwargs):
+    return JsonResponse(data, status=status, safe=False, json_dumps_params={'ensure_ascii': False}, **kwargs)
+
+
+def async_api_view(methods, user_type=None):
+    """
+    Декоратор асинхронного эндпоинта: метод, токен, тип пользователя, JSON.
+
+    Разобранное тело запроса передаётся в request.data, как в DRF.
+    """
+    def decorator(view):
+        @csrf_exempt
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return _json({"detail": MethodNotAllowed(request.method).detail}, status=405)
+            try:
+                credentials = await aauthenticate(request)
+            except AuthenticationFailed as exc:
+                credentials, failure = None, exc.detail
+            else:
+                failure = NOT_AUTHENTICATED
+            if credentials is None:
+                return _json({"detail": failure}, status=401,
+                             headers={'WWW-Authenticate': CachedTokenAuthentication.keyword})
+            request.user, request.auth = credentials
+            if user_type is not None and request.user.user_type != user_type:
+                return _json({"detail": FORBIDDEN}, status=403)
+            request.data = {}
+            if request.method in ('POST', 'PUT', 'PATCH') and request.body:
+                try:
+                    request.data = json.loads(request.body)
+                except ValueError as exc:
+                    return _json({"detail": f"JSON parse error - {exc}"}, status=400)
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async def _serialize(request, stocks, many=False):
+    fields = StockSerializer.requested_fields(request)
+    context = {'request': request, **await astock_detail_context(stocks if many else [stocks], fields)}
+    return StockSerializer(stocks, many=many, context=context).data
+
+
+@async_api_view(['GET'])
+async def stock_list(request):
+    """
+    Список остатков с keyset-пагинацией: ?after=<id>&page_size=<n>.
+
+    Видимость та же, что у StockListView; ссылка next содержит id последней
+    строки страницы.
+    """
+    default_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 100)
+    max_size = getattr(settings, 'API_MAX_PAGE_SIZE', 1000)
+    try:
+        page_size = min(max(int(request.GET.get('page_size', default_size)), 1), max_size)
+        after = int(request.GET.get('after', 0))
+    except ValueError:
+        return _json({"error": "Параметры after и page_size должны быть целыми числами."}, status=400)
+
+    queryset = Stock.objects.visible_to(request.user).with_total_quantity().filter(id__gt=after).order_by('id')
+    rows = [row async for row in queryset.values(*STOCK_VALUES)[:page_size + 1]]
+    next_url = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        params = request.GET.copy()
+        params['after'] = rows[-1]['id']
+        next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+    fields = StockSerializer.requested_fields(request)
+    results = stock_rows(rows, {'request': request, **await astock_detail_context(rows, fields)})
+    return _json({"next": next_url, "previous": None, "results": results})
+
+
+@async_api_view(['GET'])
+async def stock_detail(request, pk):
+    try:
+        stock = await Stock.objects.with_total_quantity().aget(pk=pk)
+    except Stock.DoesNotExist:
+        return _json({"detail": "No Stock matches the given query."}, status=404)
+    return _json(await _serialize(request, stock))
+
+
+@async_api_view(['POST'], user_type='supplier')
+async def supply(request):
+    data = request.data
+    try:
+        stock = await asupply_stock(data.get('warehouse'), data.get('product'), data.get('quantity', 0),
+                                    owner=request.user)
+    except StockMutationError as exc:
+        return _json({"error": str(exc)}, status=400)
+    return _json(await _serialize(request, stock))
+
+
+@async_api_view(['PUT'], user_type='consumer')
+async def consume(request):
+    data = request.data
+    try:
+        stock = await aconsume_stock(data.get('warehouse'), data.get('product'), data.get('quantity', 0))
+    except StockMutationError as exc:
+        return _json({"error": str(exc)}, status=400)
+    return _json(await _serialize(request, stock))
+
+
+def _ids(value):
+    return None if value is None else {int(part) for part in value.split(',') if part.strip()}
+
+
+@async_api_view(['GET'])
+async def stock_changes(request):
+    """
+    Лента изменений остатков в формате Server-Sent Events (api/changefeed.py).
+
+    ?warehouse=1,2 и ?product=3 ограничивают ленту; поставщик получает
+    изменения только своих складов. С заголовком Last-Event-ID (или
+    ?last_event_id=) сначала отправляются изменения после этого номера.
+    Соединение закрывается через STOCK_CHANGEFEED['MAX_DURATION'] секунд,
+    клиент переподключается с последним номером.
+    """
+    try:
+        warehouses, products = _ids(request.GET.get('warehouse')), _ids(request.GET.get('product'))
+        last = request.headers.get('Last-Event-ID', request.GET.get('last_event_id'))
+        last = None if last in (None, '') else int(last)
+    except ValueError:
+        return _json({"error": "Параметры warehouse, product и last_event_id должны быть целыми числами."},
+                     status=400)
+    if request.user.user_type == 'supplier':
+        owned = {pk async for pk in Warehouse.objects.filter(owner=request.user).values_list('id', flat=True)}
+        warehouses = owned if warehouses is None else warehouses & owned
+
+    # Подписка раньше чтения журнала: изменение между ними придёт дважды,
+    # но не потеряется
+    subscription = broker.subscribe(warehouses, products)
+    try:
+        missed = [] if last is None else await catch_up(last, warehouses, products)
+    except BaseException:
+        broker.unsubscribe(subscription)
+        raise
+    feed = options()
+
+    async def stream():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + feed['MAX_DURATION']
+        try:
+            if missed is None:
+                yield RESET_EVENT
+                return
+            for event in missed:
+                yield format_event(event)
+            while (remaining := deadline - loop.time()) > 0:
+                events, overflowed = await subscription.get(min(feed['HEARTBEAT'], remaining))
+                if overflowed:
+                    yield RESET_EVENT
+                    return
+                if not events:
+                    yield ": keepalive\n\n"
+                for event in events:
+                    yield format_event(event)
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Отключает буферизацию ответа в nginx
+    response['X-Accel-Buffering'] = 'no'
+    return response
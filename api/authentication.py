@@ -0,0 +1,219 @@
+# api/authentication.py
+"""
+Аутентификация по токену с кэшированием.
+
+CachedTokenAuthentication разрешает токен в пользователя один раз и затем
+отвечает из кэша до истечения TTL. Записи удаляются сигналами при удалении
+токена и при изменении пользователя (api/signals.py), поэтому отозванный
+токен или деактивированный пользователь перестают проходить сразу в этом
+процессе; в остальных процессах — не позднее чем через TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+# Поля пользователя, которые DjangoTokenCache хранит в общем кэше
+USER_FIELDS = ('id', 'username', 'user_type', 'is_active')
+
+DEFAULTS = {
+    'BACKEND': 'local',
+    'TTL': 60,
+    'MAXSIZE': 10000,
+    'CACHE_ALIAS': 'default',
+}
+
+
+class LocalTokenCache:
+    """LRU-кэш в памяти процесса с ограничением размера и временем жизни записи."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    # Операции в памяти не блокируют цикл событий
+    async def aget(self, key):
+        return self.get(key)
+
+    async def aset(self, key, value):
+        self.set(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DjangoTokenCache:
+    """
+    Кэш токенов поверх кэш-фреймворка Django, общий для всех процессов.
+
+    В общий кэш попадают только поля пользователя, которые читают
+    аутентификация и проверки прав (USER_FIELDS), — без хэша пароля и
+    остальных данных; пользователь и токен собираются из них при чтении.
+    """
+
+    prefix = 'api:token:'
+
+    def __init__(self, alias, ttl):
+        self.cache = caches[alias]
+        self.ttl = ttl
+
+    @staticmethod
+    def _dump(value):
+        user, _ = value
+        return {name: getattr(user, name) for name in USER_FIELDS}
+
+    @staticmethod
+    def _load(key, fields):
+        if fields is None:
+            return None
+        user = get_user_model()(**fields)
+        return user, Token(key=key, user=user)
+
+    def get(self, key):
+        return self._load(key, self.cache.get(self.prefix + key))
+
+    def set(self, key, value):
+        self.cache.set(self.prefix + key, self._dump(value), self.ttl)
+
+    def delete(self, key):
+        self.cache.delete(self.prefix + key)
+
+    async def aget(self, key):
+        return self._load(key, await self.cache.aget(self.prefix + key))
+
+    async def aset(self, key, value):
+        await self.cache.aset(self.prefix + key, self._dump(value), self.ttl)
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    global _token_cache
+    if _token_cache is None:
+        with _token_cache_lock:
+            if _token_cache is None:
+                options = {**DEFAULTS, **getattr(settings, 'API_TOKEN_CACHE', {})}
+                if options['BACKEND'] == 'django':
+                    _token_cache = DjangoTokenCache(options['CACHE_ALIAS'], options['TTL'])
+                else:
+                    _token_cache = LocalTokenCache(options['MAXSIZE'], options['TTL'])
+    return _token_cache
+
+
+def reset_token_cache():
+    """Сбрасывает кэш токенов; используется в тестах и при смене настроек."""
+    global _token_cache
+    with _token_cache_lock:
+        _token_cache = None
+
+
+def issue_token(user):
+    """
+    Возвращает ключ токена пользователя, создавая токен при необходимости.
+
+    Повторный вход — один SELECT без записи. Промах вставляет токен через
+    INSERT ... ON CONFLICT DO NOTHING RETURNING key; если параллельный вход
+    успел создать токен раньше, RETURNING пуст и ключ читается повторно.
+    """
+    tokens = Token.objects.filter(user_id=user.pk).values_list('key', flat=True)
+    key = tokens.first()
+    if key is not None:
+        return key
+    table = connection.ops.quote_name(Token._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (key, user_id, created) VALUES (%s, %s, %s) "
+            f"ON CONFLICT (user_id) DO NOTHING RETURNING key",
+            [Token.generate_key(), user.pk, timezone.now()],
+        )
+        row = cursor.fetchone()
+    return row[0] if row else tokens.first()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication с кэшем токен → (пользователь, токен).
+
+    Промах кэша выполняет тот же запрос Token+User, что и базовый класс;
+    попадание обходится без обращения к базе. Поля пользователя, которые
+    читают IsSupplier/IsConsumer (user_type, is_authenticated), берутся из
+    закэшированного объекта.
+    """
+
+    def authenticate_credentials(self, key):
+        token_cache = get_token_cache()
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, (user, token))
+        return user, token
+
+
+async def aauthenticate(request):
+    """
+    Асинхронная аутентификация по заголовку "Authorization: Token <key>".
+
+    Повторяет разбор заголовка TokenAuthentication и использует тот же кэш;
+    промах читает токен с пользователем через Token.objects.aget. Возвращает
+    (user, token) или None, если заголовка нет; при неверном токене
+    выбрасывает AuthenticationFailed.
+    """
+    auth = get_authorization_header(request).split()
+    if not auth or auth[0].lower() != CachedTokenAuthentication.keyword.lower().encode():
+        return None
+    if len(auth) != 2:
+        raise AuthenticationFailed(_('Invalid token header. No credentials provided.'))
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        raise AuthenticationFailed(_('Invalid token header. Token string should not contain invalid characters.'))
+
+    token_cache = get_token_cache()
+    cached = await token_cache.aget(key)
+    if cached is not None:
+        return cached
+    try:
+        token = await Token.objects.select_related('user').aget(key=key)
+    except Token.DoesNotExist:
+        raise AuthenticationFailed(_('Invalid token.'))
+    if not token.user.is_active:
+        raise AuthenticationFailed(_('User inactive or deleted.'))
+    await token_cache.aset(key, (token.user, token))
+    return token.user, token
@@ -0,0 +1,130 @@
+# api/availability.py
+"""
+Кэш доступного количества по паре (склад, товар).
+
+Значение — доступное количество: сумма остатка с учётом полос минус
+резерв Stock.reserved (0, если остатка нет). Промах читается из базы одним запросом на набор ключей. Изменения
+остатков прибавляются к закэшированным значениям через cache.incr после
+фиксации транзакции: record_movements (api/ledger.py) вызывается на каждом
+пути изменения, а сложение приращений не зависит от порядка, поэтому
+параллельные записи не оставляют в кэше устаревшее значение, а откат
+транзакции кэш не меняет. Резервы меняют значение тем же способом
+(api/reservations.py). Сохранение и удаление Stock, в том числе
+каскадное при удалении склада или товара и исправление командой
+rebuild_stock_balances --apply, удаляет ключ (api/signals.py).
+
+Промах не должен записать значение, прочитанное до фиксации параллельной
+записи, если её incr уже не застал ключ: такое значение жило бы весь TTL.
+Поэтому у каждой пары есть счётчик версий, который запись увеличивает после
+фиксации до изменения значения. Читатель запоминает версию до SELECT,
+записывает значение и перечитывает версию; если она изменилась или
+вытеснена, значение удаляется, и следующее чтение загрузит его заново.
+
+Кэш должен быть общим для всех процессов (CACHE_BACKEND, см. README): incr
+выполняется только в процессе, зафиксировавшем запись.
+
+Значение кэша — подсказка перед списанием: само списание проверяет
+остаток в базе.
+"""
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .models import Stock
+
+
+def _timeout():
+    return getattr(settings, 'STOCK_AVAILABILITY_CACHE_TIMEOUT', 300)
+
+
+def _key(warehouse_id, product_id):
+    return f'api:availability:{warehouse_id}:{product_id}'
+
+
+def _version_key(warehouse_id, product_id):
+    return f'api:availability:version:{warehouse_id}:{product_id}'
+
+
+def _versions(pairs):
+    """{пара: версия}; отсутствующие счётчики создаются с нулём."""
+    keys = {_version_key(w, p): (w, p) for w, p in pairs}
+    versions = {keys[key]: version for key, version in cache.get_many(keys).items()}
+    for key, pair in keys.items():
+        if pair not in versions:
+            cache.add(key, 0, _timeout())
+            versions[pair] = cache.get(key)
+    return versions
+
+
+def _bump(pairs):
+    for w, p in pairs:
+        try:
+            cache.incr(_version_key(w, p))
+        except ValueError:
+            # Счётчик вытеснен: читатель, запомнивший версию, увидит его отсутствие
+            pass
+
+
+def get_many(pairs):
+    """{(warehouse_id, product_id): доступное количество}; промахи читаются одним запросом."""
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+    keys = {_key(w, p): (w, p) for w, p in pairs}
+    found = {keys[key]: quantity for key, quantity in cache.get_many(keys).items()}
+    missing = pairs - found.keys()
+    if missing:
+        versions = _versions(missing)
+        loaded = dict.fromkeys(missing, 0)
+        rows = (
+            Stock.objects.filter(
+                warehouse_id__in={w for w, _ in missing}, product_id__in={p for _, p in missing}
+            )
+            .with_total_quantity()
+            .values_list('warehouse_id', 'product_id', 'total_quantity', 'reserved')
+        )
+        for w, p, quantity, reserved in rows:
+            if (w, p) in loaded:
+                loaded[w, p] = quantity - reserved
+        cache.set_many({_key(w, p): quantity for (w, p), quantity in loaded.items()}, _timeout())
+        # Запись, зафиксированная после SELECT, увеличила версию до своего incr
+        current = cache.get_many([_version_key(w, p) for w, p in missing])
+        stale = [
+            _key(w, p) for w, p in missing
+            if versions[w, p] is None or current.get(_version_key(w, p)) != versions[w, p]
+        ]
+        if stale:
+            cache.delete_many(stale)
+        found.update(loaded)
+    return found
+
+
+def _apply(deltas):
+    _bump(deltas)
+    for (w, p), delta in deltas.items():
+        try:
+            cache.incr(_key(w, p), delta)
+        except ValueError:
+            # Ключа нет в кэше: следующее чтение загрузит значение из базы
+            pass
+
+
+def apply_movements(rows):
+    """Прибавляет движения [(warehouse_id, product_id, delta), ...] к кэшу после фиксации."""
+    deltas = defaultdict(int)
+    for w, p, delta in rows:
+        deltas[w, p] += delta
+    transaction.on_commit(lambda: _apply({key: delta for key, delta in deltas.items() if delta}))
+
+
+def invalidate(warehouse_id, product_id):
+    """Удаляет ключ сразу и после фиксации, чтобы не осталось значения, прочитанного до неё."""
+    key = _key(warehouse_id, product_id)
+    cache.delete(key)
+
+    def evict():
+        _bump([(warehouse_id, product_id)])
+        cache.delete(key)
+
+    transaction.on_commit(evict)
+
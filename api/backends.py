@@ -0,0 +1,37 @@
+# api/backends.py
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password, verify_password
+from .hashers import get_hashing_pool
+
+UserModel = get_user_model()
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend, который проверяет пароль в пуле хэширования (api/hashers.py).
+
+    Пользователь читается и сохраняется в потоке запроса, в пул передаётся
+    только вычисление хэша. Хэш устаревшего алгоритма или с прежними
+    параметрами пересчитывается и сохраняется одним UPDATE поля password.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        pool = get_hashing_pool()
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Как и ModelBackend, выравнивает время ответа для несуществующего пользователя
+            pool.run(make_password, password)
+            return None
+        is_correct, must_update = pool.run(verify_password, password, user.password)
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+        if must_update:
+            user.password = pool.run(make_password, password)
+            user.save(update_fields=['password'])
+        return user
@@ -0,0 +1,159 @@
+# api/cache.py
+"""
+Read-through кэш справочников: товаров и складов.
+
+Записи хранятся в кэше Django под ключом с номером версии модели. Любое
+сохранение или удаление объекта увеличивает версию (api/signals.py), после
+чего старые записи больше не читаются и вытесняются по таймауту. Версия
+увеличивается сразу и ещё раз после фиксации транзакции: читатель,
+загрузивший объект до фиксации, мог записать его под промежуточной
+версией, но не под актуальной.
+"""
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from .models import Warehouse, Product
+from .serializers import WarehouseSerializer, ProductSerializer
+
+
+def make_etag(*parts):
+    payload = json.dumps(parts, cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':'))
+    return quote_etag(hashlib.md5(payload.encode()).hexdigest())
+
+
+def not_modified(request, etag):
+    """Возвращает 304, если If-None-Match клиента совпадает с etag, иначе None."""
+    return get_conditional_response(getattr(request, '_request', request), etag=etag)
+
+
+class ModelCache:
+    """
+    Кэш сериализованных объектов модели по первичному ключу.
+
+    Запись — словарь с полями data (представление сериализатора), etag и
+    owner_id (для складов), чтобы отвечать на GET без обращения к базе.
+    """
+
+    def __init__(self, name, serializer_class, queryset):
+        self.name = name
+        self.serializer_class = serializer_class
+        self.queryset = queryset
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'API_CATALOG_CACHE_TIMEOUT', 300)
+
+    def _version_key(self):
+        return f'api:{self.name}:version'
+
+    def _key(self, version, pk):
+        return f'api:{self.name}:{version}:{pk}'
+
+    def version(self):
+        version = cache.get(self._version_key())
+        if version is None:
+            cache.add(self._version_key(), 1, timeout=None)
+            version = cache.get(self._version_key(), 1)
+        return version
+
+    async def aversion(self):
+        version = await cache.aget(self._version_key())
+        if version is None:
+            await cache.aadd(self._version_key(), 1, timeout=None)
+            version = await cache.aget(self._version_key(), 1)
+        return version
+
+    def bump(self):
+        """Увеличивает версию сейчас и после фиксации текущей транзакции."""
+        self._incr()
+        transaction.on_commit(self._incr)
+
+    def _incr(self):
+        try:
+            cache.incr(self._version_key())
+        except ValueError:
+            cache.set(self._version_key(), 1, timeout=None)
+
+    def _entry(self, instance):
+        data = dict(self.serializer_class(instance).data)
+        return {'data': data, 'etag': make_etag(data), 'owner_id': getattr(instance, 'owner_id', None)}
+
+    def get(self, pk):
+        return self.get_many([pk]).get(pk)
+
+    def get_many(self, pks):
+        """Возвращает {pk: запись} для существующих объектов; промахи читаются одним запросом id__in."""
+        pks = set(pks)
+        if not pks:
+            return {}
+        version = self.version()
+        keys = {self._key(version, pk): pk for pk in pks}
+        found = {keys[key]: entry for key, entry in cache.get_many(keys).items()}
+        missing = pks - found.keys()
+        if missing:
+            loaded = {obj.pk: self._entry(obj) for obj in self.queryset().filter(pk__in=missing)}
+            cache.set_many({self._key(version, pk): entry for pk, entry in loaded.items()}, self.timeout)
+            found.update(loaded)
+        return found
+
+    async def aget_many(self, pks):
+        """Асинхронный вариант get_many на асинхронном кэше и ORM."""
+        pks = set(pks)
+        if not pks:
+            return {}
+        version = await self.aversion()
+        keys = {self._key(version, pk): pk for pk in pks}
+        found = {keys[key]: entry for key, entry in (await cache.aget_many(keys)).items()}
+        missing = pks - found.keys()
+        if missing:
+            loaded = {obj.pk: self._entry(obj) async for obj in self.queryset().filter(pk__in=missing)}
+            await cache.aset_many({self._key(version, pk): entry for pk, entry in loaded.items()}, self.timeout)
+            found.update(loaded)
+        return found
+
+    def list_etag(self, request, *parts):
+        """ETag списка: меняется при любом изменении модели или параметров запроса."""
+        return make_etag(self.name, self.version(), request.get_full_path(), *parts)
+
+
+product_cache = ModelCache('product', ProductSerializer, lambda: Product.objects.all())
+warehouse_cache = ModelCache('warehouse', WarehouseSerializer, lambda: Warehouse.objects.with_owner())
+
+
+def _stock_ids(stocks, name):
+    # Остатки — модели Stock или строки values() (api.serializers.stock_rows)
+    return (stock[name] if isinstance(stock, dict) else getattr(stock, name) for stock in stocks)
+
+
+def stock_detail_context(stocks, fields=None):
+    """
+    Контекст StockSerializer с представлениями складов и товаров из кэша.
+
+    fields — запрошенные через ?fields= поля; вложенные блоки, которые не
+    запрошены, не загружаются.
+    """
+    context = {}
+    if not fields or 'product_detail' in fields:
+        entries = product_cache.get_many(_stock_ids(stocks, 'product_id'))
+        context['product_details'] = {pk: entry['data'] for pk, entry in entries.items()}
+    if not fields or 'warehouse_detail' in fields:
+        entries = warehouse_cache.get_many(_stock_ids(stocks, 'warehouse_id'))
+        context['warehouse_details'] = {pk: entry['data'] for pk, entry in entries.items()}
+    return context
+
+
+async def astock_detail_context(stocks, fields=None):
+    """Асинхронный вариант stock_detail_context."""
+    context = {}
+    if not fields or 'product_detail' in fields:
+        entries = await product_cache.aget_many(_stock_ids(stocks, 'product_id'))
+        context['product_details'] = {pk: entry['data'] for pk, entry in entries.items()}
+    if not fields or 'warehouse_detail' in fields:
+        entries = await warehouse_cache.aget_many(_stock_ids(stocks, 'warehouse_id'))
+        context['warehouse_details'] = {pk: entry['data'] for pk, entry in entries.items()}
+    return context
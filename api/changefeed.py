@@ -0,0 +1,208 @@
+# api/changefeed.py
+"""
+Лента изменений остатков для /api/stocks/stream/ (Server-Sent Events).
+
+Номер события — id последней записи журнала (StockMovement) пары
+(склад, товар), поэтому номера монотонны и общие для всех процессов.
+record_movements (api/ledger.py) после фиксации транзакции передаёт
+изменённые пары брокеру процесса, если у него есть подписчики; брокер
+читает текущие количества одним запросом и раскладывает события по
+буферам подписчиков. Ошибка рассылки записывается в журнал и не доходит
+до записи: транзакция уже зафиксирована, а подписчики догонят пропущенное
+по журналу при переподключении.
+
+Буфер подписчика ограничен STOCK_CHANGEFEED['BUFFER'] событиями: запись
+в него не ждёт клиента, а при переполнении подписчик получает событие
+reset и отключается. Клиент переподключается с Last-Event-ID и получает
+пропущенные изменения из журнала (catch_up), пока они не удалены
+командой snapshot_stock_ledger --prune.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import deque
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from .models import Stock, StockMovement
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BUFFER': 1000,
+    'HEARTBEAT': 15,
+    'MAX_DURATION': 300,
+    'CATCHUP_LIMIT': 10000,
+}
+
+
+def options():
+    return {**DEFAULTS, **getattr(settings, 'STOCK_CHANGEFEED', {})}
+
+
+def _stocks(latest):
+    """Запрос текущих количеств пар {(warehouse_id, product_id): seq}."""
+    return (
+        Stock.objects.filter(
+            warehouse_id__in={w for w, _ in latest}, product_id__in={p for _, p in latest}
+        )
+        .with_total_quantity()
+        .values_list('id', 'warehouse_id', 'product_id', 'total_quantity', 'reserved')
+    )
+
+
+def _events(latest, rows):
+    events = [
+        {'seq': latest[w, p], 'id': pk, 'warehouse': w, 'product': p,
+         'quantity': quantity, 'available': quantity - reserved}
+        for pk, w, p, quantity, reserved in rows
+        if (w, p) in latest
+    ]
+    return sorted(events, key=lambda event: event['seq'])
+
+
+class Subscription:
+    """Подписка одного клиента: фильтры и ограниченный буфер событий."""
+
+    def __init__(self, loop, buffer, warehouses=None, products=None):
+        self.warehouses, self.products = warehouses, products
+        self.overflowed = False
+        self._loop = loop
+        self._buffer = deque()
+        self._size = buffer
+        self._lock = threading.Lock()
+        self._ready = asyncio.Event()
+        self._wake_pending = False
+
+    def matches(self, warehouse_id, product_id):
+        return ((self.warehouses is None or warehouse_id in self.warehouses)
+                and (self.products is None or product_id in self.products))
+
+    def offer(self, event):
+        """Вызывается из потока записи; никогда не ждёт клиента."""
+        with self._lock:
+            if self.overflowed:
+                return
+            if len(self._buffer) >= self._size:
+                self.overflowed = True
+            else:
+                self._buffer.append(event)
+            wake, self._wake_pending = not self._wake_pending, True
+        if wake:
+            try:
+                self._loop.call_soon_threadsafe(self._ready.set)
+            except RuntimeError:
+                # Цикл событий клиента уже закрыт
+                pass
+
+    async def get(self, timeout):
+        """Ждёт событий не дольше timeout; возвращает (события, переполнен ли буфер)."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        with self._lock:
+            events = list(self._buffer)
+            self._buffer.clear()
+            self._ready.clear()
+            self._wake_pending = False
+            return events, self.overflowed
+
+
+class ChangeBroker:
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, warehouses=None, products=None):
+        """Вызывается из цикла событий, который будет читать подписку."""
+        subscription = Subscription(asyncio.get_running_loop(), options()['BUFFER'], warehouses, products)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def has_subscribers(self):
+        return bool(self._subscriptions)
+
+    def publish(self, latest):
+        """Читает текущие количества пар {(warehouse_id, product_id): seq} и рассылает события."""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        wanted = {
+            key: seq for key, seq in latest.items()
+            if any(subscription.matches(*key) for subscription in subscriptions)
+        }
+        if not wanted:
+            return
+        for event in _events(wanted, _stocks(wanted)):
+            for subscription in subscriptions:
+                if subscription.matches(event['warehouse'], event['product']):
+                    subscription.offer(event)
+
+
+broker = ChangeBroker()
+
+
+def publish_movements(movements):
+    """Публикует сохранённые StockMovement после фиксации транзакции."""
+    if not broker.has_subscribers():
+        return
+    latest = {}
+    for movement in movements:
+        key = (movement.warehouse_id, movement.product_id)
+        latest[key] = max(latest.get(key, 0), movement.pk)
+    transaction.on_commit(lambda: _publish(latest))
+
+
+def _publish(latest):
+    try:
+        broker.publish(latest)
+    except Exception:
+        logger.exception("Не удалось разослать изменения остатков подписчикам")
+
+
+def changes_since(after, limit, warehouses=None, products=None):
+    """
+    Пары, изменённые после записи журнала after: (события, id последней
+    прочитанной записи, остались ли ещё записи). Читается не больше limit
+    записей диапазоном по первичному ключу. None, если часть журнала после
+    after уже удалена (snapshot_stock_ledger --prune).
+    """
+    oldest = StockMovement.objects.order_by('id').values_list('id', flat=True).first()
+    if oldest is not None and oldest > after + 1:
+        return None
+    movements = StockMovement.objects.filter(id__gt=after)
+    if warehouses is not None:
+        movements = movements.filter(warehouse_id__in=warehouses)
+    if products is not None:
+        movements = movements.filter(product_id__in=products)
+    rows = list(movements.order_by('id').values_list('id', 'warehouse_id', 'product_id')[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+    latest = {(w, p): pk for pk, w, p in rows}
+    events = _events(latest, _stocks(latest)) if latest else []
+    return events, rows[-1][0] if rows else after, more
+
+
+async def catch_up(after, warehouses=None, products=None):
+    """
+    События для пар, изменённых после записи журнала after, или None, если
+    их больше CATCHUP_LIMIT либо часть журнала уже удалена.
+    """
+    changes = await sync_to_async(changes_since)(after, options()['CATCHUP_LIMIT'], warehouses, products)
+    if changes is None or changes[2]:
+        return None
+    return changes[0]
+
+
+def format_event(event):
+    data = json.dumps(event, separators=(',', ':'))
+    return f"id: {event['seq']}\nevent: stock\ndata: {data}\n\n"
+
+
+RESET_EVENT = "event: reset\ndata: {}\n\n"
@@ -0,0 +1,28 @@
+# api/checks.py
+"""Проверки конфигурации (python manage.py check)."""
+from django.conf import settings
+from django.core.checks import Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    """
+    Версии справочников (api.cache) и доступные количества
+    (api.availability) меняются через кэш. С кэшем одного процесса другие
+    воркеры не видят изменений: списки отвечают 304 по устаревшему ETag,
+    а доступные количества не обновляются.
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    engine = settings.DATABASES['default']['ENGINE']
+    if backend in PROCESS_LOCAL_CACHES and engine != 'django.db.backends.sqlite3':
+        return [Warning(
+            "Кэш default хранится в памяти процесса, а база рассчитана на несколько воркеров.",
+            hint="Задайте CACHE_BACKEND=redis, memcached или database (см. README, Cache).",
+            id='api.W001',
+        )]
+    return []
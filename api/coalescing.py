@@ -0,0 +1,107 @@
+# api/coalescing.py
+"""
+Объединение одновременных записей в одну строку (group commit).
+
+Первый поток, пришедший с ключом, становится ведущим: он ждёт окно
+WINDOW_MS (или пока не наберётся MAX_BATCH операций), забирает очередь
+ключа и применяет её одной функцией flush. Остальные потоки только ставят
+операцию в очередь и ждут результат, поэтому блокировку строки в базе
+держит один поток на пакет, а не каждый запрос. Следующие операции ключа
+собираются в новую очередь уже во время применения предыдущей.
+"""
+import threading
+from django.conf import settings
+
+DEFAULTS = {
+    'ENABLED': False,
+    'WINDOW_MS': 2,
+    'MAX_BATCH': 256,
+}
+
+
+class _Operation:
+    __slots__ = ('payload', 'done', 'result', 'error')
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class WriteCoalescer:
+    """
+    Очереди операций по ключу с ведущим потоком на пакет.
+
+    flush(key, payloads) вызывается в потоке ведущего и возвращает список
+    результатов той же длины и в том же порядке; элемент-исключение
+    выбрасывается в потоке соответствующей операции.
+    """
+
+    def __init__(self, flush, window, max_batch):
+        self.flush = flush
+        self.window = window
+        self.max_batch = max_batch
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, payload):
+        operation = _Operation(payload)
+        with self._lock:
+            queue = self._queues.get(key)
+            leader = queue is None
+            if leader:
+                queue = self._queues[key] = ([], threading.Event())
+            operations, full = queue
+            operations.append(operation)
+            if len(operations) >= self.max_batch:
+                full.set()
+
+        if leader:
+            full.wait(self.window)
+            with self._lock:
+                operations, _ = self._queues.pop(key)
+            self._run(key, operations)
+        else:
+            operation.done.wait()
+
+        if operation.error is not None:
+            raise operation.error
+        return operation.result
+
+    def _run(self, key, operations):
+        try:
+            results = self.flush(key, [operation.payload for operation in operations])
+        except Exception as exc:
+            results = [exc] * len(operations)
+        for operation, result in zip(operations, results):
+            if isinstance(result, Exception):
+                operation.error = result
+            else:
+                operation.result = result
+            operation.done.set()
+
+
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+
+def get_coalescer(flush):
+    """Объединитель записей Stock по настройкам или None, если режим выключен."""
+    global _coalescer
+    if _coalescer is None:
+        with _coalescer_lock:
+            if _coalescer is None:
+                options = {**DEFAULTS, **getattr(settings, 'STOCK_WRITE_COALESCING', {})}
+                _coalescer = (
+                    WriteCoalescer(flush, options['WINDOW_MS'] / 1000, options['MAX_BATCH'])
+                    if options['ENABLED'] else False
+                )
+    return _coalescer or None
+
+
+def reset_coalescer():
+    """Сбрасывает объединитель; используется в тестах и при смене настроек."""
+    global _coalescer
+    with _coalescer_lock:
+        _coalescer = None
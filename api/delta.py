@@ -0,0 +1,116 @@
+# api/delta.py
+"""
+Дельта-синхронизация для /api/stocks/changes/?since=<watermark>.
+
+Водяной знак — пара «id записи журнала движений.микросекунды времени».
+Остатки меняются только вместе с записью журнала (api/ledger.py), поэтому
+изменённые остатки находятся диапазоном по первичному ключу StockMovement
+после первой части, а склады, товары и отметки об удалении (Tombstone) —
+диапазоном по индексам updated_at и deleted_at после второй. Стоимость
+запроса пропорциональна числу изменений, а не размеру каталога.
+
+Новый водяной знак отстаёт от текущего момента на SETTLE_SECONDS: запись,
+которая получила номер или время раньше, а зафиксирована позже, придёт в
+следующем ответе, а не потеряется. Поэтому недавние изменения могут прийти
+повторно, и клиент применяет их как upsert.
+"""
+import datetime
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from .changefeed import changes_since
+from .models import Warehouse, Product, StockMovement, Tombstone
+
+DEFAULTS = {
+    'LIMIT': 1000,
+    'SETTLE_SECONDS': 5,
+    'TOMBSTONE_TTL': 30 * 24 * 60 * 60,
+}
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def options():
+    return {**DEFAULTS, **getattr(settings, 'STOCK_SYNC', {})}
+
+
+def parse_watermark(value):
+    """(movement_id, момент) из строки водяного знака; ValueError для некорректной."""
+    movement_id, _, micros = value.partition('.')
+    movement_id, micros = int(movement_id), int(micros)
+    if movement_id < 0 or micros < 0:
+        raise ValueError(value)
+    return movement_id, EPOCH + micros * MICROSECOND
+
+
+def format_watermark(movement_id, moment):
+    return f"{movement_id}.{(moment - EPOCH) // MICROSECOND}"
+
+
+def _settled(now):
+    # Последняя запись журнала, созданная до порога; чтение идёт по
+    # первичному ключу от конца и проходит только записи последних секунд
+    cutoff = now - datetime.timedelta(seconds=options()['SETTLE_SECONDS'])
+    movement_id = (
+        StockMovement.objects.filter(created_at__lte=cutoff).order_by('-id').values_list('id', flat=True).first()
+    )
+    return movement_id or 0, cutoff
+
+
+def delta_since(user, watermark, now=None):
+    """
+    Изменения, видимые пользователю после водяного знака watermark (строка
+    или None). Возвращает словарь с ключами reset, watermark, stocks,
+    warehouses, products, deleted, has_more. При reset клиент перечитывает
+    списки целиком и продолжает с нового водяного знака.
+    """
+    now = now or timezone.now()
+    settled_id, settled_at = _settled(now)
+    reset = {'reset': True, 'watermark': format_watermark(settled_id, settled_at)}
+    if watermark is None:
+        return reset
+    since_id, since_at = parse_watermark(watermark)
+    # Отметки об удалении старше TOMBSTONE_TTL удаляются командой purge_sync_tombstones
+    if since_at < now - datetime.timedelta(seconds=options()['TOMBSTONE_TTL']):
+        return reset
+
+    warehouses = Warehouse.objects.filter(updated_at__gt=since_at)
+    tombstones = Tombstone.objects.filter(deleted_at__gt=since_at)
+    owned = None
+    if user.user_type == 'supplier':
+        warehouses = warehouses.filter(owner=user)
+        owned = set(Warehouse.objects.filter(owner=user).values_list('id', flat=True))
+        # Товары общие; склады и остатки — только свои
+        tombstones = tombstones.filter(Q(kind='product') | Q(owner_id=user.pk))
+    changes = changes_since(since_id, options()['LIMIT'], warehouses=owned)
+    if changes is None:
+        return reset
+    stocks, last_id, has_more = changes
+
+    deleted = {'warehouses': [], 'products': [], 'stocks': []}
+    for kind, object_id in tombstones.values_list('kind', 'object_id'):
+        deleted[f'{kind}s'].append(object_id)
+    return {
+        'reset': False,
+        # Следующий запрос продолжает с последней прочитанной записи, но не
+        # дальше порога фиксации
+        'watermark': format_watermark(max(since_id, min(last_id, settled_id)), max(since_at, settled_at)),
+        'stocks': [{key: value for key, value in event.items() if key != 'seq'} for event in stocks],
+        'warehouses': list(warehouses.with_owner().order_by('id')),
+        'products': list(Product.objects.filter(updated_at__gt=since_at).order_by('id')),
+        'deleted': deleted,
+        # Записи после порога фиксации придут в следующих ответах, а не сразу
+        'has_more': has_more and last_id <= settled_id,
+    }
+
+
+def purge_tombstones(batch_size=1000, now=None):
+    """Удаляет отметки старше TOMBSTONE_TTL пакетами по batch_size строк; возвращает число удалённых."""
+    cutoff = (now or timezone.now()) - datetime.timedelta(seconds=options()['TOMBSTONE_TTL'])
+    deleted = 0
+    while True:
+        ids = list(Tombstone.objects.filter(deleted_at__lte=cutoff).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += Tombstone.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,122 @@
+# api/hashers.py
+"""
+Хэширование паролей: настраиваемые алгоритмы и ограниченный пул потоков.
+
+PASSWORD_HASHER_PROFILE выбирает алгоритм новых хэшей, параметры стоимости
+задаются в PASSWORD_HASHER_OPTIONS. Хэши других алгоритмов и хэши со
+старыми параметрами по-прежнему проверяются и пересчитываются при
+успешном входе (django.contrib.auth.hashers.verify_password).
+
+Проверка и вычисление хэшей выполняются в пуле из PASSWORD_HASHING['WORKERS']
+потоков (api/backends.py, UserRegistrationSerializer), поэтому волна входов
+занимает не больше этого числа ядер и не вытесняет запросы остатков. Если
+место в очереди не освободилось за TIMEOUT секунд, вход отклоняется с 503.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, PBKDF2PasswordHasher, ScryptPasswordHasher,
+)
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+DEFAULTS = {
+    'WORKERS': 2,
+    'QUEUE': 64,
+    'TIMEOUT': 5,
+}
+
+
+def _option(algorithm, name, default):
+    return getattr(settings, 'PASSWORD_HASHER_OPTIONS', {}).get(algorithm, {}).get(name, default)
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return _option('pbkdf2', 'iterations', PBKDF2PasswordHasher.iterations)
+
+
+class TunableScryptPasswordHasher(ScryptPasswordHasher):
+    @property
+    def work_factor(self):
+        return _option('scrypt', 'work_factor', ScryptPasswordHasher.work_factor)
+
+    @property
+    def block_size(self):
+        return _option('scrypt', 'block_size', ScryptPasswordHasher.block_size)
+
+    @property
+    def parallelism(self):
+        return _option('scrypt', 'parallelism', ScryptPasswordHasher.parallelism)
+
+    @property
+    def maxmem(self):
+        # Предел памяти OpenSSL (по умолчанию 32 МиБ) при 128·r·N байт на хэш;
+        # должен покрывать и хэши с прежними, большими параметрами
+        return _option('scrypt', 'maxmem', 256 * 1024 * 1024)
+
+
+class TunableArgon2PasswordHasher(Argon2PasswordHasher):
+    """Требует пакет argon2-cffi."""
+
+    @property
+    def time_cost(self):
+        return _option('argon2', 'time_cost', Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return _option('argon2', 'memory_cost', Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return _option('argon2', 'parallelism', Argon2PasswordHasher.parallelism)
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Сервер перегружен входами, повторите попытку позже."
+    default_code = 'hashing_busy'
+    # Заголовок Retry-After ответа (rest_framework.views.exception_handler)
+    wait = 1
+
+
+class HashingPool:
+    """Пул потоков с ограниченной очередью для вычисления хэшей паролей."""
+
+    def __init__(self, workers, queue, timeout):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+        self._slots = threading.BoundedSemaphore(workers + queue)
+
+    def run(self, fn, *args, **kwargs):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HashingBusy()
+        try:
+            return self._executor.submit(fn, *args, **kwargs).result()
+        finally:
+            self._slots.release()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                options = {**DEFAULTS, **getattr(settings, 'PASSWORD_HASHING', {})}
+                _pool = HashingPool(options['WORKERS'], options['QUEUE'], options['TIMEOUT'])
+    return _pool
+
+
+def reset_hashing_pool():
+    """Сбрасывает пул после смены PASSWORD_HASHING; используется в тестах и бенчмарках."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool._executor.shutdown(wait=False)
+        _pool = None
@@ -0,0 +1,101 @@
+# api/idempotency.py
+"""
+Повторы изменяющих запросов по заголовку Idempotency-Key.
+
+Ключ занимается вставкой строки IdempotencyKey в начале той же транзакции,
+в которой выполняется изменение и сохраняется ответ. Для нового ключа это
+одна запись без чтений; параллельный запрос с тем же ключом ждёт фиксации
+на уникальном индексе (user, key), получает конфликт и отвечает сохранённым
+ответом, прочитанным одним запросом по этому индексу, не обращаясь к Stock.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+INVALID_KEY = f"Заголовок {HEADER} должен содержать от 1 до {MAX_KEY_LENGTH} символов."
+KEY_REUSED = "Ключ идемпотентности уже использован с другим запросом."
+KEY_IN_PROGRESS = "Запрос с этим ключом идемпотентности ещё выполняется."
+
+
+def _fingerprint(request):
+    payload = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(f"{request.method} {request.path}\n{payload}".encode()).hexdigest()
+
+
+def _claim(user, key, fingerprint, now):
+    """Занимает ключ; возвращает (строка, None) или (None, сохранённая строка)."""
+    ttl = timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(
+                user=user, key=key, fingerprint=fingerprint, expires_at=now + ttl
+            ), None
+    except IntegrityError:
+        pass
+    existing = IdempotencyKey.objects.get(user=user, key=key)
+    if existing.expires_at > now:
+        return None, existing
+    # Просроченный ключ, ещё не удалённый purge_idempotency_keys, занимается заново
+    existing.fingerprint, existing.status_code, existing.response = fingerprint, None, ''
+    existing.expires_at = now + ttl
+    existing.save(update_fields=['fingerprint', 'status_code', 'response', 'expires_at'])
+    return existing, None
+
+
+def _replay(record, fingerprint):
+    if record.fingerprint != fingerprint:
+        return Response({"error": KEY_REUSED}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    if record.status_code is None:
+        return Response({"error": KEY_IN_PROGRESS}, status=status.HTTP_409_CONFLICT)
+    return Response(json.loads(record.response), status=record.status_code, headers={REPLAYED_HEADER: 'true'})
+
+
+def idempotent(handler):
+    """
+    Декоратор обработчика представления DRF. Запросы без заголовка
+    выполняются как обычно; с заголовком — не больше одного раза на
+    пользователя и ключ, повтор получает сохранённый ответ.
+    """
+    @functools.wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return handler(view, request, *args, **kwargs)
+        if not 0 < len(key) <= MAX_KEY_LENGTH:
+            return Response({"error": INVALID_KEY}, status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = _fingerprint(request)
+        with transaction.atomic():
+            record, existing = _claim(request.user, key, fingerprint, timezone.now())
+            if existing is not None:
+                return _replay(existing, fingerprint)
+            response = handler(view, request, *args, **kwargs)
+            record.status_code = response.status_code
+            record.response = json.dumps(response.data, cls=DjangoJSONEncoder, separators=(',', ':'))
+            record.save(update_fields=['status_code', 'response'])
+        return response
+    return wrapper
+
+
+def purge_expired(batch_size=1000, now=None):
+    """Удаляет просроченные ключи пакетами по batch_size строк; возвращает число удалённых."""
+    now = now or timezone.now()
+    deleted = 0
+    while True:
+        # Каждый пакет — отдельная короткая транзакция по индексу expires_at
+        ids = list(IdempotencyKey.objects.filter(expires_at__lte=now).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
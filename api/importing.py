@@ -0,0 +1,295 @@
+# api/importing.py
+"""
+Пакетный импорт товаров, складов и начальных остатков поставщика.
+
+Строки CSV или NDJSON читаются потоком и обрабатываются порциями по
+INVENTORY_IMPORT_CHUNK_SIZE, поэтому память не зависит от размера файла.
+Для порции выполняется постоянное число запросов: товары ищутся по именам
+одним запросом и записываются bulk_create(update_conflicts=True), склады
+поставщика ищутся одним запросом, остатки блокируются и читаются одним
+запросом и записываются bulk_create(update_conflicts=True). Количество в
+строке — новый остаток; разница с прежним записывается в журнал движений
+(api/ledger.py), как при обычной поставке или списании; остаток нельзя
+уменьшить ниже резерва (api/reservations.py). Ошибка строки
+не прерывает импорт: строка пропускается и попадает в отчёт.
+
+Поля строки: product (имя товара), price, description — необязательно;
+warehouse (id склада поставщика) или warehouse_name, warehouse_address —
+для создания склада; quantity — необязательно, без него импортируется
+только товар.
+"""
+import csv
+import json
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from .cache import product_cache, warehouse_cache
+from .ledger import record_movements
+from .models import Warehouse, Product, Stock, StockStripe
+from .rollups import product_repriced
+
+INVALID_JSON = "Строка не является JSON-объектом."
+PRODUCT_REQUIRED = "Не указано имя товара."
+INVALID_PRICE = "Цена должна быть неотрицательным числом с двумя знаками после запятой."
+PRICE_REQUIRED = "Для нового товара нужно указать цену."
+INVALID_STOCK_QUANTITY = "Количество должно быть неотрицательным целым числом."
+WAREHOUSE_REQUIRED = "Для остатка нужно указать warehouse или warehouse_name."
+WAREHOUSE_UNKNOWN = "Склад не найден или вы не являетесь его владельцем."
+STOCK_RESERVED = "Количество меньше зарезервированного на складе."
+CHUNK_FAILED = "Порция не записана: {}"
+
+MAX_NAME = Product._meta.get_field('name').max_length
+MAX_WAREHOUSE_NAME = Warehouse._meta.get_field('name').max_length
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    products: int = 0
+    warehouses: int = 0
+    stocks: int = 0
+    error_count: int = 0
+    errors: list = field(default_factory=list)
+
+    def as_dict(self):
+        return {'rows': self.rows, 'products': self.products, 'warehouses': self.warehouses,
+                'stocks': self.stocks, 'error_count': self.error_count, 'errors': self.errors}
+
+
+class RowError(Exception):
+    pass
+
+
+def read_csv(lines):
+    """(номер строки, словарь) для строк CSV с заголовком."""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_ndjson(lines):
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else RowError(INVALID_JSON)
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
+
+
+def _value(row, name):
+    value = row.get(name)
+    if isinstance(value, str):
+        value = value.strip()
+    return None if value in (None, '') else value
+
+
+def _parse_row(row):
+    name = _value(row, 'product')
+    if not isinstance(name, str) or len(name) > MAX_NAME:
+        raise RowError(PRODUCT_REQUIRED)
+    parsed = {'product': name, 'description': _value(row, 'description')}
+
+    price = _value(row, 'price')
+    if price is not None:
+        try:
+            price = Decimal(str(price))
+        except InvalidOperation:
+            raise RowError(INVALID_PRICE)
+        if not price.is_finite() or price < 0 or price != price.quantize(Decimal('0.01')) or price >= 10 ** 8:
+            raise RowError(INVALID_PRICE)
+    parsed['price'] = price
+
+    quantity = _value(row, 'quantity')
+    if quantity is not None:
+        if isinstance(quantity, bool) or (isinstance(quantity, float) and not quantity.is_integer()):
+            raise RowError(INVALID_STOCK_QUANTITY)
+        try:
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            raise RowError(INVALID_STOCK_QUANTITY)
+        if quantity < 0:
+            raise RowError(INVALID_STOCK_QUANTITY)
+        warehouse, warehouse_name = _value(row, 'warehouse'), _value(row, 'warehouse_name')
+        try:
+            parsed['warehouse'] = int(warehouse) if warehouse is not None else None
+        except (TypeError, ValueError):
+            raise RowError(WAREHOUSE_UNKNOWN)
+        if parsed['warehouse'] is None and (not isinstance(warehouse_name, str)
+                                            or len(warehouse_name) > MAX_WAREHOUSE_NAME):
+            raise RowError(WAREHOUSE_REQUIRED)
+        parsed['warehouse_name'] = warehouse_name
+        parsed['warehouse_address'] = _value(row, 'warehouse_address')
+    parsed['quantity'] = quantity
+    return parsed
+
+
+def _upsert_products(rows):
+    """Записывает товары порции; возвращает ({имя: (id, цена)}, число записанных)."""
+    latest = {row['product']: row for row in rows}
+    existing = {
+        name: (pk, price)
+        for name, pk, price in Product.objects.filter(name__in=latest).values_list('name', 'id', 'price')
+    }
+    ids = dict(existing)
+    written = 0
+    # Товары без цены не меняются, а новые без цены создать нельзя
+    priced = [row for row in latest.values() if row['price'] is not None]
+    # Описание перезаписывается только там, где оно указано
+    for with_description in (True, False):
+        batch = [row for row in priced if (row['description'] is not None) == with_description]
+        if not batch:
+            continue
+        products = Product.objects.bulk_create(
+            [Product(name=row['product'], description=row['description'], price=row['price']) for row in batch],
+            update_conflicts=True, unique_fields=['name'],
+            update_fields=['price', 'description', 'updated_at'] if with_description
+            else ['price', 'updated_at'],
+        )
+        ids.update((product.name, (product.pk, product.price)) for product in products)
+        written += len(products)
+    for row in priced:
+        if row['product'] in existing and existing[row['product']][1] != row['price']:
+            product_repriced(existing[row['product']][0], existing[row['product']][1], row['price'])
+    if written:
+        product_cache.bump()
+    return ids, written
+
+
+def _resolve_warehouses(rows, owner):
+    """{id или имя: id} складов поставщика; недостающие склады с адресом создаются."""
+    ids = {row['warehouse'] for row in rows if row['warehouse'] is not None}
+    names = {row['warehouse_name'] for row in rows if row['warehouse'] is None}
+    resolved = {}
+    for pk, name in Warehouse.objects.filter(owner=owner).filter(Q(id__in=ids) | Q(name__in=names)) \
+            .values_list('id', 'name'):
+        resolved[pk] = pk
+        resolved.setdefault(name, pk)
+    addresses = {}
+    for row in rows:
+        name = row['warehouse_name']
+        if row['warehouse'] is None and name not in resolved and row['warehouse_address']:
+            addresses.setdefault(name, row['warehouse_address'])
+    created = Warehouse.objects.bulk_create(
+        Warehouse(name=name, address=address, owner=owner) for name, address in addresses.items()
+    )
+    resolved.update((warehouse.name, warehouse.pk) for warehouse in created)
+    if created:
+        warehouse_cache.bump()
+    return resolved, len(created)
+
+
+def _upsert_stocks(rows, prices):
+    """
+    Устанавливает остатки [(warehouse_id, product_id, quantity), ...] и
+    записывает разницу в журнал. Возвращает (число записанных, пары, где
+    количество меньше резерва); такие пары не изменяются.
+    """
+    targets = {(w, p): quantity for w, p, quantity in rows}
+    warehouse_ids, product_ids = {w for w, _ in targets}, {p for _, p in targets}
+    current, below_reserved = {}, set()
+    for pk, w, p, total, stripes, reserved in (
+        Stock.objects.select_for_update()
+        .filter(warehouse_id__in=warehouse_ids, product_id__in=product_ids)
+        .with_total_quantity()
+        .values_list('id', 'warehouse_id', 'product_id', 'total_quantity', 'stripe_count', 'reserved')
+    ):
+        if (w, p) not in targets:
+            continue
+        if targets[w, p] < reserved:
+            below_reserved.add((w, p))
+            del targets[w, p]
+        else:
+            current[w, p] = (pk, total, stripes)
+    if not targets:
+        return 0, below_reserved
+    Stock.objects.bulk_create(
+        [Stock(warehouse_id=w, product_id=p, quantity=quantity) for (w, p), quantity in targets.items()],
+        update_conflicts=True, unique_fields=['warehouse', 'product'], update_fields=['quantity'],
+    )
+    # Новый остаток целиком в основной строке, полосы обнуляются
+    striped = [pk for pk, _, stripes in current.values() if stripes > 1]
+    if striped:
+        StockStripe.objects.filter(stock_id__in=striped).update(quantity=0)
+    record_movements([
+        (w, p, quantity - current.get((w, p), (None, 0, 1))[1])
+        for (w, p), quantity in targets.items()
+        if quantity != current.get((w, p), (None, 0, 1))[1]
+    ], prices)
+    return len(targets), below_reserved
+
+
+def _import_chunk(chunk, owner, result, max_errors):
+    def fail(number, message):
+        result.error_count += 1
+        if len(result.errors) < max_errors:
+            result.errors.append({'line': number, 'error': message})
+
+    parsed = []
+    for number, row in chunk:
+        result.rows += 1
+        try:
+            if isinstance(row, RowError):
+                raise row
+            parsed.append((number, _parse_row(row)))
+        except RowError as exc:
+            fail(number, str(exc))
+    if not parsed:
+        return
+
+    rejected = []
+    try:
+        with transaction.atomic():
+            catalog, products = _upsert_products([row for _, row in parsed])
+            stock_rows = []
+            for number, row in parsed:
+                if row['product'] not in catalog:
+                    rejected.append((number, PRICE_REQUIRED))
+                elif row['quantity'] is not None:
+                    stock_rows.append((number, row))
+            warehouse_ids, warehouses = _resolve_warehouses([row for _, row in stock_rows], owner)
+            stocks, numbers = [], []
+            for number, row in stock_rows:
+                warehouse_id = warehouse_ids.get(
+                    row['warehouse'] if row['warehouse'] is not None else row['warehouse_name']
+                )
+                if warehouse_id is None:
+                    rejected.append((number, WAREHOUSE_UNKNOWN))
+                else:
+                    stocks.append((warehouse_id, catalog[row['product']][0], row['quantity']))
+                    numbers.append(number)
+            prices = dict(catalog.values())
+            stock_count, below_reserved = _upsert_stocks(stocks, prices) if stocks else (0, set())
+            rejected.extend(
+                (number, STOCK_RESERVED) for number, (w, p, _) in zip(numbers, stocks) if (w, p) in below_reserved
+            )
+    except DatabaseError as exc:
+        for number, _ in parsed:
+            fail(number, CHUNK_FAILED.format(exc))
+        return
+    for number, message in rejected:
+        fail(number, message)
+    result.products += products
+    result.warehouses += warehouses
+    result.stocks += stock_count
+
+def import_inventory(rows, owner, chunk_size=None, max_errors=None):
+    """
+    Импортирует строки [(номер, словарь), ...] (см. read_csv, read_ndjson)
+    от имени поставщика owner. Каждая порция записывается в своей транзакции.
+    """
+    chunk_size = chunk_size or getattr(settings, 'INVENTORY_IMPORT_CHUNK_SIZE', 1000)
+    if max_errors is None:
+        max_errors = getattr(settings, 'INVENTORY_IMPORT_MAX_REPORTED_ERRORS', 1000)
+    result = ImportResult()
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        _import_chunk(chunk, owner, result, max_errors)
+    return result
@@ -0,0 +1,136 @@
+# api/ledger.py
+"""
+Журнал движений остатков и снимки.
+
+Каждое изменение Stock записывает StockMovement в той же транзакции
+(api/services.py), поэтому Stock.quantity — материализованный итог журнала.
+Команда snapshot_stock_ledger периодически сохраняет StockSnapshot: остаток
+на момент as_of. Остаток на момент T — последний снимок не позже T плюс
+движения после него, то есть запрос читает один снимок и ограниченный хвост,
+а не всю историю.
+"""
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Subquery, Sum
+from django.utils import timezone
+from . import availability, changefeed
+from .models import Stock, StockStripe, StockMovement, StockSnapshot
+from .rollups import apply_movements, rebuild_rollups
+
+
+def record_movements(rows, prices=None):
+    """
+    Записывает движения [(warehouse_id, product_id, delta), ...] одним INSERT
+    и прибавляет их к свёрткам (api/rollups.py) по ценам prices, если они
+    переданы, и к кэшу доступности (api/availability.py). После фиксации
+    изменения публикуются в ленту (api/changefeed.py).
+    """
+    if not rows:
+        return
+    now = timezone.now()
+    movements = StockMovement.objects.bulk_create(
+        StockMovement(warehouse_id=w, product_id=p, delta=delta, created_at=now) for w, p, delta in rows
+    )
+    apply_movements(rows, prices)
+    availability.apply_movements(rows)
+    changefeed.publish_movements(movements)
+
+
+def quantity_at(warehouse_id, product_id, at):
+    """Остаток пары (склад, товар) на момент at: снимок плюс хвост движений."""
+    snapshot = (
+        StockSnapshot.objects.filter(warehouse_id=warehouse_id, product_id=product_id, as_of__lte=at)
+        .order_by('-as_of').values_list('quantity', 'as_of').first()
+    )
+    tail = StockMovement.objects.filter(warehouse_id=warehouse_id, product_id=product_id, created_at__lte=at)
+    base = 0
+    if snapshot is not None:
+        base, since = snapshot
+        tail = tail.filter(created_at__gt=since)
+    return base + (tail.aggregate(total=Sum('delta'))['total'] or 0)
+
+
+def _latest_snapshots():
+    newest = StockSnapshot.objects.filter(
+        warehouse=OuterRef('warehouse'), product=OuterRef('product')
+    ).order_by('-as_of').values('as_of')[:1]
+    return {
+        (w, p): quantity
+        for w, p, quantity in StockSnapshot.objects.filter(as_of=Subquery(newest))
+        .values_list('warehouse_id', 'product_id', 'quantity')
+    }
+
+
+def _uncovered_totals(until=None):
+    # Суммы движений, которые не учтены ни одним снимком своей пары
+    covered = StockSnapshot.objects.filter(
+        warehouse=OuterRef('warehouse'), product=OuterRef('product'), as_of__gte=OuterRef('created_at')
+    )
+    movements = StockMovement.objects.filter(~Exists(covered))
+    if until is not None:
+        movements = movements.filter(created_at__lte=until)
+    grouped = movements.values('warehouse_id', 'product_id').annotate(total=Sum('delta')).order_by()
+    return {(row['warehouse_id'], row['product_id']): row['total'] for row in grouped}
+
+
+def ledger_balances():
+    """Остатки всех пар по журналу: {(warehouse_id, product_id): quantity}."""
+    balances = _latest_snapshots()
+    for key, total in _uncovered_totals().items():
+        balances[key] = balances.get(key, 0) + total
+    return balances
+
+
+def take_snapshot(as_of, prune=False):
+    """
+    Сохраняет снимки на момент as_of для пар, у которых были движения после
+    предыдущего снимка. С prune удаляет учтённые снимками движения не позже
+    as_of; остаток на более ранний момент после этого определяется с
+    точностью до снимков. Возвращает (число снимков, число удалённых движений).
+    """
+    with transaction.atomic():
+        if StockSnapshot.objects.filter(as_of__gte=as_of).exists():
+            raise ValueError("Снимок не может быть раньше уже существующего.")
+        latest = _latest_snapshots()
+        snapshots = StockSnapshot.objects.bulk_create(
+            (
+                StockSnapshot(warehouse_id=w, product_id=p, quantity=latest.get((w, p), 0) + total, as_of=as_of)
+                for (w, p), total in _uncovered_totals(until=as_of).items()
+            ),
+            batch_size=1000,
+        )
+        pruned = 0
+        if prune:
+            pruned, _ = StockMovement.objects.filter(created_at__lte=as_of).delete()
+    return len(snapshots), pruned
+
+
+def rebuild_balances(apply=False):
+    """
+    Сравнивает Stock.quantity с журналом и возвращает расхождения
+    {(warehouse_id, product_id): (в Stock, по журналу)}. С apply
+    переписывает Stock по журналу; пары с отрицательным итогом журнала
+    только сообщаются.
+    """
+    with transaction.atomic():
+        stocks = {
+            (w, p): quantity
+            for w, p, quantity in Stock.objects.select_for_update().with_total_quantity()
+            .values_list('warehouse_id', 'product_id', 'total_quantity')
+        }
+        ledger = ledger_balances()
+        drift = {
+            key: (stocks.get(key), ledger.get(key, 0))
+            for key in stocks.keys() | ledger.keys()
+            if stocks.get(key) != ledger.get(key, 0) and not (key not in stocks and ledger[key] == 0)
+        }
+        if apply:
+            for (w, p), (_, quantity) in drift.items():
+                if quantity >= 0:
+                    # Итог журнала записывается в основную строку, полосы обнуляются
+                    Stock.objects.update_or_create(
+                        warehouse_id=w, product_id=p, defaults={'quantity': quantity}
+                    )
+                    StockStripe.objects.filter(stock__warehouse_id=w, stock__product_id=p).update(quantity=0)
+            if drift:
+                rebuild_rollups()
+    return drift
@@ -0,0 +1,48 @@
+# api/management/commands/import_inventory.py
+import sys
+from pathlib import Path
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from api.importing import READERS, import_inventory
+
+
+class Command(BaseCommand):
+    help = (
+        "Импортирует товары, склады и начальные остатки поставщика из CSV или "
+        "NDJSON порциями; ошибочные строки пропускаются и выводятся в отчёте."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Файл CSV или NDJSON; - для стандартного ввода.")
+        parser.add_argument('--owner', required=True, help="Имя пользователя-поставщика.")
+        parser.add_argument(
+            '--format', choices=sorted(READERS),
+            help="Формат файла; по умолчанию определяется по расширению (.csv или .ndjson/.jsonl).",
+        )
+        parser.add_argument('--chunk-size', type=int, help="Строк в одной транзакции (INVENTORY_IMPORT_CHUNK_SIZE).")
+
+    def handle(self, *args, path, owner, format, chunk_size, **options):
+        try:
+            user = get_user_model().objects.get(username=owner, user_type='supplier')
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"Поставщик {owner} не найден.")
+        if format is None:
+            format = 'csv' if Path(path).suffix.lower() == '.csv' else 'ndjson'
+
+        source = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
+        try:
+            result = import_inventory(READERS[format](source), user, chunk_size=chunk_size)
+        except UnicodeDecodeError:
+            raise CommandError("Файл должен быть в кодировке UTF-8.")
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+        for error in result.errors:
+            self.stderr.write(f"Строка {error['line']}: {error['error']}")
+        if result.error_count > len(result.errors):
+            self.stderr.write(f"... и ещё {result.error_count - len(result.errors)} ошибок")
+        self.stdout.write(
+            f"Строк: {result.rows}, товаров: {result.products}, складов: {result.warehouses}, "
+            f"остатков: {result.stocks}, ошибок: {result.error_count}"
+        )
@@ -0,0 +1,22 @@
+# api/management/commands/purge_idempotency_keys.py
+from django.core.management.base import BaseCommand, CommandError
+from api.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет просроченные ключи идемпотентности пакетами ограниченного "
+        "размера, чтобы не держать длинную блокировку таблицы."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Число строк, удаляемых одним запросом (по умолчанию 1000).",
+        )
+
+    def handle(self, *args, batch_size, **options):
+        if batch_size < 1:
+            raise CommandError("--batch-size должен быть положительным.")
+        deleted = purge_expired(batch_size=batch_size)
+        self.stdout.write(f"Удалено ключей: {deleted}")
@@ -0,0 +1,22 @@
+# api/management/commands/purge_sync_tombstones.py
+from django.core.management.base import BaseCommand, CommandError
+from api.delta import purge_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет отметки об удалении старше STOCK_SYNC['TOMBSTONE_TTL'] пакетами "
+        "ограниченного размера. Клиенты с более старым водяным знаком получают reset."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Число строк, удаляемых одним запросом (по умолчанию 1000).",
+        )
+
+    def handle(self, *args, batch_size, **options):
+        if batch_size < 1:
+            raise CommandError("--batch-size должен быть положительным.")
+        deleted = purge_tombstones(batch_size=batch_size)
+        self.stdout.write(f"Удалено отметок: {deleted}")
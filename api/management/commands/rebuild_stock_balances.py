@@ -0,0 +1,17 @@
+# api/management/commands/rebuild_stock_balances.py
+from django.core.management.base import BaseCommand
+from api.ledger import rebuild_balances
+
+
+class Command(BaseCommand):
+    help = "Сверяет Stock.quantity с журналом движений и при --apply восстанавливает остатки по журналу."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--apply', action='store_true', help="Записать остатки из журнала в Stock.")
+
+    def handle(self, *args, apply, **options):
+        drift = rebuild_balances(apply=apply)
+        for (warehouse_id, product_id), (stored, ledger) in sorted(drift.items()):
+            self.stdout.write(f"склад {warehouse_id}, товар {product_id}: в Stock {stored}, по журналу {ledger}")
+        verb = "Исправлено" if apply else "Расхождений"
+        self.stdout.write(f"{verb}: {len(drift)}")
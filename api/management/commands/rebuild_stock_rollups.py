@@ -0,0 +1,14 @@
+# api/management/commands/rebuild_stock_rollups.py
+from django.core.management.base import BaseCommand
+from api.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает свёртки остатков по товарам и складам. Нужен после изменений "
+        "Stock или цен в обход API (массовые update, импорт)."
+    )
+
+    def handle(self, *args, **options):
+        rebuild_rollups()
+        self.stdout.write("Свёртки пересчитаны.")
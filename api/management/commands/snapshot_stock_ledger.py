@@ -0,0 +1,31 @@
+# api/management/commands/snapshot_stock_ledger.py
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from api.ledger import take_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Сохраняет снимки остатков по журналу движений, чтобы запрос остатка на "
+        "момент времени читал один снимок и ограниченный хвост движений."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lag', type=int, default=60,
+            help="Снимок строится на момент now - lag секунд, чтобы не пропустить "
+                 "движения ещё не завершённых транзакций (по умолчанию 60).",
+        )
+        parser.add_argument(
+            '--prune', action='store_true',
+            help="Удалить движения, учтённые снимком.",
+        )
+
+    def handle(self, *args, lag, prune, **options):
+        as_of = timezone.now() - timedelta(seconds=lag)
+        try:
+            created, pruned = take_snapshot(as_of, prune=prune)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(f"Снимков: {created}, удалено движений: {pruned}, момент: {as_of.isoformat()}")
@@ -0,0 +1,23 @@
+# api/management/commands/sweep_reservations.py
+from django.core.management.base import BaseCommand, CommandError
+from api.reservations import sweep_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Снимает просроченные резервы остатков пакетами ограниченного размера; "
+        "зарезервированное количество снова становится доступным. Запускается "
+        "периодически, например из cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Число резервов, снимаемых одной транзакцией (по умолчанию 1000).",
+        )
+
+    def handle(self, *args, batch_size, **options):
+        if batch_size < 1:
+            raise CommandError("--batch-size должен быть положительным.")
+        released = sweep_expired(batch_size=batch_size)
+        self.stdout.write(f"Снято резервов: {released}")
@@ -0,0 +1,147 @@
+# api/metrics.py
+"""
+Метрики запросов по имени маршрута: число запросов, гистограмма времени
+ответа, число и время SQL-запросов, время сериализации.
+
+Счётчики запроса хранятся в contextvar: обёртка запросов (query_wrapper,
+ставится на каждое соединение сигналом connection_created) и таймер
+сериализаторов прибавляют к ним, а MetricsMiddleware (api/middleware.py)
+переносит итог в общий реестр. sync_to_async копирует контекст в рабочий
+поток, поэтому запросы асинхронных представлений учитываются так же.
+Реестр хранится в памяти процесса; при нескольких процессах каждый
+отдаёт свои значения.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Верхние границы корзин гистограммы времени ответа, секунды
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = ContextVar('api_request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'db_time', 'serializer_time', 'serializer_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+
+class _Route:
+    __slots__ = ('count', 'buckets', 'duration', 'queries', 'db_time', 'serializer_time')
+
+    def __init__(self):
+        self.count = 0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def observe(self, route, duration, request_metrics):
+        with self._lock:
+            entry = self._routes.get(route)
+            if entry is None:
+                entry = self._routes[route] = _Route()
+            entry.count += 1
+            entry.buckets[bisect_left(BUCKETS, duration)] += 1
+            entry.duration += duration
+            entry.queries += request_metrics.queries
+            entry.db_time += request_metrics.db_time
+            entry.serializer_time += request_metrics.serializer_time
+
+    def reset(self):
+        with self._lock:
+            self._routes = {}
+
+    def render(self):
+        """Значения в текстовом формате Prometheus."""
+        with self._lock:
+            routes = sorted(
+                (route, entry.count, list(entry.buckets), entry.duration,
+                 entry.queries, entry.db_time, entry.serializer_time)
+                for route, entry in self._routes.items()
+            )
+        lines = [
+            '# HELP api_requests_total Number of requests.',
+            '# TYPE api_requests_total counter',
+        ]
+        lines += [f'api_requests_total{{route="{route}"}} {count}' for route, count, *_ in routes]
+        lines += [
+            '# HELP api_request_duration_seconds Request latency.',
+            '# TYPE api_request_duration_seconds histogram',
+        ]
+        for route, count, buckets, duration, *_ in routes:
+            cumulative = 0
+            for bound, observed in zip(BUCKETS + ('+Inf',), buckets):
+                cumulative += observed
+                lines.append(f'api_request_duration_seconds_bucket{{route="{route}",le="{bound}"}} {cumulative}')
+            lines.append(f'api_request_duration_seconds_sum{{route="{route}"}} {duration:.6f}')
+            lines.append(f'api_request_duration_seconds_count{{route="{route}"}} {count}')
+        for name, help_text, index, fmt in (
+            ('api_db_queries_total', 'SQL queries executed.', 4, 'd'),
+            ('api_db_duration_seconds_total', 'Time spent in SQL queries.', 5, '.6f'),
+            ('api_serializer_duration_seconds_total', 'Time spent building serializer data.', 6, '.6f'),
+        ):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            lines += [f'{name}{{route="{row[0]}"}} {row[index]:{fmt}}' for row in routes]
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def query_wrapper(execute, sql, params, many, context):
+    """Обёртка connection.execute_wrappers: время и число запросов текущего запроса."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.queries += 1
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_wrapper)
+
+
+@contextmanager
+def serializer_timer():
+    """Время внешнего сериализатора; вложенные вызовы не учитываются повторно."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    metrics.serializer_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_depth -= 1
+        if not metrics.serializer_depth:
+            metrics.serializer_time += time.perf_counter() - start
@@ -0,0 +1,75 @@
+# api/middleware.py
+import cProfile
+import os
+import random
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from . import metrics
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    return (match.url_name or match.route) if match else 'unmatched'
+
+
+class MetricsMiddleware:
+    """
+    Собирает метрики каждого запроса по имени маршрута (api/metrics.py).
+
+    Если API_PROFILE_SAMPLE_RATE > 0, такая доля синхронных запросов
+    выполняется под cProfile, и профиль запроса дольше
+    API_PROFILE_THRESHOLD_MS сохраняется в API_PROFILE_DIR.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        request_metrics, token = metrics.start_request()
+        profiler = self._start_profiler()
+        start = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            duration = time.perf_counter() - start
+            if profiler is not None:
+                self._finish_profiler(profiler, request, duration)
+            metrics.finish_request(token)
+            metrics.registry.observe(_route(request), duration, request_metrics)
+
+    async def __acall__(self, request):
+        request_metrics, token = metrics.start_request()
+        start = time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            duration = time.perf_counter() - start
+            metrics.finish_request(token)
+            metrics.registry.observe(_route(request), duration, request_metrics)
+
+    @staticmethod
+    def _start_profiler():
+        rate = getattr(settings, 'API_PROFILE_SAMPLE_RATE', 0)
+        if not rate or random.random() >= rate:
+            return None
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    @staticmethod
+    def _finish_profiler(profiler, request, duration):
+        profiler.disable()
+        if duration * 1000 < getattr(settings, 'API_PROFILE_THRESHOLD_MS', 500):
+            return
+        directory = getattr(settings, 'API_PROFILE_DIR', 'profiles')
+        os.makedirs(directory, exist_ok=True)
+        name = f"{_route(request)}-{time.time_ns()}-{duration * 1000:.0f}ms.prof"
+        profiler.dump_stats(os.path.join(directory, name))
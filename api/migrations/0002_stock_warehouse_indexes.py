@@ -0,0 +1,50 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['product', 'warehouse', 'quantity'], name='stock_product_wh_qty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='warehouse',
+            index=models.Index(fields=['owner', 'id'], name='warehouse_owner_id_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='stock',
+            constraint=models.UniqueConstraint(fields=('warehouse', 'product'), name='stock_warehouse_product_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='stock',
+            constraint=models.CheckConstraint(condition=models.Q(('quantity__gte', 0)), name='stock_quantity_non_negative'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='stock',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='stock',
+            name='product',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='stocks', to='api.product'),
+        ),
+        migrations.AlterField(
+            model_name='stock',
+            name='warehouse',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='stocks', to='api.warehouse'),
+        ),
+        migrations.AlterField(
+            model_name='warehouse',
+            name='owner',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='warehouses', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:38
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def seed_ledger(apps, schema_editor):
+    # Существующие остатки становятся начальными движениями журнала
+    Stock = apps.get_model('api', 'Stock')
+    StockMovement = apps.get_model('api', 'StockMovement')
+    now = django.utils.timezone.now()
+    StockMovement.objects.bulk_create(
+        (
+            StockMovement(warehouse_id=w, product_id=p, delta=quantity, created_at=now)
+            for w, p, quantity in Stock.objects.filter(quantity__gt=0).values_list('warehouse_id', 'product_id', 'quantity').iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_stock_warehouse_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='api.product')),
+                ('warehouse', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='api.warehouse')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['warehouse', 'product', 'created_at'], name='movement_wh_product_time_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('as_of', models.DateTimeField()),
+                ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='api.product')),
+                ('warehouse', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='api.warehouse')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['warehouse', 'product', 'as_of'], name='snapshot_wh_product_time_idx')],
+            },
+        ),
+        migrations.RunPython(seed_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockStripe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveSmallIntegerField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='stripe_count',
+            field=models.PositiveSmallIntegerField(db_default=1, default=1),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(condition=models.Q(('stripe_count__gt', 1)), fields=['stripe_count'], name='stock_striped_idx'),
+        ),
+        migrations.AddField(
+            model_name='stockstripe',
+            name='stock',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='stripes', to='api.stock'),
+        ),
+        migrations.AddConstraint(
+            model_name='stockstripe',
+            constraint=models.UniqueConstraint(fields=('stock', 'number'), name='stripe_stock_number_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='stockstripe',
+            constraint=models.CheckConstraint(condition=models.Q(('quantity__gte', 0)), name='stripe_quantity_non_negative'),
+        ),
+    ]
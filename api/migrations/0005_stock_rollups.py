@@ -0,0 +1,71 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_rollups(apps, schema_editor):
+    # Начальные значения свёрток по существующим остаткам и полосам
+    from collections import defaultdict
+    Stock = apps.get_model('api', 'Stock')
+    StockStripe = apps.get_model('api', 'StockStripe')
+    ProductStockTotal = apps.get_model('api', 'ProductStockTotal')
+    WarehouseStockTotal = apps.get_model('api', 'WarehouseStockTotal')
+    stripes = defaultdict(int)
+    for stock_id, quantity in StockStripe.objects.values_list('stock_id', 'quantity').iterator():
+        stripes[stock_id] += quantity
+    products, warehouses = defaultdict(int), defaultdict(lambda: [0, 0])
+    rows = Stock.objects.values_list('id', 'warehouse_id', 'product_id', 'quantity', 'product__price')
+    for stock_id, warehouse_id, product_id, quantity, price in rows.iterator():
+        quantity += stripes[stock_id]
+        products[product_id] += quantity
+        warehouses[warehouse_id][0] += quantity
+        warehouses[warehouse_id][1] += quantity * price
+    ProductStockTotal.objects.bulk_create(
+        (ProductStockTotal(product_id=pk, quantity=quantity) for pk, quantity in products.items()), batch_size=1000
+    )
+    WarehouseStockTotal.objects.bulk_create(
+        (WarehouseStockTotal(warehouse_id=pk, quantity=quantity, value=value)
+         for pk, (quantity, value) in warehouses.items()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_stock_stripes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductStockTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WarehouseStockTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['quantity', 'id'], name='stock_quantity_id_idx'),
+        ),
+        migrations.AddField(
+            model_name='productstocktotal',
+            name='product',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stock_total', to='api.product'),
+        ),
+        migrations.AddField(
+            model_name='warehousestocktotal',
+            name='warehouse',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stock_total', to='api.warehouse'),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 class User(AbstractUser):
     USER_TYPE_CHOICES = (
@@ -22,10 +25,27 @@ class User(AbstractUser):
 
 User = get_user_model()
 
+class WarehouseQuerySet(models.QuerySet):
+    def with_owner(self):
+        """Загружает владельца одним JOIN, читая только то, что нужно WarehouseSerializer."""
+        return self.select_related('owner').only('id', 'name', 'address', 'owner__id', 'owner__username')
+
 class Warehouse(models.Model):
     name = models.CharField(max_length=100)
     address = models.CharField(max_length=255)
-    owner = models.ForeignKey(User, related_name='warehouses', on_delete=models.CASCADE)
+    # Индекс по владельцу — составной (owner, id) в Meta.indexes
+    owner = models.ForeignKey(User, related_name='warehouses', on_delete=models.CASCADE, db_index=False)
+    # Версия строки для /api/stocks/changes/ (api/delta.py)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = WarehouseQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Покрывает фильтр warehouse__owner=user вместе с JOIN по id
+            models.Index(fields=['owner', 'id'], name='warehouse_owner_id_idx'),
+            models.Index(fields=['updated_at'], name='warehouse_updated_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -34,17 +54,224 @@ class Product(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Версия строки для /api/stocks/changes/ (api/delta.py)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at'], name='product_updated_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+class StockQuerySet(models.QuerySet):
+    def with_total_quantity(self):
+        """
+        Добавляет total_quantity: количество основной строки плюс полосы
+        StockStripe (см. api/striping.py). Для остатков без полос подзапрос
+        ничего не находит по уникальному индексу.
+        """
+        stripes = (
+            StockStripe.objects.filter(stock=OuterRef('pk'))
+            .values('stock').annotate(total=Sum('quantity')).values('total')
+        )
+        return self.annotate(total_quantity=F('quantity') + Coalesce(Subquery(stripes), 0))
+
+    def visible_to(self, user):
+        """Остатки, доступные пользователю: поставщику — на его складах, потребителю — все."""
+        if user.user_type == 'supplier':
+            return self.filter(warehouse__owner=user)
+        elif user.user_type == 'consumer':
+            return self
+        return self.none()
+
 class Stock(models.Model):
-    warehouse = models.ForeignKey('Warehouse', related_name='stocks', on_delete=models.CASCADE)
-    product = models.ForeignKey('Product', related_name='stocks', on_delete=models.CASCADE)
+    # Отдельные индексы по внешним ключам не создаются: их покрывают
+    # уникальное ограничение (warehouse, product) и индекс (product, warehouse, quantity)
+    warehouse = models.ForeignKey('Warehouse', related_name='stocks', on_delete=models.CASCADE, db_index=False)
+    product = models.ForeignKey('Product', related_name='stocks', on_delete=models.CASCADE, db_index=False)
     quantity = models.PositiveIntegerField(default=0)
+    # Число полос счётчика: основная строка и stripe_count - 1 строк StockStripe
+    stripe_count = models.PositiveSmallIntegerField(default=1, db_default=1)
+    # Сумма активных резерваций (api/reservations.py); доступно quantity с
+    # полосами минус reserved. Резерв держится в основной строке, поэтому
+    # списание из полос его не затрагивает
+    reserved = models.PositiveIntegerField(default=0, db_default=0)
+
+    objects = StockQuerySet.as_manager()
 
     class Meta:
-        unique_together = ('warehouse', 'product')
+        constraints = [
+            # Цель ON CONFLICT в api.services и индекс для поиска по (warehouse, product)
+            models.UniqueConstraint(fields=['warehouse', 'product'], name='stock_warehouse_product_uniq'),
+            # Последний рубеж для условных списаний: база не допустит отрицательный остаток
+            models.CheckConstraint(condition=models.Q(quantity__gte=0), name='stock_quantity_non_negative'),
+            # Списание основной строки не может забрать зарезервированное количество
+            models.CheckConstraint(condition=models.Q(reserved__lte=F('quantity')), name='stock_reserved_within_quantity'),
+        ]
+        indexes = [
+            # Поиск остатков товара по всем складам читает только индекс
+            models.Index(fields=['product', 'warehouse', 'quantity'], name='stock_product_wh_qty_idx'),
+            # Частичный индекс: список остатков с полосами (api.striping) без чтения всей таблицы
+            models.Index(fields=['stripe_count'], condition=models.Q(stripe_count__gt=1), name='stock_striped_idx'),
+            # Список остатков ниже порога (/api/stocks/low/) читает диапазон индекса
+            models.Index(fields=['quantity', 'id'], name='stock_quantity_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} in {self.warehouse.name}: {self.quantity}"
+
+class StockStripe(models.Model):
+    """
+    Дополнительная полоса счётчика горячего остатка.
+
+    Количество остатка — Stock.quantity (полоса 0) плюс quantity всех его
+    полос; поставки и списания распределяются по полосам, чтобы не
+    конкурировать за одну блокировку строки.
+    """
+    stock = models.ForeignKey('Stock', related_name='stripes', on_delete=models.CASCADE, db_index=False)
+    number = models.PositiveSmallIntegerField()
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['stock', 'number'], name='stripe_stock_number_uniq'),
+            models.CheckConstraint(condition=models.Q(quantity__gte=0), name='stripe_quantity_non_negative'),
+        ]
+
+    def __str__(self):
+        return f"{self.stock_id}[{self.number}]: {self.quantity}"
+
+class Reservation(models.Model):
+    """
+    Резерв количества остатка за потребителем до expires_at (api/reservations.py).
+
+    Запись удаляется при подтверждении (списании), отмене или истечении
+    срока; Stock.reserved хранит сумму активных резерваций остатка.
+    """
+    # Индекс по stock нужен каскадному удалению остатка
+    stock = models.ForeignKey('Stock', related_name='reservations', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name='reservations', on_delete=models.CASCADE, db_index=False)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Подтверждение и отмена ищут резерв по (user, id), очистка — по сроку
+            models.Index(fields=['user', 'id'], name='reservation_user_id_idx'),
+            models.Index(fields=['expires_at'], name='reservation_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.stock_id}: {self.quantity} until {self.expires_at}"
+
+class StockMovement(models.Model):
+    """
+    Запись журнала движений остатков: знаковое изменение количества.
+
+    Журнал только дополняется; Stock.quantity — материализованный итог,
+    который восстанавливается из журнала (api/ledger.py).
+    """
+    warehouse = models.ForeignKey('Warehouse', related_name='movements', on_delete=models.CASCADE, db_index=False)
+    product = models.ForeignKey('Product', related_name='movements', on_delete=models.CASCADE, db_index=False)
+    delta = models.IntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # История и хвост после снимка для пары (склад, товар)
+            models.Index(fields=['warehouse', 'product', 'created_at'], name='movement_wh_product_time_idx'),
+            # Каскад при удалении товара и обработчики свёрток и отметок,
+            # которые фильтруют по товару, не просматривают весь журнал
+            models.Index(fields=['product', 'warehouse', 'created_at'], name='movement_product_wh_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.warehouse_id}/{self.product_id}: {self.delta:+d} at {self.created_at}"
+
+class StockSnapshot(models.Model):
+    """Остаток пары (склад, товар) с учётом всех движений с created_at <= as_of."""
+    warehouse = models.ForeignKey('Warehouse', related_name='snapshots', on_delete=models.CASCADE, db_index=False)
+    product = models.ForeignKey('Product', related_name='snapshots', on_delete=models.CASCADE, db_index=False)
+    quantity = models.IntegerField()
+    as_of = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['warehouse', 'product', 'as_of'], name='snapshot_wh_product_time_idx'),
+            models.Index(fields=['product', 'warehouse', 'as_of'], name='snapshot_product_wh_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.warehouse_id}/{self.product_id}: {self.quantity} as of {self.as_of}"
+
+class ProductStockTotal(models.Model):
+    """Свёртка: суммарное количество товара на всех складах (api/rollups.py)."""
+    product = models.OneToOneField('Product', related_name='stock_total', on_delete=models.CASCADE)
+    quantity = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.product_id}: {self.quantity}"
+
+class WarehouseStockTotal(models.Model):
+    """Свёртка: количество товаров на складе и их стоимость по текущим ценам (api/rollups.py)."""
+    warehouse = models.OneToOneField('Warehouse', related_name='stock_total', on_delete=models.CASCADE)
+    quantity = models.BigIntegerField(default=0)
+    value = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.warehouse_id}: {self.quantity} / {self.value}"
+
+class Tombstone(models.Model):
+    """
+    Отметка об удалении склада, товара или остатка для /api/stocks/changes/
+    (api/delta.py). Остатки, удалённые каскадом вместе со складом или
+    товаром, отдельных отметок не получают.
+    """
+    KIND_CHOICES = (
+        ('warehouse', 'Склад'),
+        ('product', 'Товар'),
+        ('stock', 'Остаток'),
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    # Владелец склада (для остатка — склада остатка): поставщик видит только
+    # свои отметки. Не внешний ключ — пользователь может быть уже удалён
+    owner_id = models.BigIntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} at {self.deleted_at}"
+
+class IdempotencyKey(models.Model):
+    """
+    Сохранённый ответ на запрос с заголовком Idempotency-Key (api/idempotency.py).
+
+    Повтор с тем же ключом получает этот ответ без повторного изменения
+    остатков; записи удаляются командой purge_idempotency_keys после expires_at.
+    """
+    user = models.ForeignKey(User, related_name='idempotency_keys', on_delete=models.CASCADE, db_index=False)
+    key = models.CharField(max_length=255)
+    # sha256 метода, пути и тела запроса: тот же ключ с другим запросом отклоняется
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.TextField(blank=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_user_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}:{self.key}"
@@ -0,0 +1,25 @@
+# api/pagination.py
+
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+class KeysetPagination(CursorPagination):
+    """
+    Курсорная (keyset) пагинация по первичному ключу.
+
+    Следующая страница выбирается условием id > курсор по индексу первичного
+    ключа, поэтому стоимость запроса не растёт с номером страницы, а вставки
+    между запросами не сдвигают выдачу. Размер страницы задаётся параметром
+    page_size, но не больше API_MAX_PAGE_SIZE.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 1000)
+
+class ProductKeysetPagination(KeysetPagination):
+    """Keyset-пагинация строк, сгруппированных по товару."""
+    ordering = 'product_id'
+
+class WarehouseKeysetPagination(KeysetPagination):
+    """Keyset-пагинация строк, сгруппированных по складу."""
+    ordering = 'warehouse_id'
@@ -0,0 +1,26 @@
+# api/parsers.py
+"""
+Парсер тел запросов JSON на orjson (см. api/renderers.py).
+
+orjson разбирает только UTF-8 и, как JSONParser при STRICT_JSON, не
+принимает NaN и Infinity. Для других кодировок, при STRICT_JSON = False
+и без установленного orjson работает стандартный JSONParser.
+"""
+import codecs
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from .renderers import orjson, FastJSONRenderer
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -9,8 +9,11 @@ class IsSupplier(permissions.BasePermission):
         return request.user and request.user.is_authenticated and request.user.user_type == 'supplier'
 
     def has_object_permission(self, request, view, obj):
-        # Дополнительно проверяем, что склад принадлежит текущему пользователю
-        return obj.owner == request.user
+        # Дополнительно проверяем, что склад принадлежит текущему пользователю;
+        # у товаров владельца нет
+        if not hasattr(obj, 'owner_id'):
+            return True
+        return obj.owner_id == request.user.pk
 
 class IsConsumer(permissions.BasePermission):
     """
@@ -23,3 +26,11 @@ class IsConsumer(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         # Здесь можно добавить дополнительную логику, если необходимо
         return True
+
+class IsSupplierOrConsumer(permissions.BasePermission):
+    """
+    Разрешает доступ пользователям с типом 'supplier' или 'consumer'.
+    """
+
+    def has_permission(self, request, view):
+        return request.user and request.user.is_authenticated and request.user.user_type in ('supplier', 'consumer')
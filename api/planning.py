@@ -0,0 +1,99 @@
+# api/planning.py
+"""
+Распределение списания товара по нескольким складам.
+
+Доступные количества товара на всех складах читаются одним запросом по
+индексу (product, warehouse, quantity); склады выбираются из кучи, поэтому
+план из k складов среди n строится за O(n + k log n), а не сортировкой
+всех остатков. Исполнение плана — атомарный пакет условных списаний
+apply_stock_movements (api/services.py): если остаток успел измениться,
+пакет не применяется и план строится заново.
+"""
+import heapq
+from .models import Stock
+from .services import apply_stock_movements, StockMutationError, CONSUME
+
+FEWEST_WAREHOUSES = 'fewest_warehouses'
+SMALLEST_FIRST = 'smallest_first'
+PREFERRED = 'preferred'
+STRATEGIES = (FEWEST_WAREHOUSES, SMALLEST_FIRST, PREFERRED)
+
+# Попытки исполнения, если остатки изменились между планом и списанием
+ATTEMPTS = 3
+
+PLAN_INSUFFICIENT = "Недостаточно товара на всех складах: доступно {}."
+PLAN_CONFLICT = "Остатки изменились во время исполнения плана, повторите запрос."
+
+
+class PlanningError(StockMutationError):
+    def __init__(self, message, available=None):
+        super().__init__(message)
+        self.available = available
+
+
+def available_by_warehouse(product_id):
+    """{warehouse_id: доступное количество} для складов, где товар есть."""
+    rows = (
+        Stock.objects.filter(product_id=product_id)
+        .with_total_quantity()
+        .values_list('warehouse_id', 'total_quantity', 'reserved')
+    )
+    return {warehouse_id: total - reserved for warehouse_id, total, reserved in rows if total > reserved}
+
+
+def _take(heap, quantity, sign):
+    allocation = []
+    while quantity > 0 and heap:
+        available, warehouse_id = heapq.heappop(heap)
+        amount = min(sign * available, quantity)
+        allocation.append((warehouse_id, amount))
+        quantity -= amount
+    return allocation
+
+
+def allocate(available, quantity, strategy=FEWEST_WAREHOUSES, preferred=()):
+    """
+    Распределяет quantity по {warehouse_id: доступно}; возвращает
+    [(warehouse_id, количество), ...] или PlanningError, если не хватает.
+
+    fewest_warehouses берёт склады с наибольшим остатком — это наименьшее
+    возможное число складов; smallest_first опустошает сначала наименьшие
+    остатки; preferred берёт склады списка по порядку, а остаток — как
+    fewest_warehouses.
+    """
+    total = sum(available.values())
+    if total < quantity:
+        raise PlanningError(PLAN_INSUFFICIENT.format(total), available=total)
+    allocation = []
+    if strategy == PREFERRED:
+        for warehouse_id in dict.fromkeys(preferred):
+            if quantity == 0:
+                break
+            amount = min(available.get(warehouse_id, 0), quantity)
+            if amount:
+                allocation.append((warehouse_id, amount))
+                quantity -= amount
+        used = {warehouse_id for warehouse_id, _ in allocation}
+        available = {w: a for w, a in available.items() if w not in used}
+    sign = 1 if strategy == SMALLEST_FIRST else -1
+    heap = [(sign * amount, warehouse_id) for warehouse_id, amount in available.items()]
+    heapq.heapify(heap)
+    return allocation + _take(heap, quantity, sign)
+
+
+def plan_fulfillment(product_id, quantity, strategy=FEWEST_WAREHOUSES, preferred=(), user=None):
+    """
+    Строит план списания; если передан user, исполняет его атомарно.
+    Возвращает (план, список Stock после списания или None).
+    """
+    for _ in range(ATTEMPTS):
+        allocation = allocate(available_by_warehouse(product_id), quantity, strategy, preferred)
+        if user is None:
+            return allocation, None
+        results = apply_stock_movements([
+            {'warehouse': warehouse_id, 'product': product_id, 'quantity': amount, 'direction': CONSUME}
+            for warehouse_id, amount in allocation
+        ], user, atomic=True)
+        if not any(isinstance(result, StockMutationError) for result in results):
+            return allocation, results
+    raise PlanningError(PLAN_CONFLICT)
@@ -0,0 +1,40 @@
+# api/renderers.py
+"""
+Рендерер JSON на orjson.
+
+orjson сериализует списки остатков в несколько раз быстрее json из
+стандартной библиотеки. Типы, которые orjson не знает (Decimal, ленивые
+строки, datetime — чтобы формат совпадал с DRF), передаются в
+encoder_class DRF. Если orjson не установлен, клиент просит отступы
+(Accept: application/json; indent=4) или настройки UNICODE_JSON /
+COMPACT_JSON требуют другого вывода, работает стандартный JSONRenderer.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Как и JSONRenderer, экранируем U+2028 и U+2029: ответ остаётся
+# допустимым литералом JavaScript
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            # Например, целые больше 64 бит: их сериализует стандартный json
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace(LINE_SEPARATOR, b'\\u2028').replace(PARAGRAPH_SEPARATOR, b'\\u2029')
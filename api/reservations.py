@@ -0,0 +1,155 @@
+# api/reservations.py
+"""
+Резервы остатков с ограниченным сроком действия.
+
+Резерв удерживает n единиц пары (склад, товар) за потребителем до
+expires_at: затем он подтверждается (превращается в списание) или
+отменяется. Сумма активных резервов хранится в Stock.reserved основной
+строки, поэтому доступное количество (quantity с полосами минус reserved)
+читается без обхода строк Reservation, а резерв берётся условным UPDATE
+с выражением F(), как списание (api/services.py). Ограничение
+stock_reserved_within_quantity не даёт списанию забрать резерв.
+
+Просроченные резервы снимаются командой sweep_reservations пакетами
+ограниченного размера; до этого их нельзя подтвердить, но можно отменить.
+"""
+import datetime
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Case, When, Value, IntegerField
+from django.utils import timezone
+from . import availability
+from .ledger import record_movements
+from .models import Stock, Reservation
+from .services import (
+    StockMutationError, INVALID_QUANTITY, NOT_AVAILABLE, INSUFFICIENT,
+    _parse_id, _parse_quantity, _check_references, _stock_after,
+)
+from .striping import collapse_stripes
+
+RESERVATION_NOT_FOUND = "Резерв не найден или срок его действия истёк."
+INVALID_TTL = "Срок резерва должен быть целым числом секунд от 1 до {}."
+
+
+def _ttl(value):
+    max_ttl = getattr(settings, 'STOCK_RESERVATION_MAX_TTL', 24 * 60 * 60)
+    if value is None:
+        return getattr(settings, 'STOCK_RESERVATION_TTL', 15 * 60)
+    seconds = _parse_quantity(value)
+    if seconds is None or seconds > max_ttl:
+        raise StockMutationError(INVALID_TTL.format(max_ttl))
+    return seconds
+
+
+def _hold(warehouse_id, product_id, amount):
+    stocks = Stock.objects.filter(warehouse_id=warehouse_id, product_id=product_id)
+    if not stocks.filter(quantity__gte=F('reserved') + amount).update(reserved=F('reserved') + amount):
+        return None
+    return stocks.values_list('id', flat=True).get()
+
+
+def reserve_stock(warehouse, product, quantity, user, ttl=None):
+    """
+    Резервирует quantity единиц остатка за пользователем на ttl секунд
+    (по умолчанию STOCK_RESERVATION_TTL). Возвращает Reservation.
+
+    Резерв помещается в основную строку Stock; если её количества не
+    хватает, а остаток разбит на полосы, полосы сводятся в основную строку.
+    """
+    warehouse_id, product_id = _parse_id(warehouse), _parse_id(product)
+    amount = _parse_quantity(quantity)
+    if warehouse_id is None or product_id is None or amount is None:
+        _check_references(warehouse_id, product_id)
+        raise StockMutationError(INVALID_QUANTITY)
+    seconds = _ttl(ttl)
+
+    with transaction.atomic():
+        stock_id = _hold(warehouse_id, product_id, amount)
+        if stock_id is None:
+            stock = Stock.objects.filter(warehouse_id=warehouse_id, product_id=product_id).values_list(
+                'id', 'stripe_count'
+            ).first()
+            if stock is not None and stock[1] > 1:
+                _, total = collapse_stripes(stock[0])
+                Stock.objects.filter(pk=stock[0]).update(quantity=total)
+                stock_id = _hold(warehouse_id, product_id, amount)
+            if stock_id is None:
+                # Исключение откатывает и сведение полос
+                _check_references(warehouse_id, product_id)
+                raise StockMutationError(NOT_AVAILABLE if stock is None else INSUFFICIENT)
+        reservation = Reservation.objects.create(
+            stock=Stock(id=stock_id, warehouse_id=warehouse_id, product_id=product_id),
+            user=user, quantity=amount, expires_at=timezone.now() + datetime.timedelta(seconds=seconds),
+        )
+        availability.apply_movements([(warehouse_id, product_id, -amount)])
+    return reservation
+
+
+def _take(reservation_id, user, now=None):
+    """Удаляет резерв пользователя; возвращает (stock_id, quantity) или None."""
+    reservations = Reservation.objects.filter(pk=reservation_id, user=user)
+    if now is not None:
+        reservations = reservations.filter(expires_at__gt=now)
+    row = reservations.select_for_update().values_list('stock_id', 'quantity').first()
+    # Резерв, который параллельно подтвердили или сняли, не удаляется повторно
+    if row is None or not Reservation.objects.filter(pk=reservation_id).delete()[0]:
+        return None
+    return row
+
+
+def confirm_reservation(reservation_id, user):
+    """Списывает зарезервированное количество; возвращает Stock после списания."""
+    with transaction.atomic():
+        row = _take(_parse_id(reservation_id), user, now=timezone.now())
+        if row is None:
+            raise StockMutationError(RESERVATION_NOT_FOUND)
+        stock_id, amount = row
+        stocks = Stock.objects.filter(pk=stock_id)
+        stocks.update(quantity=F('quantity') - amount, reserved=F('reserved') - amount)
+        stock = _stock_after(stocks)
+        record_movements([(stock.warehouse_id, stock.product_id, -amount)])
+        # Доступное количество не меняется: резерв уже вычтен из него, а
+        # record_movements вычитает списание ещё раз
+        availability.apply_movements([(stock.warehouse_id, stock.product_id, amount)])
+    return stock
+
+
+def release_reservation(reservation_id, user):
+    """Отменяет резерв пользователя, в том числе просроченный."""
+    with transaction.atomic():
+        row = _take(_parse_id(reservation_id), user)
+        if row is None:
+            raise StockMutationError(RESERVATION_NOT_FOUND)
+        _release([row])
+
+
+def _release(rows):
+    totals = defaultdict(int)
+    for stock_id, amount in rows:
+        totals[stock_id] += amount
+    stocks = Stock.objects.filter(id__in=totals)
+    keys = list(stocks.values_list('id', 'warehouse_id', 'product_id'))
+    # Один UPDATE для всех остатков пакета: своя сумма для каждой строки
+    released = Case(*(When(id=stock_id, then=Value(amount)) for stock_id, amount in totals.items()),
+                    output_field=IntegerField())
+    stocks.update(reserved=F('reserved') - released)
+    availability.apply_movements([(w, p, totals[stock_id]) for stock_id, w, p in keys])
+
+
+def sweep_expired(batch_size=1000, now=None):
+    """Снимает просроченные резервы пакетами по batch_size строк; возвращает число снятых."""
+    now = now or timezone.now()
+    released = 0
+    while True:
+        # Каждый пакет — отдельная короткая транзакция по индексу expires_at
+        with transaction.atomic():
+            rows = list(
+                Reservation.objects.select_for_update().filter(expires_at__lte=now)
+                .order_by('expires_at').values_list('id', 'stock_id', 'quantity')[:batch_size]
+            )
+            if not rows:
+                return released
+            Reservation.objects.filter(id__in=[row[0] for row in rows]).delete()
+            _release([row[1:] for row in rows])
+        released += len(rows)
@@ -0,0 +1,120 @@
+# api/rollups.py
+"""
+Свёртки остатков для агрегирующих эндпоинтов.
+
+ProductStockTotal хранит количество товара по всем складам,
+WarehouseStockTotal — количество и стоимость (quantity × Product.price)
+товаров на складе. Свёртки обновляются в той же транзакции, что и остатки:
+record_movements (api/ledger.py) передаёт сюда изменения каждого пакета,
+и они применяются двумя многострочными upsert. Изменение цены и удаление
+товара или склада корректируются сигналами (api/signals.py), поэтому запрос
+дашборда читает только строки результата, а не все остатки. Многострочный
+upsert ORM не выражает, поэтому apply_movements написан на SQL.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from django.db import connection, transaction
+from django.db.models import F, Sum, Value, DecimalField, ExpressionWrapper, OuterRef, Subquery
+from .cache import product_cache
+from .models import Stock, ProductStockTotal, WarehouseStockTotal
+
+
+def _prices(product_ids):
+    # Цены берутся из кэша товаров, чтобы изменение остатка не читало Product
+    return {pk: Decimal(entry['data']['price']) for pk, entry in product_cache.get_many(product_ids).items()}
+
+
+def apply_movements(rows, prices=None):
+    """
+    Прибавляет изменения [(warehouse_id, product_id, delta), ...] к свёрткам.
+    Цены {product_id: price}, уже известные вызывающему, не читаются из кэша.
+    """
+    by_product = defaultdict(int)
+    by_warehouse = defaultdict(lambda: [0, Decimal(0)])
+    if prices is None:
+        prices = _prices({product_id for _, product_id, _ in rows})
+    for warehouse_id, product_id, delta in rows:
+        by_product[product_id] += delta
+        by_warehouse[warehouse_id][0] += delta
+        by_warehouse[warehouse_id][1] += delta * prices.get(product_id, 0)
+
+    # api.services импортирует ledger, а тот — этот модуль
+    from .services import _table
+
+    product_table, warehouse_table = _table(ProductStockTotal), _table(WarehouseStockTotal)
+    with connection.cursor() as cursor:
+        if by_product:
+            cursor.execute(
+                f"INSERT INTO {product_table} (product_id, quantity) "
+                f"VALUES {', '.join('(%s, %s)' for _ in by_product)} "
+                f"ON CONFLICT (product_id) DO UPDATE SET quantity = {product_table}.quantity + excluded.quantity",
+                [value for item in by_product.items() for value in item],
+            )
+        if by_warehouse:
+            cursor.execute(
+                f"INSERT INTO {warehouse_table} (warehouse_id, quantity, value) "
+                f"VALUES {', '.join('(%s, %s, %s)' for _ in by_warehouse)} "
+                f"ON CONFLICT (warehouse_id) DO UPDATE SET "
+                f"quantity = {warehouse_table}.quantity + excluded.quantity, "
+                f"value = {warehouse_table}.value + excluded.value",
+                [value for w, (quantity, amount) in by_warehouse.items() for value in (w, quantity, amount)],
+            )
+
+
+def _stock_total(**filters):
+    # Количество остатка с учётом полос для коррелированных подзапросов
+    return Subquery(Stock.objects.filter(**filters).with_total_quantity().values('total_quantity')[:1])
+
+
+def _amount(expression):
+    return ExpressionWrapper(expression, output_field=DecimalField(max_digits=20, decimal_places=2))
+
+
+def product_repriced(product_id, old_price, new_price):
+    """Пересчитывает стоимость складов, на которых есть товар, на разницу цен."""
+    total = _stock_total(warehouse_id=OuterRef('warehouse_id'), product_id=product_id)
+    WarehouseStockTotal.objects.filter(
+        warehouse_id__in=Stock.objects.filter(product_id=product_id).values('warehouse_id')
+    ).update(value=F('value') + _amount(Value(Decimal(new_price) - Decimal(old_price)) * total))
+
+
+def product_removed(product_id, price):
+    """Вычитает остатки удаляемого товара из свёрток складов."""
+    total = _stock_total(warehouse_id=OuterRef('warehouse_id'), product_id=product_id)
+    WarehouseStockTotal.objects.filter(
+        warehouse_id__in=Stock.objects.filter(product_id=product_id).values('warehouse_id')
+    ).update(quantity=F('quantity') - total, value=F('value') - _amount(Value(Decimal(price)) * total))
+
+
+def warehouse_removed(warehouse_id):
+    """Вычитает остатки удаляемого склада из свёрток товаров."""
+    total = _stock_total(product_id=OuterRef('product_id'), warehouse_id=warehouse_id)
+    ProductStockTotal.objects.filter(
+        product_id__in=Stock.objects.filter(warehouse_id=warehouse_id).values('product_id')
+    ).update(quantity=F('quantity') - total)
+
+
+def rebuild_rollups():
+    """Пересчитывает свёртки агрегатами по всем остаткам."""
+    stocks = Stock.objects.with_total_quantity()
+    value = ExpressionWrapper(
+        F('total_quantity') * F('product__price'), output_field=DecimalField(max_digits=20, decimal_places=2)
+    )
+    with transaction.atomic():
+        ProductStockTotal.objects.all().delete()
+        WarehouseStockTotal.objects.all().delete()
+        ProductStockTotal.objects.bulk_create(
+            (
+                ProductStockTotal(product_id=row['product_id'], quantity=row['total'])
+                for row in stocks.values('product_id').annotate(total=Sum('total_quantity')).order_by()
+            ),
+            batch_size=1000,
+        )
+        WarehouseStockTotal.objects.bulk_create(
+            (
+                WarehouseStockTotal(warehouse_id=row['warehouse_id'], quantity=row['total'], value=row['value'])
+                for row in stocks.values('warehouse_id')
+                .annotate(total=Sum('total_quantity'), value=Sum(value)).order_by()
+            ),
+            batch_size=1000,
+        )
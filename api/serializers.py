@@ -1,18 +1,58 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth import authenticate
-from .models import Warehouse, Product, Stock
+from django.contrib.auth.hashers import make_password
+from .hashers import get_hashing_pool
+from .metrics import serializer_timer
+from .models import Warehouse, Product, Stock, Reservation
 
 User = get_user_model()
 
-class UserRegistrationSerializer(serializers.ModelSerializer):
+class TimedDataMixin:
+    """Учитывает построение data в метриках запроса (api/metrics.py)."""
+
+    @property
+    def data(self):
+        with serializer_timer():
+            return super().data
+
+class TimedListSerializer(TimedDataMixin, serializers.ListSerializer):
+    pass
+
+class SparseFieldsetMixin:
+    """
+    Оставляет в ответе только поля из параметра ?fields=id,quantity,...
+
+    Неизвестные имена игнорируются; без параметра возвращаются все поля.
+    """
+
+    @staticmethod
+    def requested_fields(request):
+        if request is None:
+            return None
+        # Поддерживает и запрос DRF, и HttpRequest асинхронных представлений
+        raw = getattr(request, 'query_params', request.GET).get('fields')
+        if not raw:
+            return None
+        return {name.strip() for name in raw.split(',') if name.strip()}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.requested_fields(self.context.get('request'))
+        if requested:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+class UserRegistrationSerializer(TimedDataMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
     password2 = serializers.CharField(write_only=True, required=True)
 
     class Meta:
         model = User
         fields = ('username', 'email', 'password', 'password2', 'user_type')
+        list_serializer_class = TimedListSerializer
         extra_kwargs = {
             'user_type': {'required': False},
         }
@@ -23,13 +63,13 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return attrs
 
     def create(self, validated_data):
-        validated_data.pop('password2', None)
-        user = User.objects.create(
+        # Хэш вычисляется в пуле (api/hashers.py), пользователь сохраняется одним INSERT
+        user = User(
             username=validated_data['username'],
             email=validated_data['email'],
-            user_type=validated_data.get('user_type')
+            user_type=validated_data.get('user_type'),
+            password=get_hashing_pool().run(make_password, validated_data['password']),
         )
-        user.set_password(validated_data['password'])
         user.save()
         return user
 
@@ -50,24 +90,138 @@ class UserLoginSerializer(serializers.Serializer):
         attrs['user'] = user
         return attrs
 
-class WarehouseSerializer(serializers.ModelSerializer):
+class WarehouseSerializer(TimedDataMixin, serializers.ModelSerializer):
     owner = serializers.ReadOnlyField(source='owner.username')
 
     class Meta:
         model = Warehouse
         fields = ['id', 'name', 'address', 'owner']
+        list_serializer_class = TimedListSerializer
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(TimedDataMixin, serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = ['id', 'name', 'description', 'price']
+        list_serializer_class = TimedListSerializer
 
-class StockSerializer(serializers.ModelSerializer):
+class StockSerializer(TimedDataMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     warehouse = serializers.PrimaryKeyRelatedField(queryset=Warehouse.objects.all())
     product = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
-    product_detail = ProductSerializer(source='product', read_only=True)
-    warehouse_detail = WarehouseSerializer(source='warehouse', read_only=True)
+    product_detail = serializers.SerializerMethodField()
+    warehouse_detail = serializers.SerializerMethodField()
+    quantity = serializers.SerializerMethodField()
+    reserved = serializers.IntegerField(read_only=True)
+    available = serializers.SerializerMethodField()
 
     class Meta:
         model = Stock
-        fields = ['id', 'warehouse', 'warehouse_detail', 'product', 'product_detail', 'quantity']
+        fields = ['id', 'warehouse', 'warehouse_detail', 'product', 'product_detail', 'quantity', 'reserved',
+                  'available']
+        list_serializer_class = TimedListSerializer
+
+    # Представления складов и товаров берутся из контекста (см. api.cache.
+    # stock_detail_context), если представление их передало; иначе — из
+    # связанных объектов
+    def get_product_detail(self, obj):
+        details = self.context.get('product_details') or {}
+        if obj.product_id in details:
+            return details[obj.product_id]
+        return ProductSerializer(obj.product).data
+
+    def get_warehouse_detail(self, obj):
+        details = self.context.get('warehouse_details') or {}
+        if obj.warehouse_id in details:
+            return details[obj.warehouse_id]
+        return WarehouseSerializer(obj.warehouse).data
+
+    def get_quantity(self, obj):
+        # Количество на складе: сумма полос, если queryset добавил её
+        # (Stock.objects.with_total_quantity())
+        return getattr(obj, 'total_quantity', obj.quantity)
+
+    def get_available(self, obj):
+        # Доступно для списания: количество на складе без резерва (api/reservations.py)
+        return self.get_quantity(obj) - obj.reserved
+
+# Поля values() для stock_rows; queryset должен добавить total_quantity
+STOCK_VALUES = ('id', 'warehouse_id', 'product_id', 'total_quantity', 'reserved')
+
+def stock_rows(rows, context):
+    """
+    Представления остатков, совпадающие с StockSerializer(many=True).data, из
+    строк queryset.values(*STOCK_VALUES) — без создания моделей и объектов
+    полей сериализатора. Только для чтения; склады и товары берутся из
+    контекста stock_detail_context, ?fields= учитывается так же.
+    """
+    with serializer_timer():
+        products = context.get('product_details') or {}
+        warehouses = context.get('warehouse_details') or {}
+        data = [
+            {
+                'id': row['id'],
+                'warehouse': row['warehouse_id'],
+                'warehouse_detail': warehouses.get(row['warehouse_id']),
+                'product': row['product_id'],
+                'product_detail': products.get(row['product_id']),
+                'quantity': row['total_quantity'],
+                'reserved': row['reserved'],
+                'available': row['total_quantity'] - row['reserved'],
+            }
+            for row in rows
+        ]
+        requested = SparseFieldsetMixin.requested_fields(context.get('request'))
+        if requested:
+            data = [{name: value for name, value in item.items() if name in requested} for item in data]
+        return data
+
+class ReservationSerializer(TimedDataMixin, serializers.ModelSerializer):
+    # Склад и товар читаются по *_id остатка без запроса к Stock
+    warehouse = serializers.IntegerField(source='stock.warehouse_id', read_only=True)
+    product = serializers.IntegerField(source='stock.product_id', read_only=True)
+
+    class Meta:
+        model = Reservation
+        fields = ['id', 'warehouse', 'product', 'quantity', 'expires_at']
+        list_serializer_class = TimedListSerializer
+
+class StockMovementSerializer(serializers.Serializer):
+    warehouse = serializers.IntegerField()
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+    direction = serializers.ChoiceField(choices=['supply', 'consume'])
+
+class FulfillmentPlanSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+    strategy = serializers.ChoiceField(
+        choices=['fewest_warehouses', 'smallest_first', 'preferred'], default='fewest_warehouses'
+    )
+    preferred = serializers.ListField(child=serializers.IntegerField(), required=False, default=list, max_length=1000)
+    execute = serializers.BooleanField(default=False)
+
+class StockMovementBatchSerializer(serializers.Serializer):
+    items = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+    atomic = serializers.BooleanField(default=True)
+
+    def validate_items(self, value):
+        max_items = getattr(settings, 'STOCK_MOVEMENTS_BATCH_MAX', 1000)
+        if len(value) > max_items:
+            raise serializers.ValidationError(f"Не более {max_items} позиций в одном пакете.")
+        return value
+
+# Строки свёрток (api/rollups.py) и агрегатов values(): поля читаются по *_id,
+# поэтому одинаково сериализуются модели и словари
+class ProductStockTotalSerializer(TimedDataMixin, serializers.Serializer):
+    product = serializers.IntegerField(source='product_id')
+    quantity = serializers.IntegerField()
+
+    class Meta:
+        list_serializer_class = TimedListSerializer
+
+class WarehouseStockTotalSerializer(TimedDataMixin, serializers.Serializer):
+    warehouse = serializers.IntegerField(source='warehouse_id')
+    quantity = serializers.IntegerField()
+    value = serializers.DecimalField(max_digits=20, decimal_places=2)
+
+    class Meta:
+        list_serializer_class = TimedListSerializer
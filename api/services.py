@@ -0,0 +1,532 @@
+# api/services.py
+"""
+Движок изменения остатков (Stock).
+
+Поставка и списание выполняются условным запросом без чтения строки в
+Python: количество меняется выражением F() на стороне базы, поэтому
+параллельные запросы не теряют обновлений. Списание — UPDATE с условием
+на остаток, о нехватке сообщает число изменённых строк. Поставка — upsert
+INSERT ... ON CONFLICT, который ORM не выражает, поэтому он написан на SQL.
+Дополнительные запросы выполняются только на пути ошибки, чтобы вернуть
+клиенту то же сообщение, что и раньше.
+
+Каждое изменение записывает движение в журнал (api/ledger.py) в той же
+транзакции, что и изменение остатка. При включённом STOCK_WRITE_COALESCING
+одновременные изменения одной пары (склад, товар) применяются пакетом
+(api/coalescing.py), а остатки с полосами (api/striping.py) изменяются по
+полосам.
+
+Списание не затрагивает зарезервированное количество (Stock.reserved,
+api/reservations.py): условия сравнивают с n разность quantity - reserved.
+"""
+import random
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction, IntegrityError
+from django.db.models import F
+from .coalescing import get_coalescer
+from .ledger import record_movements
+from .models import Warehouse, Product, Stock, StockStripe
+from .striping import striped_stocks, collapse_stripes, total_quantity
+
+SUPPLY = 'supply'
+CONSUME = 'consume'
+
+FORBIDDEN = "У вас нет прав для выполнения этого действия."
+WAREHOUSE_NOT_OWNED = "Склад не найден или вы не являетесь его владельцем."
+WAREHOUSE_NOT_FOUND = "Склад не найден."
+PRODUCT_NOT_FOUND = "Товар не найден."
+INVALID_QUANTITY = "Количество должно быть положительным."
+NOT_AVAILABLE = "Товар не доступен на данном складе."
+INSUFFICIENT = "Недостаточно товара на складе."
+
+
+class StockMutationError(Exception):
+    """Ошибка изменения остатка. Текст сообщения возвращается клиенту."""
+
+
+def _parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_quantity(value):
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        return None
+    try:
+        quantity = int(value)
+    except (TypeError, ValueError):
+        return None
+    return quantity if quantity > 0 else None
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def _check_references(warehouse_id, product_id, owner=None):
+    # Порядок проверок совпадает с исходными представлениями: склад, товар
+    warehouses = Warehouse.objects.filter(pk=warehouse_id)
+    if owner is not None:
+        warehouses = warehouses.filter(owner=owner)
+    if warehouse_id is None or not warehouses.exists():
+        if owner is not None:
+            raise StockMutationError(WAREHOUSE_NOT_OWNED)
+        raise StockMutationError(WAREHOUSE_NOT_FOUND)
+    if product_id is None or not Product.objects.filter(pk=product_id).exists():
+        raise StockMutationError(PRODUCT_NOT_FOUND)
+
+
+def _flush_coalesced(key, operations):
+    """
+    Применяет очередь операций [(direction, amount, owner_id), ...] одной пары.
+
+    Строка блокируется пустым UPDATE, операции проигрываются по порядку
+    поступления над прочитанным количеством, и каждая получает свой ответ:
+    Stock после неё или StockMutationError. В базу записывается один
+    суммарный UPDATE (или вставка новой строки) и движения журнала.
+
+    Очередь выбирается по списку striped_stocks(), который может отставать
+    от базы: если строка уже разбита на полосы, количество читается с учётом
+    полос, а перед списаниями полосы сводятся в основную строку, как при
+    списании через все полосы (_consume_across_stripes).
+    """
+    warehouse_id, product_id = key
+    stock_table = _table(Stock)
+    results, movements = [], []
+    stocks = Stock.objects.filter(warehouse_id=warehouse_id, product_id=product_id)
+    with transaction.atomic():
+        # Пустой UPDATE блокирует строку до конца транзакции
+        stocks.update(quantity=F('quantity'))
+        stock_id, quantity, stripes, reserved = (
+            stocks.values_list('id', 'quantity', 'stripe_count', 'reserved').first() or (None, None, 1, 0)
+        )
+        initial = quantity
+        if stripes > 1:
+            if any(direction == CONSUME for direction, _, _ in operations):
+                initial, quantity = collapse_stripes(stock_id)
+            else:
+                initial = quantity = total_quantity(stock_id)
+        owner_id = Warehouse.objects.filter(pk=warehouse_id).values_list('owner_id', flat=True).first()
+        product_exists = Product.objects.filter(pk=product_id).exists()
+
+        for direction, amount, user_id in operations:
+            if direction == SUPPLY:
+                if owner_id is None or owner_id != user_id:
+                    results.append(StockMutationError(WAREHOUSE_NOT_OWNED))
+                    continue
+                error = None if product_exists else PRODUCT_NOT_FOUND
+            elif owner_id is None:
+                error = WAREHOUSE_NOT_FOUND
+            elif not product_exists:
+                error = PRODUCT_NOT_FOUND
+            elif quantity is None:
+                error = NOT_AVAILABLE
+            else:
+                error = INSUFFICIENT if quantity - reserved < amount else None
+            if error is not None:
+                results.append(StockMutationError(error))
+                continue
+            delta = amount if direction == SUPPLY else -amount
+            quantity = (quantity or 0) + delta
+            movements.append((warehouse_id, product_id, delta))
+            results.append(quantity)
+
+        if stock_id is not None and quantity != initial:
+            Stock.objects.filter(pk=stock_id).update(quantity=F('quantity') + (quantity - initial))
+        elif stock_id is None and quantity is not None:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {stock_table} (warehouse_id, product_id, quantity) VALUES (%s, %s, %s) "
+                    f"ON CONFLICT (warehouse_id, product_id) "
+                    f"DO UPDATE SET quantity = {stock_table}.quantity + excluded.quantity RETURNING id",
+                    [warehouse_id, product_id, quantity],
+                )
+                stock_id = cursor.fetchone()[0]
+        if movements:
+            record_movements(movements)
+
+    return [
+        result if isinstance(result, StockMutationError)
+        else Stock(id=stock_id, warehouse_id=warehouse_id, product_id=product_id, quantity=result, reserved=reserved)
+        for result in results
+    ]
+
+
+def _coalescer():
+    # Внутри внешней транзакции изменение должно остаться в ней, а ведущий
+    # поток пакета пишет в своей транзакции
+    if connection.in_atomic_block:
+        return None
+    return get_coalescer(_flush_coalesced)
+
+
+def _stripe_count(warehouse_id, product_id):
+    if warehouse_id is None or product_id is None:
+        return None
+    return striped_stocks().get((warehouse_id, product_id))
+
+
+def _striped_result(warehouse_id, product_id):
+    stock_id, quantity, reserved = (
+        Stock.objects.with_total_quantity().values_list('id', 'total_quantity', 'reserved')
+        .get(warehouse_id=warehouse_id, product_id=product_id)
+    )
+    return Stock(id=stock_id, warehouse_id=warehouse_id, product_id=product_id, quantity=quantity, reserved=reserved)
+
+
+def _stock_after(stocks):
+    """Stock по строке, изменённой в текущей транзакции (она уже заблокирована)."""
+    stock_id, warehouse_id, product_id, quantity, stripes, reserved = stocks.values_list(
+        'id', 'warehouse_id', 'product_id', 'quantity', 'stripe_count', 'reserved'
+    ).get()
+    if stripes > 1:
+        return _striped_result(warehouse_id, product_id)
+    return Stock(id=stock_id, warehouse_id=warehouse_id, product_id=product_id, quantity=quantity, reserved=reserved)
+
+
+def _supply_stripe(warehouse_id, product_id, amount, owner, number):
+    # Полоса 0 — основная строка Stock, её увеличивает обычный путь поставки
+    if number == 0:
+        return None
+    stripes = StockStripe.objects.filter(
+        number=number, stock__warehouse_id=warehouse_id, stock__product_id=product_id, stock__warehouse__owner=owner,
+    )
+    with transaction.atomic():
+        if not stripes.update(quantity=F('quantity') + amount):
+            return None
+        record_movements([(warehouse_id, product_id, amount)])
+    return _striped_result(warehouse_id, product_id)
+
+
+def _consume_stripes(warehouse_id, product_id, amount, stripes):
+    """Списывает из первой полосы с достаточным количеством, начиная со случайной."""
+    start = random.randrange(stripes)
+    for number in ((start + offset) % stripes for offset in range(stripes)):
+        if number == 0:
+            rows = Stock.objects.filter(
+                warehouse_id=warehouse_id, product_id=product_id, quantity__gte=F('reserved') + amount
+            )
+        else:
+            rows = StockStripe.objects.filter(
+                number=number, quantity__gte=amount, stock__warehouse_id=warehouse_id, stock__product_id=product_id
+            )
+        with transaction.atomic():
+            if rows.update(quantity=F('quantity') - amount):
+                record_movements([(warehouse_id, product_id, -amount)])
+                return _striped_result(warehouse_id, product_id)
+    return None
+
+
+def _consume_across_stripes(stock_id, warehouse_id, product_id, amount):
+    """Списание, которое не помещается ни в одну полосу: полосы сводятся в основную строку."""
+    with transaction.atomic():
+        _, total = collapse_stripes(stock_id)
+        # Основная строка уже заблокирована collapse_stripes
+        reserved = Stock.objects.values_list('reserved', flat=True).get(pk=stock_id)
+        if total - reserved < amount:
+            raise StockMutationError(INSUFFICIENT)
+        Stock.objects.filter(pk=stock_id).update(quantity=total - amount)
+        record_movements([(warehouse_id, product_id, -amount)])
+    return Stock(id=stock_id, warehouse_id=warehouse_id, product_id=product_id, quantity=total - amount,
+                 reserved=reserved)
+
+
+def supply_stock(warehouse, product, quantity, owner):
+    """
+    Увеличивает остаток товара на складе владельца.
+
+    Выполняется одним запросом INSERT ... ON CONFLICT по уникальной паре
+    (warehouse, product); принадлежность склада и существование товара
+    проверяются в том же запросе. Возвращает Stock с актуальным количеством.
+    """
+    warehouse_id, product_id = _parse_id(warehouse), _parse_id(product)
+    amount = _parse_quantity(quantity)
+    if amount is None:
+        _check_references(warehouse_id, product_id, owner=owner)
+        raise StockMutationError(INVALID_QUANTITY)
+
+    stripes = _stripe_count(warehouse_id, product_id)
+    if stripes:
+        stock = _supply_stripe(warehouse_id, product_id, amount, owner, random.randrange(stripes))
+        if stock is not None:
+            return stock
+
+    coalescer = None if stripes else _coalescer()
+    if coalescer is not None and warehouse_id is not None and product_id is not None:
+        return coalescer.submit((warehouse_id, product_id), (SUPPLY, amount, owner.pk))
+
+    row = None
+    if warehouse_id is not None and product_id is not None:
+        stock_table = _table(Stock)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {stock_table} (warehouse_id, product_id, quantity) "
+                f"SELECT w.id, p.id, %s FROM {_table(Warehouse)} w, {_table(Product)} p "
+                f"WHERE w.id = %s AND w.owner_id = %s AND p.id = %s "
+                f"ON CONFLICT (warehouse_id, product_id) "
+                f"DO UPDATE SET quantity = {stock_table}.quantity + excluded.quantity "
+                f"RETURNING id, quantity, stripe_count, reserved",
+                [amount, warehouse_id, owner.pk, product_id],
+            )
+            row = cursor.fetchone()
+            if row is not None:
+                record_movements([(warehouse_id, product_id, amount)])
+    if row is None:
+        _check_references(warehouse_id, product_id, owner=owner)
+        raise StockMutationError(WAREHOUSE_NOT_OWNED)
+    if row[2] > 1:
+        return _striped_result(warehouse_id, product_id)
+    return Stock(id=row[0], warehouse_id=warehouse_id, product_id=product_id, quantity=row[1], reserved=row[3])
+
+
+def consume_stock(warehouse, product, quantity):
+    """
+    Списывает товар со склада.
+
+    Выполняется условным UPDATE quantity = F('quantity') - n с условием
+    quantity >= reserved + n; если ни одна строка не изменилась, причина
+    определяется дополнительными запросами. Возвращает Stock с актуальным
+    количеством.
+    """
+    warehouse_id, product_id = _parse_id(warehouse), _parse_id(product)
+    amount = _parse_quantity(quantity)
+    if amount is None:
+        _check_references(warehouse_id, product_id)
+        raise StockMutationError(INVALID_QUANTITY)
+
+    stripes = _stripe_count(warehouse_id, product_id)
+    if stripes:
+        stock = _consume_stripes(warehouse_id, product_id, amount, stripes)
+        if stock is not None:
+            return stock
+
+    coalescer = None if stripes else _coalescer()
+    if coalescer is not None and warehouse_id is not None and product_id is not None:
+        return coalescer.submit((warehouse_id, product_id), (CONSUME, amount, None))
+
+    if warehouse_id is not None and product_id is not None:
+        stocks = Stock.objects.filter(warehouse_id=warehouse_id, product_id=product_id)
+        with transaction.atomic():
+            # Нехватку остатка сообщает число изменённых строк
+            if stocks.filter(quantity__gte=F('reserved') + amount).update(quantity=F('quantity') - amount):
+                record_movements([(warehouse_id, product_id, -amount)])
+                return _stock_after(stocks)
+    _check_references(warehouse_id, product_id)
+    stock = Stock.objects.filter(warehouse_id=warehouse_id, product_id=product_id).values_list(
+        'id', 'stripe_count'
+    ).first()
+    if stock is None:
+        raise StockMutationError(NOT_AVAILABLE)
+    # Количество может быть разнесено по полосам, включая те, о которых
+    # кэш этого процесса ещё не знает
+    if stock[1] > 1:
+        return _consume_across_stripes(stock[0], warehouse_id, product_id, amount)
+    raise StockMutationError(INSUFFICIENT)
+
+
+# Асинхронные варианты выполняют синхронные функции в потоке: изменение
+# остатка и запись в журнал должны идти в одной транзакции, а асинхронный ORM
+# транзакций не поддерживает
+asupply_stock = sync_to_async(supply_stock)
+aconsume_stock = sync_to_async(consume_stock)
+
+
+BATCH_ABORTED = "Пакет не применён из-за ошибок в других позициях."
+
+
+class _BatchRollback(Exception):
+    pass
+
+
+def _values_clause(rows):
+    placeholders = ', '.join('(%s, %s, %s)' for _ in rows)
+    params = [value for row in rows for value in row]
+    return placeholders, params
+
+
+def _bulk_supply(totals):
+    # Один многострочный upsert; суммы по ключу уже сложены, поэтому каждая
+    # строка Stock затрагивается не более одного раза за запрос
+    stock_table = _table(Stock)
+    values, params = _values_clause([(w, p, amount) for (w, p), amount in totals.items()])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {stock_table} (warehouse_id, product_id, quantity) VALUES {values} "
+            f"ON CONFLICT (warehouse_id, product_id) "
+            f"DO UPDATE SET quantity = {stock_table}.quantity + excluded.quantity "
+            f"RETURNING id, warehouse_id, product_id",
+            params,
+        )
+        return {(w, p): stock_id for stock_id, w, p in cursor.fetchall()}
+
+
+def _bulk_consume(totals):
+    # Один условный UPDATE по всем ключам; строки без достаточного остатка
+    # не изменяются и не попадают в RETURNING. По RETURNING определяются
+    # неудачные ключи, а update() ORM возвращает только число строк,
+    # поэтому запрос написан на SQL
+    stock_table = _table(Stock)
+    values, params = _values_clause([(w, p, amount) for (w, p), amount in totals.items()])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {stock_table} SET quantity = {stock_table}.quantity - v.column3 "
+            f"FROM (VALUES {values}) AS v "
+            f"WHERE {stock_table}.warehouse_id = v.column1 AND {stock_table}.product_id = v.column2 "
+            f"AND {stock_table}.quantity - {stock_table}.reserved >= v.column3 "
+            f"RETURNING {stock_table}.id, {stock_table}.warehouse_id, {stock_table}.product_id",
+            params,
+        )
+        return {(w, p): stock_id for stock_id, w, p in cursor.fetchall()}
+
+
+def apply_stock_movements(movements, user, atomic=True):
+    """
+    Применяет пакет движений остатков от имени пользователя.
+
+    movements — список словарей с ключами warehouse, product, quantity и
+    direction ('supply' или 'consume'). Склады и товары проверяются одним
+    запросом id__in на модель, поставки применяются одним многострочным
+    upsert, списания — одним условным UPDATE. В режиме atomic при любой
+    ошибке ничего не применяется; иначе каждая позиция обрабатывается
+    независимо, а ключи с недостаточным суммарным остатком списываются
+    по одной позиции.
+
+    Возвращает список той же длины: Stock (состояние после пакета) либо
+    StockMutationError для позиции.
+    """
+    results = [None] * len(movements)
+    warehouse_ids = {item['warehouse'] for item in movements}
+    product_ids = {item['product'] for item in movements}
+    owners = dict(Warehouse.objects.filter(id__in=warehouse_ids).values_list('id', 'owner_id'))
+    products = set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+
+    pending = []
+    for index, item in enumerate(movements):
+        direction, warehouse_id = item['direction'], item['warehouse']
+        if direction == SUPPLY:
+            if user.user_type != 'supplier':
+                results[index] = StockMutationError(FORBIDDEN)
+            elif owners.get(warehouse_id) != user.pk:
+                results[index] = StockMutationError(WAREHOUSE_NOT_OWNED)
+        elif user.user_type != 'consumer':
+            results[index] = StockMutationError(FORBIDDEN)
+        elif warehouse_id not in owners:
+            results[index] = StockMutationError(WAREHOUSE_NOT_FOUND)
+        if results[index] is None and item['product'] not in products:
+            results[index] = StockMutationError(PRODUCT_NOT_FOUND)
+        if results[index] is None:
+            pending.append(index)
+
+    if atomic and len(pending) < len(movements):
+        for index in pending:
+            results[index] = StockMutationError(BATCH_ABORTED)
+        return results
+
+    def key(index):
+        return movements[index]['warehouse'], movements[index]['product']
+
+    def totals(direction):
+        summed = {}
+        for index in pending:
+            if movements[index]['direction'] == direction:
+                summed[key(index)] = summed.get(key(index), 0) + movements[index]['quantity']
+        return summed
+
+    stock_ids = {}
+
+    def ledger_rows(direction, keys):
+        # В журнал попадает каждая позиция, а не суммы по ключу
+        sign = 1 if direction == SUPPLY else -1
+        return [
+            (*key(index), sign * movements[index]['quantity'])
+            for index in pending
+            if movements[index]['direction'] == direction and key(index) in keys
+        ]
+
+    def apply():
+        supplies, consumes = totals(SUPPLY), totals(CONSUME)
+        if supplies:
+            try:
+                with transaction.atomic():
+                    stock_ids.update(_bulk_supply(supplies))
+                    record_movements(ledger_rows(SUPPLY, supplies))
+            except IntegrityError:
+                # Товар удалён параллельно: в атомарном режиме откатываем всё
+                # (ошибки позиций строятся ниже), иначе применяем поставки по
+                # одной позиции
+                if atomic:
+                    raise
+                for index in pending:
+                    if movements[index]['direction'] == SUPPLY:
+                        _apply_single(index)
+        if consumes:
+            with transaction.atomic():
+                consumed = _bulk_consume(consumes)
+                record_movements(ledger_rows(CONSUME, consumed))
+            stock_ids.update(consumed)
+            # Неудачные ключи определяются по результату самого списания:
+            # stock_ids уже содержит ключи, поставленные этим же пакетом
+            failed = set(consumes) - set(consumed)
+            if failed and atomic:
+                existing = dict(
+                    ((w, p), stripes) for w, p, stripes in Stock.objects.filter(
+                        warehouse_id__in={w for w, _ in failed},
+                        product_id__in={p for _, p in failed},
+                    ).values_list('warehouse_id', 'product_id', 'stripe_count')
+                )
+                # Остаток с полосами может покрыть списание суммой полос,
+                # поэтому такие ключи применяются по позициям
+                striped = {k for k in failed if existing.get(k, 1) > 1}
+                for index in pending:
+                    if key(index) in striped:
+                        _apply_single(index)
+                    elif key(index) in failed:
+                        results[index] = StockMutationError(
+                            INSUFFICIENT if key(index) in existing else NOT_AVAILABLE
+                        )
+                if any(results[index] is not None for index in pending):
+                    raise _BatchRollback()
+            for index in pending:
+                if key(index) in failed and not atomic:
+                    _apply_single(index)
+
+    def _apply_single(index):
+        item = movements[index]
+        try:
+            if item['direction'] == SUPPLY:
+                stock = supply_stock(item['warehouse'], item['product'], item['quantity'], owner=user)
+            else:
+                stock = consume_stock(item['warehouse'], item['product'], item['quantity'])
+        except StockMutationError as exc:
+            results[index] = exc
+        else:
+            stock_ids[key(index)] = stock.pk
+
+    if atomic:
+        try:
+            with transaction.atomic():
+                apply()
+        except _BatchRollback:
+            for index in pending:
+                if results[index] is None:
+                    results[index] = StockMutationError(BATCH_ABORTED)
+            return results
+        except IntegrityError:
+            # Внешний ключ проверяется при фиксации, поэтому ошибка может
+            # прийти и на выходе из транзакции; пакет уже откатан
+            products = set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+            for index in pending:
+                results[index] = StockMutationError(
+                    BATCH_ABORTED if movements[index]['product'] in products else PRODUCT_NOT_FOUND
+                )
+            return results
+    else:
+        apply()
+
+    stocks = Stock.objects.with_total_quantity().in_bulk(set(stock_ids.values()))
+    for index in pending:
+        if results[index] is None:
+            results[index] = stocks[stock_ids[key(index)]]
+    return results
@@ -0,0 +1,104 @@
+# api/signals.py
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from . import availability
+from .authentication import get_token_cache
+from .cache import product_cache, warehouse_cache
+from .models import Warehouse, Product, Stock, Tombstone
+from .ledger import record_movements
+from .rollups import product_repriced, product_removed, warehouse_removed
+
+User = get_user_model()
+
+def _evict_token(key):
+    # Повторное удаление после фиксации убирает запись, сохранённую
+    # параллельной аутентификацией до фиксации
+    get_token_cache().delete(key)
+    transaction.on_commit(lambda: get_token_cache().delete(key))
+
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, **kwargs):
+    _evict_token(instance.key)
+
+@receiver(post_save, sender=User)
+def evict_user_tokens(sender, instance, created, update_fields=None, **kwargs):
+    # У нового пользователя ещё нет токенов в кэше
+    if created:
+        return
+    for key in Token.objects.filter(user_id=instance.pk).values_list('key', flat=True):
+        _evict_token(key)
+    # Имя владельца входит в представление склада
+    if update_fields is None or 'username' in update_fields:
+        warehouse_cache.bump()
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    product_cache.bump()
+
+@receiver(post_save, sender=Warehouse)
+@receiver(post_delete, sender=Warehouse)
+def invalidate_warehouse_cache(sender, instance, **kwargs):
+    warehouse_cache.bump()
+
+@receiver(pre_save, sender=Product)
+def remember_product_price(sender, instance, **kwargs):
+    if instance.pk is not None:
+        instance._previous_price = Product.objects.filter(pk=instance.pk).values_list('price', flat=True).first()
+
+@receiver(post_save, sender=Product)
+def reprice_warehouse_rollups(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_price', None)
+    if not created and previous is not None and previous != instance.price:
+        product_repriced(instance.pk, previous, instance.price)
+
+# Свёртки корректируются до каскадного удаления остатков
+@receiver(pre_delete, sender=Product)
+def remove_product_from_rollups(sender, instance, **kwargs):
+    product_removed(instance.pk, instance.price)
+
+@receiver(pre_delete, sender=Warehouse)
+def remove_warehouse_from_rollups(sender, instance, **kwargs):
+    warehouse_removed(instance.pk)
+
+def _deleted_directly(origin):
+    # Удаление самого остатка (объекта или queryset), а не каскад склада или товара
+    return isinstance(origin, Stock) or getattr(origin, 'model', None) is Stock
+
+# Удаление остатка закрывает его движением -количество: журнал, свёртки,
+# кэш доступности и лента видят его как списание, а сверка журнала
+# (rebuild_stock_balances) не восстанавливает удалённый остаток. Остатки,
+# удалённые каскадом, уже вычтены из свёрток обработчиками выше, а их
+# движения удаляются вместе со складом или товаром
+@receiver(pre_delete, sender=Stock)
+def close_deleted_stock(sender, instance, origin=None, **kwargs):
+    if not _deleted_directly(origin):
+        return
+    quantity = Stock.objects.with_total_quantity().values_list('total_quantity', flat=True).get(pk=instance.pk)
+    if quantity:
+        record_movements([(instance.warehouse_id, instance.product_id, -quantity)])
+
+# Каскадное удаление склада или товара отправляет post_delete каждого остатка
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def invalidate_stock_availability(sender, instance, **kwargs):
+    availability.invalidate(instance.warehouse_id, instance.product_id)
+
+# Отметки об удалении для /api/stocks/changes/ (api/delta.py). Остаток,
+# удалённый каскадом, покрыт отметкой склада или товара
+@receiver(post_delete, sender=Warehouse)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Stock)
+def record_tombstone(sender, instance, origin=None, **kwargs):
+    owner_id = None
+    if sender is Warehouse:
+        owner_id = instance.owner_id
+    elif sender is Stock:
+        if not _deleted_directly(origin):
+            return
+        owner_id = Warehouse.objects.filter(pk=instance.warehouse_id).values_list('owner_id', flat=True).first()
+    Tombstone.objects.create(kind=sender._meta.model_name, object_id=instance.pk, owner_id=owner_id)
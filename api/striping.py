@@ -0,0 +1,91 @@
+# api/striping.py
+"""
+Полосатые счётчики остатков для горячих пар (склад, товар).
+
+Остаток с stripe_count = K хранит количество в основной строке Stock
+(полоса 0) и в K - 1 строках StockStripe. Поставка увеличивает случайную
+полосу, списание пробует полосы по очереди (api/services.py), поэтому
+параллельные запросы блокируют разные строки. Сумма всех полос —
+StockQuerySet.with_total_quantity().
+
+Список полосатых остатков кэшируется; запись в основную строку верна при
+любом числе полос, а сумма учитывает все строки StockStripe, поэтому
+устаревший кэш другого процесса влияет только на распределение нагрузки.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Sum
+from .models import Stock, StockStripe
+
+STRIPED_KEY = 'api:stock:striped'
+# Другие процессы узнают об изменении числа полос не позже чем через таймаут
+STRIPED_TIMEOUT = 5
+
+
+def striped_stocks():
+    """{(warehouse_id, product_id): stripe_count} для остатков с полосами."""
+    striped = cache.get(STRIPED_KEY)
+    if striped is None:
+        striped = {
+            (w, p): count
+            for w, p, count in Stock.objects.filter(stripe_count__gt=1)
+            .values_list('warehouse_id', 'product_id', 'stripe_count')
+        }
+        cache.set(STRIPED_KEY, striped, STRIPED_TIMEOUT)
+    return striped
+
+
+def total_quantity(stock_id):
+    return Stock.objects.with_total_quantity().values_list('total_quantity', flat=True).get(pk=stock_id)
+
+
+def set_stripe_count(stock_id, stripes):
+    """
+    Меняет число полос остатка без остановки записи.
+
+    Новые полосы создаются пустыми; при уменьшении количество лишних полос
+    переносится в основную строку, а сами полосы удаляются. Основная строка
+    и удаляемые полосы блокируются на время переноса.
+    """
+    max_stripes = getattr(settings, 'STOCK_MAX_STRIPES', 64)
+    if not 1 <= stripes <= max_stripes:
+        raise ValueError(f"Число полос должно быть от 1 до {max_stripes}.")
+    with transaction.atomic():
+        stock = Stock.objects.select_for_update().get(pk=stock_id)
+        if stripes > stock.stripe_count:
+            StockStripe.objects.bulk_create(
+                (StockStripe(stock_id=stock_id, number=number) for number in range(stock.stripe_count, stripes)),
+                ignore_conflicts=True,
+            )
+        else:
+            removed = StockStripe.objects.select_for_update().filter(stock_id=stock_id, number__gte=stripes)
+            moved = removed.aggregate(total=Sum('quantity'))['total'] or 0
+            removed.delete()
+            stock.quantity += moved
+        stock.stripe_count = stripes
+        stock.save(update_fields=['quantity', 'stripe_count'])
+        # Повторное удаление после фиксации убирает список, закэшированный
+        # параллельным читателем до фиксации
+        cache.delete(STRIPED_KEY)
+        transaction.on_commit(lambda: cache.delete(STRIPED_KEY))
+    return stock
+
+
+def collapse_stripes(stock_id):
+    """
+    Блокирует основную строку и полосы остатка и обнуляет полосы. Возвращает
+    (количество основной строки, суммарное количество); вызывающий записывает
+    новый итог в основную строку в той же транзакции. Используется для
+    списания, которое не помещается ни в одну полосу.
+    """
+    stocks = Stock.objects.filter(pk=stock_id)
+    stripes = StockStripe.objects.filter(stock_id=stock_id)
+    # Пустые UPDATE блокируют строки до конца транзакции
+    stocks.update(quantity=F('quantity'))
+    base = stocks.values_list('quantity', flat=True).get()
+    stripes.update(quantity=F('quantity'))
+    moved = stripes.aggregate(total=Sum('quantity'))['total'] or 0
+    if moved:
+        stripes.update(quantity=0)
+    return base, base + moved
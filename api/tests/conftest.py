@@ -46,3 +46,33 @@ def consumer_token(api_client, consumer_user):
     }, format="json")
     assert response.status_code == 200, f"Login failed for consumer: {response.content}"
     return response.data.get("token")
+
+@pytest.fixture
+def consumer_client(api_client, consumer_token):
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {consumer_token}")
+    return api_client
+
+@pytest.fixture
+def warehouse(supplier_user):
+    from api.models import Warehouse
+    return Warehouse.objects.create(name="Main Warehouse", address="1 Main St", owner=supplier_user)
+
+@pytest.fixture
+def product(db):
+    from api.models import Product
+    return Product.objects.create(name="Main Product", description="Main product", price="10.00")
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # Первичные ключи повторяются между тестами после отката транзакции,
+    # поэтому кэши не должны переживать тест
+    from django.core.cache import cache
+    from api.authentication import reset_token_cache
+    from api.coalescing import reset_coalescer
+    cache.clear()
+    reset_token_cache()
+    reset_coalescer()
+    yield
+    cache.clear()
+    reset_token_cache()
+    reset_coalescer()
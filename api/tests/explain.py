@@ -0,0 +1,51 @@
+# api/tests/explain.py
+"""
+Помощник для проверки планов запросов через EXPLAIN.
+
+Запросы, пойманные CaptureQueriesContext, повторно отправляются в базу с
+префиксом EXPLAIN; строки плана с полным просмотром таблицы (SCAN в SQLite,
+Seq Scan в PostgreSQL) считаются ошибкой.
+"""
+import re
+from django.db import connection
+
+FULL_SCAN = {
+    'sqlite': re.compile(r'\bSCAN (\S+)'),
+    'postgresql': re.compile(r'Seq Scan on (\S+)'),
+}
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # На маленьких таблицах PostgreSQL и так выбирает Seq Scan;
+            # проверяем, что индекс для запроса существует и применим
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN ' + sql)
+        else:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return [str(row[-1]) for row in cursor.fetchall()]
+
+def full_scans(plan, ignore=()):
+    """Строки плана с полным просмотром таблиц, кроме перечисленных в ignore."""
+    pattern = FULL_SCAN[connection.vendor]
+    return [
+        line for line in plan
+        if (match := pattern.search(line)) and match.group(1).strip('"') not in ignore
+    ]
+
+def assert_index_scans(queries, ignore=('authtoken_token',)):
+    """
+    Проверяет, что ни один из пойманных запросов не читает таблицу целиком.
+
+    Таблица токенов в тестах содержит пару строк, и планировщик честно
+    выбирает для неё полный просмотр, поэтому по умолчанию она пропускается.
+    """
+    problems = {}
+    for query in queries:
+        sql = query['sql']
+        if sql.split(None, 1)[0].upper() not in ('SELECT', 'INSERT', 'UPDATE', 'DELETE'):
+            continue
+        scans = full_scans(explain(sql), ignore)
+        if scans:
+            problems[sql] = scans
+    assert not problems, f"Full table scans: {problems}"
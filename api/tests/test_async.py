@@ -0,0 +1,63 @@
+# api/tests/test_async.py
+"""Асинхронные эндпоинты /api/async/ отвечают так же, как синхронные."""
+import pytest
+from rest_framework import status
+from api.models import Stock
+
+
+@pytest.mark.django_db
+def test_async_supply_consume_and_read(client, supplier_token, consumer_token, warehouse, product):
+    supplier = {"HTTP_AUTHORIZATION": f"Token {supplier_token}"}
+    consumer = {"HTTP_AUTHORIZATION": f"Token {consumer_token}"}
+    payload = {"warehouse": warehouse.id, "product": product.id, "quantity": 10}
+
+    response = client.post("/api/async/supply/", payload, content_type="application/json", **supplier)
+    assert response.status_code == status.HTTP_200_OK, response.content
+    assert response.json()["quantity"] == 10
+    assert response.json()["product_detail"]["name"] == "Main Product"
+
+    payload["quantity"] = 4
+    response = client.put("/api/async/consume/", payload, content_type="application/json", **consumer)
+    assert response.status_code == status.HTTP_200_OK, response.content
+    assert response.json()["quantity"] == 6
+
+    payload["quantity"] = 7
+    response = client.put("/api/async/consume/", payload, content_type="application/json", **consumer)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json() == {"error": "Недостаточно товара на складе."}
+
+    stock = Stock.objects.get()
+    response = client.get(f"/api/async/stocks/{stock.id}/", **consumer)
+    assert response.json()["quantity"] == 6
+    sync = client.get(f"/api/stocks/{stock.id}/", **consumer)
+    assert response.json() == sync.json()
+
+
+@pytest.mark.django_db
+def test_async_permissions(client, supplier_token, consumer_token, warehouse, product):
+    payload = {"warehouse": warehouse.id, "product": product.id, "quantity": 1}
+    response = client.post("/api/async/supply/", payload, content_type="application/json")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    response = client.post("/api/async/supply/", payload, content_type="application/json",
+                           HTTP_AUTHORIZATION="Token invalid")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    response = client.post("/api/async/supply/", payload, content_type="application/json",
+                           HTTP_AUTHORIZATION=f"Token {consumer_token}")
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    response = client.get("/api/async/supply/", HTTP_AUTHORIZATION=f"Token {supplier_token}")
+    assert response.status_code == status.HTTP_405_METHOD_NOT_ALLOWED
+
+
+@pytest.mark.django_db
+def test_async_stock_list_pages(client, consumer_token, warehouse):
+    from api.models import Product
+    products = Product.objects.bulk_create(Product(name=f"Async {i}", price="1.00") for i in range(5))
+    Stock.objects.bulk_create(Stock(warehouse=warehouse, product=p, quantity=i) for i, p in enumerate(products))
+
+    seen, url = [], "/api/async/stocks/?page_size=2&fields=id,quantity"
+    while url:
+        data = client.get(url, HTTP_AUTHORIZATION=f"Token {consumer_token}").json()
+        assert all(set(row) == {"id", "quantity"} for row in data["results"])
+        seen.extend(row["id"] for row in data["results"])
+        url = data["next"]
+    assert seen == sorted(Stock.objects.values_list("id", flat=True))
@@ -1,6 +1,10 @@
 # api/tests/test_auth.py
 import pytest
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
+from api.hashers import HashingPool
 
 @pytest.mark.django_db
 def test_supplier_registration(api_client):
@@ -55,3 +59,39 @@ def test_consumer_authentication(api_client, consumer_user):
     response = api_client.post(url, data, format="json")
     assert response.status_code == status.HTTP_200_OK, f"Consumer authentication failed: {response.content}"
     assert "token" in response.data
+
+@pytest.mark.django_db
+def test_login_reads_existing_token_without_writing(api_client, consumer_user):
+    data = {"username": "consumer1", "password": "StrongPassword123"}
+    first = api_client.post("/api/login/", data, format="json").data["token"]
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.post("/api/login/", data, format="json")
+    assert response.data["token"] == first
+    # Пользователь и чтение токена, без INSERT
+    assert len(queries) == 2
+    assert all(query["sql"].lstrip().upper().startswith("SELECT") for query in queries.captured_queries)
+
+@pytest.mark.django_db
+def test_login_rehashes_outdated_passwords(api_client, consumer_user, settings):
+    consumer_user.password = make_password("StrongPassword123", hasher="pbkdf2_sha256")
+    consumer_user.save(update_fields=["password"])
+    data = {"username": "consumer1", "password": "StrongPassword123"}
+    assert api_client.post("/api/login/", data, format="json").status_code == status.HTTP_200_OK
+    consumer_user.refresh_from_db()
+    assert consumer_user.password.startswith("scrypt$16384$")
+
+    settings.PASSWORD_HASHER_OPTIONS = {"scrypt": {"work_factor": 2 ** 13, "parallelism": 1}}
+    assert api_client.post("/api/login/", data, format="json").status_code == status.HTTP_200_OK
+    consumer_user.refresh_from_db()
+    assert consumer_user.password.startswith("scrypt$8192$")
+    assert consumer_user.check_password("StrongPassword123")
+
+@pytest.mark.django_db
+def test_login_is_rejected_when_hashing_pool_is_full(api_client, consumer_user, monkeypatch):
+    pool = HashingPool(workers=1, queue=0, timeout=0.01)
+    monkeypatch.setattr("api.backends.get_hashing_pool", lambda: pool)
+    pool._slots.acquire()
+    response = api_client.post("/api/login/", {"username": "consumer1", "password": "StrongPassword123"},
+                               format="json")
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response["Retry-After"] == "1"
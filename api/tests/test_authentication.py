@@ -0,0 +1,54 @@
+# api/tests/test_authentication.py
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from api.authentication import reset_token_cache
+
+@pytest.mark.django_db
+def test_cached_token_skips_auth_query(api_client, consumer_token):
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {consumer_token}")
+    with CaptureQueriesContext(connection) as cold:
+        assert api_client.get("/api/stocks/").status_code == status.HTTP_200_OK
+    with CaptureQueriesContext(connection) as warm:
+        assert api_client.get("/api/stocks/").status_code == status.HTTP_200_OK
+    assert len(warm) == len(cold) - 1
+
+@pytest.mark.django_db
+def test_deleted_token_is_evicted(api_client, consumer_token):
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {consumer_token}")
+    assert api_client.get("/api/stocks/").status_code == status.HTTP_200_OK
+    Token.objects.filter(key=consumer_token).delete()
+    assert api_client.get("/api/stocks/").status_code == status.HTTP_401_UNAUTHORIZED
+
+@pytest.mark.django_db
+def test_user_change_is_visible_to_permissions(api_client, consumer_user, consumer_token):
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {consumer_token}")
+    assert api_client.get("/api/products/").status_code == status.HTTP_403_FORBIDDEN
+    consumer_user.user_type = "supplier"
+    consumer_user.save()
+    assert api_client.get("/api/products/").status_code == status.HTTP_200_OK
+
+    consumer_user.is_active = False
+    consumer_user.save()
+    assert api_client.get("/api/products/").status_code == status.HTTP_401_UNAUTHORIZED
+
+@pytest.mark.django_db
+@override_settings(API_TOKEN_CACHE={"BACKEND": "django"})
+def test_shared_cache_stores_only_permission_fields(api_client, consumer_user, consumer_token):
+    reset_token_cache()
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {consumer_token}")
+    assert api_client.get("/api/stocks/").status_code == status.HTTP_200_OK
+    assert cache.get(f"api:token:{consumer_token}") == {
+        "id": consumer_user.pk, "username": "consumer1", "user_type": "consumer", "is_active": True,
+    }
+    with CaptureQueriesContext(connection) as queries:
+        assert api_client.get("/api/products/").status_code == status.HTTP_403_FORBIDDEN
+    assert not any("authtoken_token" in query["sql"] for query in queries.captured_queries)
+
+    consumer_user.is_active = False
+    consumer_user.save()
+    assert api_client.get("/api/stocks/").status_code == status.HTTP_401_UNAUTHORIZED
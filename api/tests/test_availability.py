@@ -0,0 +1,84 @@
+# api/tests/test_availability.py
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from api.models import Warehouse
+from api.services import supply_stock, consume_stock, apply_stock_movements
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+def test_availability_is_written_through(consumer_client, supplier_user, warehouse, product,
+                                         django_capture_on_commit_callbacks):
+    url = f"/api/stocks/availability/?warehouse={warehouse.id}&product={product.id}"
+    assert consumer_client.get(url).data == {"warehouse": warehouse.id, "product": product.id,
+                                             "quantity": 0, "available": False}
+
+    with django_capture_on_commit_callbacks(execute=True):
+        supply_stock(warehouse.id, product.id, 10, owner=supplier_user)
+    with django_capture_on_commit_callbacks(execute=True):
+        consume_stock(warehouse.id, product.id, 3)
+    # Откат пакета не меняет кэш
+    with django_capture_on_commit_callbacks(execute=True):
+        apply_stock_movements([
+            {"warehouse": warehouse.id, "product": product.id, "quantity": 1, "direction": "consume"},
+            {"warehouse": warehouse.id, "product": product.id, "quantity": 100, "direction": "consume"},
+        ], supplier_user, atomic=True)
+
+    with CaptureQueriesContext(connection) as queries:
+        response = consumer_client.get(url)
+    assert response.data["quantity"] == 7
+    assert len(queries) == 0
+
+
+@pytest.mark.django_db
+def test_multi_key_form_and_supplier_visibility(api_client, supplier_user, supplier_token, consumer_client,
+                                                warehouse, product, django_capture_on_commit_callbacks):
+    supply_stock(warehouse.id, product.id, 5, owner=supplier_user)
+    other = Warehouse.objects.create(name="Other", address="2 Other St", owner=supplier_user)
+    url = f"/api/stocks/availability/?items={warehouse.id}:{product.id},{other.id}:{product.id}"
+    assert consumer_client.get(url).data == {"results": [
+        {"warehouse": warehouse.id, "product": product.id, "quantity": 5, "available": True},
+        {"warehouse": other.id, "product": product.id, "quantity": 0, "available": False},
+    ]}
+
+    # Каскадное удаление склада удаляет ключ его остатков
+    with django_capture_on_commit_callbacks(execute=True):
+        warehouse.delete()
+    assert consumer_client.get(url).data["results"][0]["quantity"] == 0
+
+    # Поставщик видит только свои склады
+    stranger = User.objects.create_user(username="supplier9", email="supplier9@example.com",
+                                        password="StrongPassword123", user_type="supplier")
+    foreign = Warehouse.objects.create(name="Foreign", address="3 Foreign St", owner=stranger)
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {supplier_token}")
+    response = api_client.get(f"/api/stocks/availability/?warehouse={foreign.id}&product={product.id}")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    response = api_client.get(f"/api/stocks/availability/?items={foreign.id}:{product.id},{other.id}:{product.id}")
+    assert [item["warehouse"] for item in response.data["results"]] == [other.id]
+    assert api_client.get("/api/stocks/availability/?warehouse=x&product=1").status_code == \
+        status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_miss_does_not_cache_value_read_before_concurrent_write(supplier_user, warehouse, product, monkeypatch):
+    from django.core.cache import cache
+    from api import availability
+
+    supply_stock(warehouse.id, product.id, 10, owner=supplier_user)
+    set_many = cache.set_many
+
+    def commit_write_then_set(data, *args, **kwargs):
+        # Запись фиксируется после SELECT читателя, её incr не застаёт ключ
+        consume_stock(warehouse.id, product.id, 3)
+        availability._apply({(warehouse.id, product.id): -3})
+        return set_many(data, *args, **kwargs)
+
+    monkeypatch.setattr(cache, "set_many", commit_write_then_set)
+    assert availability.get_many([(warehouse.id, product.id)]) == {(warehouse.id, product.id): 10}
+    monkeypatch.undo()
+    # Устаревшее значение удалено, следующее чтение берёт его из базы
+    assert availability.get_many([(warehouse.id, product.id)]) == {(warehouse.id, product.id): 7}
@@ -0,0 +1,76 @@
+# api/tests/test_batch.py
+import pytest
+from django.db import IntegrityError
+from rest_framework import status
+from api import services
+from api.models import Product, Stock
+
+URL = "/api/stock-movements/batch/"
+
+@pytest.mark.django_db
+def test_batch_supply(api_client, supplier_token, warehouse, product):
+    other = Product.objects.create(name="Other Product", price="5.00")
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {supplier_token}")
+    response = api_client.post(URL, {"items": [
+        {"warehouse": warehouse.id, "product": product.id, "quantity": 10, "direction": "supply"},
+        {"warehouse": warehouse.id, "product": other.id, "quantity": 5, "direction": "supply"},
+        {"warehouse": warehouse.id, "product": product.id, "quantity": 7, "direction": "supply"},
+    ]}, format="json")
+    assert response.status_code == status.HTTP_200_OK, f"Batch supply failed: {response.content}"
+    results = response.data["results"]
+    assert [r["status"] for r in results] == ["ok", "ok", "ok"]
+    assert results[0]["stock"]["quantity"] == 17
+    assert results[0]["stock"]["product_detail"]["name"] == "Main Product"
+    assert results[1]["stock"]["quantity"] == 5
+    assert Stock.objects.get(warehouse=warehouse, product=product).quantity == 17
+
+@pytest.mark.django_db
+def test_batch_consume_atomic_rolls_back(api_client, consumer_token, warehouse, product):
+    other = Product.objects.create(name="Other Product", price="5.00")
+    Stock.objects.create(warehouse=warehouse, product=product, quantity=10)
+    Stock.objects.create(warehouse=warehouse, product=other, quantity=1)
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {consumer_token}")
+    response = api_client.post(URL, {"items": [
+        {"warehouse": warehouse.id, "product": product.id, "quantity": 4, "direction": "consume"},
+        {"warehouse": warehouse.id, "product": other.id, "quantity": 2, "direction": "consume"},
+    ]}, format="json")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    results = response.data["results"]
+    assert results[0]["error"] == "Пакет не применён из-за ошибок в других позициях."
+    assert results[1]["error"] == "Недостаточно товара на складе."
+    assert Stock.objects.get(warehouse=warehouse, product=product).quantity == 10
+    assert Stock.objects.get(warehouse=warehouse, product=other).quantity == 1
+
+@pytest.mark.django_db
+def test_batch_consume_per_item(api_client, consumer_token, warehouse, product):
+    Stock.objects.create(warehouse=warehouse, product=product, quantity=10)
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {consumer_token}")
+    response = api_client.post(URL, {"atomic": False, "items": [
+        {"warehouse": warehouse.id, "product": product.id, "quantity": 6, "direction": "consume"},
+        {"warehouse": warehouse.id, "product": product.id, "quantity": 6, "direction": "consume"},
+        {"warehouse": warehouse.id, "product": product.id, "quantity": 3, "direction": "consume"},
+        {"warehouse": warehouse.id, "product": product.id, "quantity": 1, "direction": "supply"},
+        {"warehouse": 999999, "product": product.id, "quantity": 1, "direction": "consume"},
+    ]}, format="json")
+    assert response.status_code == status.HTTP_200_OK
+    results = response.data["results"]
+    assert [r["status"] for r in results] == ["ok", "error", "ok", "error", "error"]
+    assert results[1]["error"] == "Недостаточно товара на складе."
+    assert results[3]["error"] == "У вас нет прав для выполнения этого действия."
+    assert results[4]["error"] == "Склад не найден."
+    assert Stock.objects.get(warehouse=warehouse, product=product).quantity == 1
+
+@pytest.mark.django_db
+def test_batch_supply_atomic_integrity_error(api_client, supplier_token, warehouse, product, monkeypatch):
+    def bulk_supply(totals):
+        # Товар удалён параллельно между проверкой и upsert
+        raise IntegrityError("FOREIGN KEY constraint failed")
+
+    monkeypatch.setattr(services, "_bulk_supply", bulk_supply)
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {supplier_token}")
+    response = api_client.post(URL, {"items": [
+        {"warehouse": warehouse.id, "product": product.id, "quantity": 1, "direction": "supply"},
+    ]}, format="json")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.data["results"][0]["error"] == "Пакет не применён из-за ошибок в других позициях."
+    assert not Stock.objects.exists()
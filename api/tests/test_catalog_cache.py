@@ -0,0 +1,106 @@
+# api/tests/test_catalog_cache.py
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from api.cache import product_cache
+from api.models import Product, Warehouse
+
+User = get_user_model()
+
+@pytest.mark.django_db
+def test_product_detail_served_from_cache_with_etag(api_client, supplier_token, product):
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {supplier_token}")
+    url = f"/api/products/{product.id}/"
+    first = api_client.get(url)
+    assert first.status_code == status.HTTP_200_OK
+    assert first.data["name"] == "Main Product"
+
+    with CaptureQueriesContext(connection) as queries:
+        second = api_client.get(url)
+    assert second.status_code == status.HTTP_200_OK
+    assert len(queries) == 0
+    assert second["ETag"] == first["ETag"]
+
+    not_modified = api_client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+    assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+
+@pytest.mark.django_db
+def test_product_update_invalidates_cache(api_client, supplier_token, product):
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {supplier_token}")
+    url = f"/api/products/{product.id}/"
+    etag = api_client.get(url)["ETag"]
+    product.price = "12.50"
+    product.save()
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["price"] == "12.50"
+
+@pytest.mark.django_db
+def test_read_before_commit_does_not_outlive_the_write(product, monkeypatch, django_capture_on_commit_callbacks):
+    stale = Product.objects.get(pk=product.pk)
+
+    class StaleQuerySet:
+        # Читатель в другом соединении ещё видит строку до фиксации
+        def filter(self, **kwargs):
+            return [stale]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        product.price = "12.50"
+        product.save()
+        monkeypatch.setattr(product_cache, "queryset", StaleQuerySet)
+        assert product_cache.get(product.pk)["data"]["price"] == "10.00"
+        monkeypatch.undo()
+    assert product_cache.get(product.pk)["data"]["price"] == "12.50"
+
+@pytest.mark.django_db
+def test_cached_warehouse_detail_checks_owner(api_client, supplier_token, warehouse):
+    stranger = User.objects.create_user(
+        username="supplier9", email="supplier9@example.com", password="StrongPassword123", user_type="supplier"
+    )
+    foreign = Warehouse.objects.create(name="Foreign Warehouse", address="9 Far St", owner=stranger)
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {supplier_token}")
+    assert api_client.get(f"/api/warehouses/{warehouse.id}/").data["owner"] == "supplier1"
+    assert api_client.get(f"/api/warehouses/{foreign.id}/").status_code == status.HTTP_403_FORBIDDEN
+    assert api_client.get("/api/warehouses/999999/").status_code == status.HTTP_404_NOT_FOUND
+
+@pytest.mark.django_db
+def test_list_not_modified_until_catalog_changes(api_client, supplier_token, warehouse):
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {supplier_token}")
+    etag = api_client.get("/api/warehouses/")["ETag"]
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get("/api/warehouses/", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert len(queries) == 0
+
+    warehouse.name = "Renamed Warehouse"
+    warehouse.save()
+    response = api_client.get("/api/warehouses/", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["results"][0]["name"] == "Renamed Warehouse"
+
+@pytest.mark.django_db
+def test_supply_only_writes_with_warm_cache(api_client, supplier_token, warehouse, product):
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {supplier_token}")
+    data = {"warehouse": warehouse.id, "product": product.id, "quantity": 5}
+    api_client.post("/api/supply/", data, format="json")
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.post("/api/supply/", data, format="json")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["quantity"] == 10
+    assert response.data["warehouse_detail"]["name"] == "Main Warehouse"
+    # Upsert остатка, запись в журнал и две свёртки; цена товара берётся из
+    # кэша, точки сохранения транзакции не считаются
+    statements = [q["sql"] for q in queries if "SAVEPOINT" not in q["sql"]]
+    assert len(statements) == 4
+    assert not any(sql.startswith("SELECT") for sql in statements)
+
+def test_process_local_cache_warning_with_postgres(monkeypatch):
+    from api import checks
+    databases = {"default": {"ENGINE": "django.db.backends.postgresql"}}
+    monkeypatch.setattr(checks.settings, "DATABASES", databases, raising=False)
+    assert [warning.id for warning in checks.shared_cache_check(None)] == ["api.W001"]
+    redis = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}}
+    monkeypatch.setattr(checks.settings, "CACHES", redis, raising=False)
+    assert checks.shared_cache_check(None) == []
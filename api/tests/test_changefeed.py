@@ -0,0 +1,89 @@
+# api/tests/test_changefeed.py
+import asyncio
+import json
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import override_settings
+from api.changefeed import broker, Subscription
+from api.models import Product, StockMovement
+from api.services import supply_stock, consume_stock
+
+
+def _read(response):
+    async def read():
+        return b"".join([chunk async for chunk in response.streaming_content]).decode()
+    return async_to_sync(read)()
+
+
+def _events(response):
+    body = _read(response)
+    return [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: {\"")]
+
+
+def test_subscription_buffer_is_bounded():
+    async def scenario():
+        subscription = Subscription(asyncio.get_running_loop(), 2, warehouses={1})
+        assert not subscription.matches(2, 1)
+        for seq in range(2):
+            subscription.offer({"seq": seq})
+        assert await subscription.get(1) == ([{"seq": 0}, {"seq": 1}], False)
+        for seq in range(3):
+            subscription.offer({"seq": seq})
+        events, overflowed = await subscription.get(1)
+        assert overflowed and len(events) == 2
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.django_db
+def test_committed_changes_are_published(supplier_user, warehouse, product, django_capture_on_commit_callbacks):
+    async def subscribe():
+        return broker.subscribe(products={product.id})
+
+    loop = asyncio.new_event_loop()
+    subscription = loop.run_until_complete(subscribe())
+    try:
+        with django_capture_on_commit_callbacks(execute=True):
+            stock = supply_stock(warehouse.id, product.id, 5, owner=supplier_user)
+        events, overflowed = loop.run_until_complete(subscription.get(1))
+    finally:
+        broker.unsubscribe(subscription)
+        loop.close()
+    assert not overflowed
+    assert events == [{"seq": StockMovement.objects.get().id, "id": stock.id, "warehouse": warehouse.id,
+                       "product": product.id, "quantity": 5, "available": 5}]
+
+
+@pytest.mark.django_db
+def test_publish_failure_does_not_fail_committed_write(api_client, supplier_token, warehouse, product,
+                                                       monkeypatch, django_capture_on_commit_callbacks):
+    def fail(latest):
+        raise RuntimeError("broker is down")
+
+    monkeypatch.setattr(broker, "has_subscribers", lambda: True)
+    monkeypatch.setattr(broker, "publish", fail)
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {supplier_token}")
+    with django_capture_on_commit_callbacks(execute=True):
+        response = api_client.post("/api/supply/", {"warehouse": warehouse.id, "product": product.id,
+                                                    "quantity": 5}, format="json")
+    assert response.status_code == 200
+    assert StockMovement.objects.get().delta == 5
+
+
+@pytest.mark.django_db
+@override_settings(STOCK_CHANGEFEED={"MAX_DURATION": 0.01, "CATCHUP_LIMIT": 2})
+def test_stream_resumes_from_last_event_id(client, consumer_token, supplier_user, warehouse, product):
+    other = Product.objects.create(name="Other", price="1.00")
+    supply_stock(warehouse.id, product.id, 5, owner=supplier_user)
+    first = StockMovement.objects.get().id
+    supply_stock(warehouse.id, other.id, 3, owner=supplier_user)
+    consume_stock(warehouse.id, product.id, 2)
+    headers = {"HTTP_AUTHORIZATION": f"Token {consumer_token}"}
+
+    response = client.get(f"/api/stocks/stream/?product={product.id}", HTTP_LAST_EVENT_ID=str(first), **headers)
+    assert response["Content-Type"] == "text/event-stream"
+    assert [(event["product"], event["quantity"]) for event in _events(response)] == [(product.id, 3)]
+
+    # Больше CATCHUP_LIMIT пропущенных записей: клиент должен перечитать остатки
+    response = client.get("/api/stocks/stream/?last_event_id=0", **headers)
+    assert "event: reset" in _read(response)
@@ -0,0 +1,139 @@
+# api/tests/test_concurrency.py
+import threading
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from api.coalescing import WriteCoalescer, reset_coalescer
+from api.ledger import rebuild_balances
+from api.models import Warehouse, Product, Stock, StockStripe
+from api.services import supply_stock, consume_stock, StockMutationError, INSUFFICIENT
+from api.striping import STRIPED_KEY, STRIPED_TIMEOUT, set_stripe_count, striped_stocks, total_quantity
+
+
+THREADS = 8
+OPERATIONS = 25
+COALESCING = {"ENABLED": True, "WINDOW_MS": 20, "MAX_BATCH": THREADS}
+
+
+def _run_in_threads(target):
+    errors = []
+
+    def worker():
+        try:
+            target()
+        except Exception as exc:  # pragma: no cover - ошибка попадёт в assert
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_supply_and_consume_keep_exact_quantity(supplier_user):
+    warehouse = Warehouse.objects.create(name="Hot Warehouse", address="1 Hot St", owner=supplier_user)
+    product = Product.objects.create(name="Hot Product", price="1.00")
+    Stock.objects.create(warehouse=warehouse, product=product, quantity=1000)
+
+    def supply_then_consume():
+        for _ in range(OPERATIONS):
+            supply_stock(warehouse.id, product.id, 3, owner=supplier_user)
+            consume_stock(warehouse.id, product.id, 2)
+
+    errors = _run_in_threads(supply_then_consume)
+    assert errors == []
+    stock = Stock.objects.get(warehouse=warehouse, product=product)
+    assert stock.quantity == 1000 + THREADS * OPERATIONS * (3 - 2)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_consume_never_goes_below_zero(supplier_user):
+    warehouse = Warehouse.objects.create(name="Hot Warehouse", address="1 Hot St", owner=supplier_user)
+    product = Product.objects.create(name="Hot Product", price="1.00")
+    Stock.objects.create(warehouse=warehouse, product=product, quantity=50)
+    consumed = []
+
+    def consume_until_empty():
+        for _ in range(OPERATIONS):
+            try:
+                consume_stock(warehouse.id, product.id, 1)
+            except StockMutationError:
+                continue
+            consumed.append(1)
+
+    errors = _run_in_threads(consume_until_empty)
+    assert errors == []
+    assert len(consumed) == 50
+    assert Stock.objects.get(warehouse=warehouse, product=product).quantity == 0
+
+
+@pytest.mark.django_db(transaction=True)
+@override_settings(STOCK_WRITE_COALESCING=COALESCING)
+def test_coalesced_writes_give_each_caller_its_answer(supplier_user):
+    reset_coalescer()
+    warehouse = Warehouse.objects.create(name="Hot Warehouse", address="1 Hot St", owner=supplier_user)
+    product = Product.objects.create(name="Hot Product", price="1.00")
+    supply_stock(warehouse.id, product.id, 50, owner=supplier_user)
+    consumed, refused = [], []
+
+    def consume_until_empty():
+        for _ in range(OPERATIONS):
+            try:
+                stock = consume_stock(warehouse.id, product.id, 1)
+            except StockMutationError as exc:
+                assert str(exc) == INSUFFICIENT
+                refused.append(1)
+            else:
+                consumed.append(stock.quantity)
+
+    errors = _run_in_threads(consume_until_empty)
+    assert errors == []
+    # Каждый успешный вызов видит своё, уникальное количество после списания
+    assert sorted(consumed) == list(range(50))
+    assert len(refused) == THREADS * OPERATIONS - 50
+    assert Stock.objects.get(warehouse=warehouse, product=product).quantity == 0
+    assert rebuild_balances() == {}
+
+
+def test_write_coalescer_batches_concurrent_operations():
+    batches = []
+
+    def flush(key, payloads):
+        batches.append(len(payloads))
+        return [key + payload for payload in payloads]
+
+    coalescer = WriteCoalescer(flush, window=0.05, max_batch=THREADS)
+    results = []
+    threads = [
+        threading.Thread(target=lambda n=n: results.append(coalescer.submit(1, n))) for n in range(THREADS)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == [n + 1 for n in range(THREADS)]
+    assert sum(batches) == THREADS and len(batches) < THREADS
+
+
+@pytest.mark.django_db(transaction=True)
+@override_settings(STOCK_WRITE_COALESCING=COALESCING)
+def test_coalesced_consume_sees_stripes_missing_from_stale_list(supplier_user, warehouse, product):
+    reset_coalescer()
+    stock = supply_stock(warehouse.id, product.id, 2, owner=supplier_user)
+    # Список полос закэширован до разбиения остатка
+    assert striped_stocks() == {}
+    set_stripe_count(stock.id, 2)
+    cache.set(STRIPED_KEY, {}, STRIPED_TIMEOUT)
+    StockStripe.objects.filter(stock_id=stock.id, number=1).update(quantity=10)
+
+    assert consume_stock(warehouse.id, product.id, 5).quantity == 7
+    assert supply_stock(warehouse.id, product.id, 1, owner=supplier_user).quantity == 8
+    with pytest.raises(StockMutationError, match=INSUFFICIENT):
+        consume_stock(warehouse.id, product.id, 9)
+    assert total_quantity(stock.id) == 8
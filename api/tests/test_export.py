@@ -0,0 +1,52 @@
+# api/tests/test_export.py
+import csv
+import io
+import json
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from api.models import Warehouse, Product, Stock
+
+User = get_user_model()
+
+def _content(response):
+    return b"".join(response.streaming_content).decode()
+
+@pytest.fixture
+def stocks(supplier_user, warehouse, product):
+    stranger = User.objects.create_user(
+        username="supplier9", email="supplier9@example.com", password="StrongPassword123", user_type="supplier"
+    )
+    foreign = Warehouse.objects.create(name="Foreign Warehouse", address="9 Far St", owner=stranger)
+    other = Product.objects.create(name="Other Product", price="2.00")
+    return [
+        Stock.objects.create(warehouse=warehouse, product=product, quantity=5),
+        Stock.objects.create(warehouse=warehouse, product=other, quantity=6),
+        Stock.objects.create(warehouse=foreign, product=product, quantity=7),
+    ]
+
+@pytest.mark.django_db
+def test_export_ndjson_for_consumer(api_client, consumer_token, stocks):
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {consumer_token}")
+    response = api_client.get("/api/stocks/export/")
+    assert response.status_code == status.HTTP_200_OK
+    assert response["Content-Type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in _content(response).splitlines()]
+    assert [row["quantity"] for row in rows] == [5, 6, 7]
+    assert rows[0] == {"id": stocks[0].id, "warehouse": stocks[0].warehouse_id,
+                       "product": stocks[0].product_id, "quantity": 5}
+
+@pytest.mark.django_db
+def test_export_csv_respects_supplier_visibility(api_client, supplier_token, stocks):
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {supplier_token}")
+    response = api_client.get("/api/stocks/export/?output=csv")
+    assert response.status_code == status.HTTP_200_OK
+    rows = list(csv.reader(io.StringIO(_content(response))))
+    assert rows[0] == ["id", "warehouse", "product", "quantity"]
+    assert [row[3] for row in rows[1:]] == ["5", "6"]
+
+@pytest.mark.django_db
+def test_export_rejects_unknown_format(api_client, consumer_token):
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {consumer_token}")
+    response = api_client.get("/api/stocks/export/?output=xml")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
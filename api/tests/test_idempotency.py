@@ -0,0 +1,72 @@
+# api/tests/test_idempotency.py
+from datetime import timedelta
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from api.models import Stock, StockMovement, IdempotencyKey
+
+
+def _supply(api_client, supplier_token, warehouse, product, quantity, key):
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {supplier_token}", HTTP_IDEMPOTENCY_KEY=key)
+    return api_client.post(
+        "/api/supply/", {"warehouse": warehouse.id, "product": product.id, "quantity": quantity}, format="json"
+    )
+
+
+@pytest.mark.django_db
+def test_retried_supply_is_applied_once(api_client, supplier_token, warehouse, product):
+    first = _supply(api_client, supplier_token, warehouse, product, 5, "retry-1")
+    assert first.status_code == status.HTTP_200_OK
+
+    with CaptureQueriesContext(connection) as queries:
+        second = _supply(api_client, supplier_token, warehouse, product, 5, "retry-1")
+    assert second.status_code == status.HTTP_200_OK
+    assert second.data == first.data
+    assert second["Idempotent-Replayed"] == "true"
+    assert not any("api_stock" in query["sql"] for query in queries.captured_queries)
+
+    assert Stock.objects.get().quantity == 5
+    assert StockMovement.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_key_reused_with_other_body_is_rejected(api_client, supplier_token, warehouse, product):
+    _supply(api_client, supplier_token, warehouse, product, 5, "retry-2")
+    response = _supply(api_client, supplier_token, warehouse, product, 7, "retry-2")
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert Stock.objects.get().quantity == 5
+
+
+@pytest.mark.django_db
+def test_errors_are_replayed_and_keys_are_per_user(api_client, supplier_token, consumer_token,
+                                                    warehouse, product):
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {consumer_token}", HTTP_IDEMPOTENCY_KEY="shared")
+    payload = {"warehouse": warehouse.id, "product": product.id, "quantity": 1}
+    assert api_client.put("/api/consume/", payload, format="json").status_code == status.HTTP_400_BAD_REQUEST
+
+    # Тот же ключ другого пользователя не связан с ответом потребителя
+    assert _supply(api_client, supplier_token, warehouse, product, 3, "shared").status_code == status.HTTP_200_OK
+
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {consumer_token}", HTTP_IDEMPOTENCY_KEY="shared")
+    replay = api_client.put("/api/consume/", payload, format="json")
+    assert replay.status_code == status.HTTP_400_BAD_REQUEST
+    assert replay["Idempotent-Replayed"] == "true"
+    assert Stock.objects.get().quantity == 3
+
+
+@pytest.mark.django_db
+def test_expired_keys_are_reused_and_purged(api_client, supplier_token, warehouse, product):
+    _supply(api_client, supplier_token, warehouse, product, 5, "old")
+    _supply(api_client, supplier_token, warehouse, product, 1, "fresh")
+    IdempotencyKey.objects.filter(key="old").update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    assert _supply(api_client, supplier_token, warehouse, product, 5, "old").status_code == status.HTTP_200_OK
+    assert Stock.objects.get().quantity == 11
+
+    IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+    _supply(api_client, supplier_token, warehouse, product, 1, "new")
+    call_command("purge_idempotency_keys", "--batch-size", "1")
+    assert list(IdempotencyKey.objects.values_list("key", flat=True)) == ["new"]
@@ -0,0 +1,67 @@
+# api/tests/test_import.py
+import json
+from decimal import Decimal
+import pytest
+from django.core.management import call_command
+from rest_framework import status
+from api.ledger import rebuild_balances
+from api.models import Product, Stock, Warehouse, WarehouseStockTotal, ProductStockTotal
+from api.rollups import rebuild_rollups
+from api.services import supply_stock
+
+
+@pytest.mark.django_db
+def test_csv_upload_imports_rows_and_reports_errors(api_client, supplier_user, supplier_token, warehouse, product):
+    supply_stock(warehouse.id, product.id, 7, owner=supplier_user)
+    content = "\n".join([
+        "product,price,description,warehouse,warehouse_name,warehouse_address,quantity",
+        f"Main Product,12.50,,{warehouse.id},,,3",
+        "New Product,5.00,Fresh,,North,2 North St,40",
+        "Bad Price,abc,,,,,1",
+        "Other Product,1.00,,999999,,,1",
+        "No Price Product,,,,,,",
+        "New Product,5.00,Fresh,,North,,41",
+    ]) + "\n"
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {supplier_token}")
+    response = api_client.generic("POST", "/api/import/inventory/", content, content_type="text/csv")
+    assert response.status_code == status.HTTP_200_OK, response.data
+    assert response.data["rows"] == 6
+    assert sorted(error["line"] for error in response.data["errors"]) == [4, 5, 6]
+
+    north = Warehouse.objects.get(name="North")
+    assert Product.objects.get(name="Main Product").price == Decimal("12.50")
+    assert Product.objects.get(name="Other Product").price == Decimal("1.00")
+    assert dict(Stock.objects.values_list("warehouse_id", "quantity")) == {warehouse.id: 3, north.id: 41}
+
+    # Журнал и свёртки совпадают с пересчётом по остаткам
+    assert rebuild_balances() == {}
+    totals = sorted(WarehouseStockTotal.objects.values_list("warehouse_id", "quantity", "value"))
+    rebuild_rollups()
+    assert sorted(WarehouseStockTotal.objects.values_list("warehouse_id", "quantity", "value")) == totals
+    assert ProductStockTotal.objects.get(product=product).quantity == 3
+
+
+@pytest.mark.django_db
+def test_command_imports_ndjson_in_chunks(tmp_path, supplier_user, warehouse, capsys):
+    path = tmp_path / "inventory.ndjson"
+    with open(path, "w") as target:
+        for n in range(25):
+            target.write(json.dumps({"product": f"Item {n}", "price": "1.00", "warehouse": warehouse.id,
+                                     "quantity": n}) + "\n")
+        target.write("not json\n")
+    call_command("import_inventory", str(path), "--owner", supplier_user.username, "--chunk-size", "10")
+    output = capsys.readouterr()
+    assert "Строк: 26, товаров: 25, складов: 0, остатков: 25, ошибок: 1" in output.out
+    assert "Строка 26" in output.err
+    assert Stock.objects.filter(warehouse=warehouse).count() == 25
+
+
+@pytest.mark.django_db
+def test_import_requires_supplier_and_known_format(api_client, supplier_token, consumer_token):
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {consumer_token}")
+    response = api_client.generic("POST", "/api/import/inventory/", "product\n", content_type="text/csv")
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {supplier_token}")
+    response = api_client.generic("POST", "/api/import/inventory/", "{}", content_type="application/json")
+    assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
@@ -0,0 +1,70 @@
+# api/tests/test_indexes.py
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection, IntegrityError
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from api.models import Warehouse, Product, Stock, StockMovement, StockSnapshot
+from .explain import assert_index_scans, full_scans
+
+User = get_user_model()
+
+@pytest.fixture
+def seeded(supplier_user):
+    others = User.objects.bulk_create(
+        User(username=f"seed{i}", email=f"seed{i}@example.com", user_type="supplier") for i in range(20)
+    )
+    owners = [supplier_user] + others
+    warehouses = Warehouse.objects.bulk_create(
+        Warehouse(name=f"Seed Warehouse {i}", address="Seed St", owner=owners[i % len(owners)]) for i in range(200)
+    )
+    products = Product.objects.bulk_create(Product(name=f"Seed Product {i}", price="1.00") for i in range(100))
+    Stock.objects.bulk_create(Stock(warehouse=w, product=p, quantity=50) for w in warehouses for p in products[:20])
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+    else:
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE api_stock; ANALYZE api_warehouse')
+    own = next(w for w in warehouses if w.owner_id == supplier_user.id)
+    return own, products[0]
+
+def _capture(client, method, url, data=None):
+    with CaptureQueriesContext(connection) as queries:
+        response = getattr(client, method)(url, data, format="json")
+    assert response.status_code == status.HTTP_200_OK, f"{url} failed: {response.content}"
+    return queries
+
+@pytest.mark.django_db
+def test_supplier_endpoints_use_indexes(api_client, supplier_token, seeded):
+    warehouse, product = seeded
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {supplier_token}")
+    assert_index_scans(_capture(api_client, "get", "/api/stocks/"))
+    assert_index_scans(_capture(api_client, "post", "/api/supply/",
+                                {"warehouse": warehouse.id, "product": product.id, "quantity": 1}))
+
+@pytest.mark.django_db
+def test_consumer_endpoints_use_indexes(api_client, consumer_token, seeded):
+    warehouse, product = seeded
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {consumer_token}")
+    stock = Stock.objects.get(warehouse=warehouse, product=product)
+    assert_index_scans(_capture(api_client, "put", "/api/consume/",
+                                {"warehouse": warehouse.id, "product": product.id, "quantity": 1}))
+    assert_index_scans(_capture(api_client, "get", f"/api/stocks/{stock.id}/"))
+
+@pytest.mark.django_db
+def test_stock_lookup_by_product_uses_index(seeded):
+    _, product = seeded
+    plan = Stock.objects.filter(product=product).values_list("warehouse_id", "quantity").explain()
+    assert full_scans(plan.splitlines()) == []
+
+@pytest.mark.django_db
+def test_ledger_lookup_by_product_uses_index(seeded):
+    _, product = seeded
+    for queryset in (StockMovement.objects.filter(product=product), StockSnapshot.objects.filter(product=product)):
+        assert full_scans(queryset.values_list("id", flat=True).explain().splitlines()) == []
+
+@pytest.mark.django_db
+def test_database_rejects_negative_quantity(warehouse, product):
+    with pytest.raises(IntegrityError):
+        Stock.objects.create(warehouse=warehouse, product=product, quantity=-1)
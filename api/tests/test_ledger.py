@@ -0,0 +1,89 @@
+# api/tests/test_ledger.py
+import pytest
+from datetime import timedelta
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework import status
+from api.ledger import quantity_at, take_snapshot, rebuild_balances
+from api.models import Stock, StockMovement, StockSnapshot
+from api.services import supply_stock, consume_stock, apply_stock_movements, StockMutationError
+
+
+@pytest.mark.django_db
+def test_mutations_write_ledger(supplier_user, consumer_user, warehouse, product):
+    supply_stock(warehouse.id, product.id, 10, owner=supplier_user)
+    consume_stock(warehouse.id, product.id, 4)
+    with pytest.raises(StockMutationError):
+        consume_stock(warehouse.id, product.id, 100)
+    apply_stock_movements([
+        {"warehouse": warehouse.id, "product": product.id, "quantity": 1, "direction": "consume"},
+        {"warehouse": warehouse.id, "product": product.id, "quantity": 2, "direction": "consume"},
+    ], consumer_user)
+
+    deltas = list(StockMovement.objects.order_by("id").values_list("delta", flat=True))
+    assert deltas == [10, -4, -1, -2]
+    assert Stock.objects.get().quantity == sum(deltas)
+    assert rebuild_balances() == {}
+
+
+@pytest.mark.django_db
+def test_stock_delete_closes_ledger(supplier_user, warehouse, product):
+    stock = supply_stock(warehouse.id, product.id, 10, owner=supplier_user)
+    Stock.objects.filter(pk=stock.pk).delete()
+    assert list(StockMovement.objects.order_by("id").values_list("delta", flat=True)) == [10, -10]
+    # Сверка не восстанавливает удалённый остаток
+    assert rebuild_balances(apply=True) == {}
+    assert not Stock.objects.exists()
+
+
+@pytest.mark.django_db
+def test_atomic_batch_failure_writes_nothing(supplier_user, consumer_user, warehouse, product):
+    supply_stock(warehouse.id, product.id, 3, owner=supplier_user)
+    results = apply_stock_movements([
+        {"warehouse": warehouse.id, "product": product.id, "quantity": 5, "direction": "consume"},
+    ], consumer_user)
+    assert isinstance(results[0], StockMutationError)
+    assert StockMovement.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_quantity_at_reads_snapshot_and_tail(supplier_user, warehouse, product):
+    start = timezone.now()
+    supply_stock(warehouse.id, product.id, 10, owner=supplier_user)
+    StockMovement.objects.update(created_at=start - timedelta(hours=2))
+    consume_stock(warehouse.id, product.id, 3)
+    StockMovement.objects.filter(delta=-3).update(created_at=start - timedelta(hours=1))
+    supply_stock(warehouse.id, product.id, 5, owner=supplier_user)
+
+    assert take_snapshot(start - timedelta(minutes=90)) == (1, 0)
+    assert quantity_at(warehouse.id, product.id, start - timedelta(hours=3)) == 0
+    assert quantity_at(warehouse.id, product.id, start - timedelta(minutes=100)) == 10
+    assert quantity_at(warehouse.id, product.id, start - timedelta(minutes=30)) == 7
+    assert quantity_at(warehouse.id, product.id, timezone.now()) == 12
+
+    # После сжатия история до снимка не нужна для текущего остатка
+    call_command("snapshot_stock_ledger", "--lag", "0", "--prune")
+    assert StockMovement.objects.count() == 0
+    assert StockSnapshot.objects.order_by("-as_of").first().quantity == 12
+    assert rebuild_balances() == {}
+
+
+@pytest.mark.django_db
+def test_rebuild_fixes_drift(supplier_user, warehouse, product):
+    supply_stock(warehouse.id, product.id, 8, owner=supplier_user)
+    Stock.objects.update(quantity=100)
+    assert rebuild_balances() == {(warehouse.id, product.id): (100, 8)}
+    call_command("rebuild_stock_balances", "--apply")
+    assert Stock.objects.get().quantity == 8
+
+
+@pytest.mark.django_db
+def test_stock_history_endpoint(api_client, supplier_user, consumer_token, warehouse, product):
+    stock = supply_stock(warehouse.id, product.id, 6, owner=supplier_user)
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {consumer_token}")
+    at = (timezone.now() + timedelta(seconds=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    response = api_client.get(f"/api/stocks/{stock.id}/history/?at={at}")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["quantity"] == 6
+    response = api_client.get(f"/api/stocks/{stock.id}/history/?at=yesterday")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,50 @@
+# api/tests/test_metrics.py
+import re
+import pytest
+from rest_framework import status
+from api.metrics import registry
+
+
+def _sample(text, name, route):
+    match = re.search(rf'^{name}{{route="{route}"}} (\S+)$', text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+@pytest.fixture(autouse=True)
+def reset_registry():
+    registry.reset()
+
+
+@pytest.mark.django_db
+def test_metrics_per_route(client, supplier_token, consumer_token, warehouse, product):
+    consumer = {"HTTP_AUTHORIZATION": f"Token {consumer_token}"}
+    client.post("/api/supply/", {"warehouse": warehouse.id, "product": product.id, "quantity": 3},
+                content_type="application/json", HTTP_AUTHORIZATION=f"Token {supplier_token}")
+    client.get("/api/stocks/", **consumer)
+    client.get("/api/stocks/", **consumer)
+    client.get("/api/async/stocks/", **consumer)
+
+    response = client.get("/api/metrics/")
+    assert response.status_code == status.HTTP_200_OK
+    text = response.content.decode()
+    assert _sample(text, "api_requests_total", "stock-list") == 2
+    assert _sample(text, "api_requests_total", "async-stock-list") == 1
+    assert _sample(text, "api_request_duration_seconds_count", "stock-list") == 2
+    assert 'api_request_duration_seconds_bucket{route="stock-list",le="+Inf"} 2' in text
+    assert _sample(text, "api_db_queries_total", "supply-product") > 0
+    assert _sample(text, "api_db_queries_total", "async-stock-list") > 0
+    assert _sample(text, "api_serializer_duration_seconds_total", "stock-list") > 0
+
+
+@pytest.mark.django_db
+def test_metrics_are_not_public(client):
+    assert client.get("/api/metrics/", REMOTE_ADDR="10.0.0.1").status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+def test_slow_requests_are_profiled(client, settings, tmp_path, consumer_token):
+    settings.API_PROFILE_SAMPLE_RATE = 1
+    settings.API_PROFILE_THRESHOLD_MS = 0
+    settings.API_PROFILE_DIR = tmp_path
+    client.get("/api/stocks/", HTTP_AUTHORIZATION=f"Token {consumer_token}")
+    assert [path.name.split("-")[:2] for path in tmp_path.glob("*.prof")] == [["stock", "list"]]
@@ -0,0 +1,59 @@
+# api/tests/test_planning.py
+import pytest
+from rest_framework import status
+from api.ledger import rebuild_balances
+from api.models import Stock, Warehouse
+from api.planning import allocate, available_by_warehouse, PlanningError
+from api.reservations import reserve_stock
+from api.services import supply_stock
+
+
+def test_allocate_strategies():
+    available = {1: 5, 2: 20, 3: 8, 4: 1}
+    assert allocate(available, 25) == [(2, 20), (3, 5)]
+    assert allocate(available, 10, 'smallest_first') == [(4, 1), (1, 5), (3, 4)]
+    assert allocate(available, 10, 'preferred', preferred=[4, 9, 1]) == [(4, 1), (1, 5), (2, 4)]
+    with pytest.raises(PlanningError) as error:
+        allocate(available, 35)
+    assert error.value.available == 34
+
+
+@pytest.fixture
+def stocked(supplier_user, product):
+    warehouses = Warehouse.objects.bulk_create(
+        Warehouse(name=f"W{n}", address="Addr", owner=supplier_user) for n in range(3)
+    )
+    for warehouse, quantity in zip(warehouses, (4, 10, 6)):
+        supply_stock(warehouse.id, product.id, quantity, owner=supplier_user)
+    return [warehouse.id for warehouse in warehouses]
+
+
+@pytest.mark.django_db
+def test_plan_excludes_reserved_quantity(stocked, consumer_user, product, django_assert_num_queries):
+    reserve_stock(stocked[1], product.id, 7, consumer_user)
+    with django_assert_num_queries(1):
+        available = available_by_warehouse(product.id)
+    assert available == {stocked[0]: 4, stocked[1]: 3, stocked[2]: 6}
+
+
+@pytest.mark.django_db
+def test_plan_endpoint_executes_atomically(api_client, consumer_token, stocked, product):
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {consumer_token}")
+    response = api_client.post("/api/consume/plan/", {"product": product.id, "quantity": 15}, format="json")
+    assert response.status_code == status.HTTP_200_OK, response.data
+    assert response.data["allocations"] == [{"warehouse": stocked[1], "quantity": 10},
+                                            {"warehouse": stocked[2], "quantity": 5}]
+    assert Stock.objects.get(warehouse_id=stocked[1]).quantity == 10
+
+    response = api_client.post("/api/consume/plan/", {
+        "product": product.id, "quantity": 12, "strategy": "smallest_first", "execute": True,
+    }, format="json")
+    assert response.status_code == status.HTTP_200_OK, response.data
+    assert [stock["quantity"] for stock in response.data["stocks"]] == [0, 0, 8]
+    assert rebuild_balances() == {}
+
+    response = api_client.post("/api/consume/plan/", {"product": product.id, "quantity": 9, "execute": True},
+                               format="json")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.data["available"] == 8
+    assert sorted(Stock.objects.values_list("quantity", flat=True)) == [0, 0, 8]
@@ -0,0 +1,83 @@
+# api/tests/test_query_counts.py
+"""
+Регрессионные проверки производительности списков.
+
+Количество SQL-запросов на эндпоинт не должно зависеть от числа строк,
+а время ответа на крупном наборе данных должно оставаться в пределах бюджета.
+"""
+import time
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from api.models import Warehouse, Product, Stock
+
+SMALL = 5
+LARGE = 500
+# Бюджет с большим запасом: ловит возврат N+1, а не колебания окружения
+RESPONSE_TIME_BUDGET = 2.0
+
+ENDPOINTS = [
+    ("supplier", "/api/stocks/"),
+    ("consumer", "/api/stocks/"),
+    ("supplier", "/api/warehouses/"),
+    ("supplier", "/api/products/"),
+    ("consumer", "/api/users/"),
+]
+
+
+def seed_inventory(owner, count, prefix):
+    warehouses = Warehouse.objects.bulk_create(
+        Warehouse(name=f"{prefix} Warehouse {i}", address=f"{i} Seed St", owner=owner)
+        for i in range(count)
+    )
+    products = Product.objects.bulk_create(
+        Product(name=f"{prefix} Product {i}", description="Seeded", price="1.00")
+        for i in range(count)
+    )
+    Stock.objects.bulk_create(
+        Stock(warehouse=warehouse, product=product, quantity=i)
+        for i, (warehouse, product) in enumerate(zip(warehouses, products))
+    )
+
+
+def measure(client, url):
+    # Кэш справочников сбрасывается, чтобы сравнивать холодные запросы
+    cache.clear()
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = client.get(url, format="json")
+        elapsed = time.perf_counter() - started
+    assert response.status_code == status.HTTP_200_OK, f"{url} failed: {response.content}"
+    return len(queries), elapsed
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("role,url", ENDPOINTS)
+def test_list_query_count_is_constant(api_client, supplier_user, supplier_token, consumer_token, role, url):
+    token = supplier_token if role == "supplier" else consumer_token
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {token}")
+
+    seed_inventory(supplier_user, SMALL, "Small")
+    # Первый запрос прогревает кэш токенов; дальше сравниваются тёплые запросы
+    measure(api_client, url)
+    small_queries, _ = measure(api_client, url)
+
+    seed_inventory(supplier_user, LARGE, "Large")
+    large_queries, elapsed = measure(api_client, url)
+
+    assert large_queries == small_queries, f"{url}: {small_queries} queries for {SMALL} rows, {large_queries} for {LARGE}"
+    assert elapsed < RESPONSE_TIME_BUDGET, f"{url} took {elapsed:.3f}s for {LARGE} rows"
+
+
+@pytest.mark.django_db
+def test_stock_detail_query_count(api_client, consumer_token, warehouse, product):
+    stock = Stock.objects.create(warehouse=warehouse, product=product, quantity=1)
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {consumer_token}")
+    api_client.get(f"/api/stocks/{stock.id}/")
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(f"/api/stocks/{stock.id}/")
+    assert response.status_code == status.HTTP_200_OK
+    # Токен, склад и товар берутся из кэша; читается только строка остатка
+    assert len(queries) == 1
@@ -0,0 +1,61 @@
+# api/tests/test_renderers.py
+import datetime
+import json
+from decimal import Decimal
+from io import BytesIO
+import pytest
+from django.test import RequestFactory
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from api import renderers
+from api.cache import stock_detail_context
+from api.models import Stock
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer
+from api.reservations import reserve_stock
+from api.serializers import StockSerializer, STOCK_VALUES, stock_rows
+from api.services import supply_stock
+from api.striping import set_stripe_count
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("fields", [None, "id,quantity,available,product_detail"])
+def test_stock_rows_match_serializer(supplier_user, consumer_user, warehouse, product, fields):
+    stock = supply_stock(warehouse.id, product.id, 10, owner=supplier_user)
+    set_stripe_count(stock.pk, 4)
+    supply_stock(warehouse.id, product.id, 5, owner=supplier_user)
+    reserve_stock(warehouse.id, product.id, 3, consumer_user)
+    request = RequestFactory().get("/api/stocks/", {"fields": fields} if fields else {})
+    queryset = Stock.objects.with_total_quantity().order_by("id")
+    requested = StockSerializer.requested_fields(request)
+
+    stocks = list(queryset)
+    expected = StockSerializer(
+        stocks, many=True, context={"request": request, **stock_detail_context(stocks, requested)}
+    ).data
+    rows = list(queryset.values(*STOCK_VALUES))
+    assert stock_rows(rows, {"request": request, **stock_detail_context(rows, requested)}) == expected
+
+
+def test_renderer_matches_drf_output():
+    data = {
+        "price": Decimal("1.50"), "at": datetime.datetime(2024, 5, 1, 12, 0, 0, 123456, tzinfo=datetime.timezone.utc),
+        "name": "Склад\u20281", "ids": (1, 2), 3: None,
+    }
+    rendered = FastJSONRenderer().render(data)
+    assert json.loads(rendered) == json.loads(JSONRenderer().render(data))
+    assert b"\\u2028" in rendered
+    # Отступы по Accept рендерит стандартный JSONRenderer
+    assert FastJSONRenderer().render([1], "application/json; indent=2") == b"[\n  1\n]"
+
+
+def test_parser_reports_errors(monkeypatch):
+    assert FastJSONParser().parse(BytesIO('{"name": "Товар"}'.encode())) == {"name": "Товар"}
+    with pytest.raises(ParseError):
+        FastJSONParser().parse(BytesIO(b'{"value": NaN}'))
+    # Без orjson работает стандартный разбор
+    monkeypatch.setattr(renderers, "orjson", None)
+    monkeypatch.setattr("api.parsers.orjson", None)
+    assert FastJSONRenderer().render({"a": 1}) == b'{"a":1}'
+    with pytest.raises(ParseError):
+        FastJSONParser().parse(BytesIO(b"{"), parser_context={"encoding": "utf-8"})
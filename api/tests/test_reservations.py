@@ -0,0 +1,95 @@
+# api/tests/test_reservations.py
+import datetime
+import pytest
+from django.contrib import admin
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework import status
+from api import availability
+from api.admin import ReservationAdmin
+from api.ledger import rebuild_balances
+from api.models import Stock, Reservation
+from api.services import supply_stock, consume_stock, StockMutationError, INSUFFICIENT
+from api.reservations import reserve_stock, sweep_expired
+from api.striping import set_stripe_count
+
+
+@pytest.mark.django_db
+def test_reserve_confirm_and_release(consumer_client, supplier_user, warehouse, product,
+                                     django_capture_on_commit_callbacks):
+    supply_stock(warehouse.id, product.id, 10, owner=supplier_user)
+    with django_capture_on_commit_callbacks(execute=True):
+        first = consumer_client.post("/api/reservations/", {
+            "warehouse": warehouse.id, "product": product.id, "quantity": 4, "ttl": 60,
+        }, format="json")
+        second = consumer_client.post("/api/reservations/", {
+            "warehouse": warehouse.id, "product": product.id, "quantity": 5,
+        }, format="json")
+    assert first.status_code == status.HTTP_201_CREATED, first.data
+    assert first.data["warehouse"] == warehouse.id and first.data["quantity"] == 4
+    assert availability.get_many([(warehouse.id, product.id)]) == {(warehouse.id, product.id): 1}
+
+    # Списание и новый резерв не забирают зарезервированное
+    with pytest.raises(StockMutationError, match=INSUFFICIENT):
+        consume_stock(warehouse.id, product.id, 2)
+    response = consumer_client.post("/api/reservations/", {
+        "warehouse": warehouse.id, "product": product.id, "quantity": 2,
+    }, format="json")
+    assert response.data == {"error": INSUFFICIENT}
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = consumer_client.post(f"/api/reservations/{first.data['id']}/confirm/")
+    assert response.status_code == status.HTTP_200_OK, response.data
+    assert (response.data["quantity"], response.data["reserved"], response.data["available"]) == (6, 5, 1)
+    assert consumer_client.post(f"/api/reservations/{first.data['id']}/confirm/").status_code == 404
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = consumer_client.post(f"/api/reservations/{second.data['id']}/release/")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    stock = Stock.objects.get(warehouse=warehouse, product=product)
+    assert (stock.quantity, stock.reserved) == (6, 0)
+    assert availability.get_many([(warehouse.id, product.id)]) == {(warehouse.id, product.id): 6}
+    assert rebuild_balances() == {}
+
+
+@pytest.mark.django_db
+def test_reserve_collapses_stripes(consumer_user, supplier_user, warehouse, product):
+    stock = supply_stock(warehouse.id, product.id, 2, owner=supplier_user)
+    set_stripe_count(stock.id, 4)
+    for _ in range(6):
+        supply_stock(warehouse.id, product.id, 1, owner=supplier_user)
+    reserve_stock(warehouse.id, product.id, 8, consumer_user)
+    stock.refresh_from_db()
+    assert (stock.quantity, stock.reserved) == (8, 8)
+
+
+@pytest.mark.django_db
+def test_sweep_releases_expired_reservations_in_batches(consumer_user, supplier_user, warehouse, product):
+    supply_stock(warehouse.id, product.id, 10, owner=supplier_user)
+    for _ in range(5):
+        reserve_stock(warehouse.id, product.id, 1, consumer_user)
+    active = reserve_stock(warehouse.id, product.id, 2, consumer_user, ttl=3600)
+
+    later = timezone.now() + datetime.timedelta(hours=1, seconds=-1)
+    assert sweep_expired(batch_size=2, now=later) == 5
+    assert list(Reservation.objects.values_list("id", flat=True)) == [active.id]
+    assert Stock.objects.get(warehouse=warehouse, product=product).reserved == 2
+
+    Reservation.objects.update(expires_at=timezone.now())
+    call_command("sweep_reservations", "--batch-size", "10")
+    assert Stock.objects.get(warehouse=warehouse, product=product).reserved == 0
+
+
+@pytest.mark.django_db
+def test_admin_deletes_reservations_through_release(consumer_user, supplier_user, warehouse, product):
+    supply_stock(warehouse.id, product.id, 10, owner=supplier_user)
+    first = reserve_stock(warehouse.id, product.id, 3, consumer_user)
+    second = reserve_stock(warehouse.id, product.id, 4, consumer_user)
+    model_admin = ReservationAdmin(Reservation, admin.site)
+    assert not model_admin.has_change_permission(None, first)
+
+    model_admin.delete_model(None, first)
+    assert Stock.objects.get().reserved == 4
+    model_admin.delete_queryset(None, Reservation.objects.filter(pk__in=[first.pk, second.pk]))
+    assert Stock.objects.get().reserved == 0
+    assert not Reservation.objects.exists()
@@ -0,0 +1,85 @@
+# api/tests/test_rollups.py
+import pytest
+from decimal import Decimal
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from api.models import Warehouse, Product, Stock, ProductStockTotal, WarehouseStockTotal
+from api.services import supply_stock, consume_stock, apply_stock_movements
+
+
+def rollups():
+    return (
+        dict(ProductStockTotal.objects.values_list("product_id", "quantity")),
+        {w: (q, v) for w, q, v in WarehouseStockTotal.objects.values_list("warehouse_id", "quantity", "value")},
+    )
+
+
+@pytest.fixture
+def inventory(supplier_user, consumer_user, warehouse, product):
+    second_warehouse = Warehouse.objects.create(name="Second Warehouse", address="2 Main St", owner=supplier_user)
+    cheap = Product.objects.create(name="Cheap Product", price="0.50")
+    supply_stock(warehouse.id, product.id, 10, owner=supplier_user)
+    supply_stock(second_warehouse.id, product.id, 5, owner=supplier_user)
+    consume_stock(second_warehouse.id, product.id, 2)
+    apply_stock_movements([
+        {"warehouse": warehouse.id, "product": cheap.id, "quantity": 4, "direction": "supply"},
+    ], supplier_user)
+    return warehouse, second_warehouse, product, cheap
+
+
+@pytest.mark.django_db
+def test_mutations_maintain_rollups(inventory):
+    warehouse, second, product, cheap = inventory
+    products, warehouses = rollups()
+    assert products == {product.id: 13, cheap.id: 4}
+    assert warehouses == {warehouse.id: (14, Decimal("102.00")), second.id: (3, Decimal("30.00"))}
+
+    product.price = Decimal("20.00")
+    product.save()
+    assert rollups()[1][warehouse.id] == (14, Decimal("202.00"))
+
+    second.delete()
+    assert rollups()[0][product.id] == 10
+    cheap.delete()
+    assert rollups()[1] == {warehouse.id: (10, Decimal("200.00"))}
+
+    expected = rollups()
+    call_command("rebuild_stock_rollups")
+    assert rollups() == expected
+
+
+@pytest.mark.django_db
+def test_stock_delete_updates_rollups(inventory):
+    warehouse, second, product, cheap = inventory
+    Stock.objects.get(warehouse=warehouse, product=product).delete()
+    assert rollups() == ({product.id: 3, cheap.id: 4},
+                         {warehouse.id: (4, Decimal("2.00")), second.id: (3, Decimal("30.00"))})
+    Stock.objects.filter(product=cheap).delete()
+    assert rollups() == ({product.id: 3, cheap.id: 0},
+                         {warehouse.id: (0, Decimal("0.00")), second.id: (3, Decimal("30.00"))})
+
+
+@pytest.mark.django_db
+def test_summary_endpoints(api_client, supplier_token, consumer_token, inventory):
+    warehouse, second, product, cheap = inventory
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {consumer_token}")
+    response = api_client.get("/api/stocks/summary/products/")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["results"] == [{"product": product.id, "quantity": 13}, {"product": cheap.id, "quantity": 4}]
+
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get("/api/stocks/summary/warehouses/?page_size=1")
+    assert response.data["results"] == [{"warehouse": warehouse.id, "quantity": 14, "value": "102.00"}]
+    # Свёртка читается без обращения к таблице остатков
+    assert not any("api_stock" in q["sql"] for q in queries)
+
+    response = api_client.get("/api/stocks/low/?threshold=5")
+    assert [(s["warehouse"], s["quantity"]) for s in response.data["results"]] == [(second.id, 3), (warehouse.id, 4)]
+    assert api_client.get("/api/stocks/low/?threshold=x").status_code == status.HTTP_400_BAD_REQUEST
+
+    # Поставщику товарные итоги считаются по его складам
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {supplier_token}")
+    response = api_client.get("/api/stocks/summary/products/")
+    assert response.data["results"] == [{"product": product.id, "quantity": 13}, {"product": cheap.id, "quantity": 4}]
@@ -40,10 +40,37 @@ def test_view_stocks(api_client, supplier_token):
     url = "/api/stocks/"
     response = api_client.get(url, format="json")
     assert response.status_code == status.HTTP_200_OK, f"Failed to view stocks: {response.content}"
-    assert isinstance(response.data, list), "Stocks response is not a list"
-    assert len(response.data) >= 1, "No stocks found"
+    assert isinstance(response.data["results"], list), "Stocks response is not a paginated list"
+    assert len(response.data["results"]) >= 1, "No stocks found"
 
     # Проверяем, что один из запасов соответствует созданным данным
-    stock = next((s for s in response.data if s["warehouse"] == warehouse["id"] and s["product"] == product["id"]), None)
+    stock = next((s for s in response.data["results"] if s["warehouse"] == warehouse["id"] and s["product"] == product["id"]), None)
     assert stock is not None, "Stock entry not found"
     assert stock["quantity"] == 100, "Incorrect stock quantity"
+
+@pytest.mark.django_db
+def test_stocks_keyset_pagination(api_client, consumer_token, supplier_user):
+    from api.models import Warehouse, Product, Stock
+    warehouse = Warehouse.objects.create(name="Paged Warehouse", address="1 Page St", owner=supplier_user)
+    products = Product.objects.bulk_create(Product(name=f"Paged {i}", price="1.00") for i in range(5))
+    Stock.objects.bulk_create(Stock(warehouse=warehouse, product=p, quantity=i) for i, p in enumerate(products))
+
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {consumer_token}")
+    seen = []
+    url = "/api/stocks/?page_size=2"
+    while url:
+        response = api_client.get(url, format="json")
+        assert response.status_code == status.HTTP_200_OK, f"Failed to view stocks: {response.content}"
+        assert len(response.data["results"]) <= 2
+        seen.extend(s["id"] for s in response.data["results"])
+        url = response.data["next"]
+    assert seen == sorted(Stock.objects.values_list("id", flat=True))
+
+@pytest.mark.django_db
+def test_stocks_sparse_fields(api_client, consumer_token, warehouse, product):
+    from api.models import Stock
+    Stock.objects.create(warehouse=warehouse, product=product, quantity=7)
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {consumer_token}")
+    response = api_client.get("/api/stocks/?fields=id,product,quantity", format="json")
+    assert response.status_code == status.HTTP_200_OK, f"Failed to view stocks: {response.content}"
+    assert set(response.data["results"][0]) == {"id", "product", "quantity"}
@@ -0,0 +1,78 @@
+# api/tests/test_striping.py
+import pytest
+from rest_framework import status
+from api.ledger import rebuild_balances
+from api.models import Stock, StockStripe
+from api.services import supply_stock, consume_stock, apply_stock_movements, StockMutationError, INSUFFICIENT
+from api.striping import set_stripe_count, total_quantity
+from .test_concurrency import _run_in_threads, THREADS, OPERATIONS
+
+
+@pytest.fixture
+def striped_stock(supplier_user, warehouse, product):
+    stock = supply_stock(warehouse.id, product.id, 1, owner=supplier_user)
+    set_stripe_count(stock.id, 4)
+    return stock
+
+
+@pytest.mark.django_db
+def test_supplies_spread_over_stripes_and_reads_report_total(api_client, supplier_user, consumer_token,
+                                                            striped_stock, warehouse, product):
+    for _ in range(40):
+        assert supply_stock(warehouse.id, product.id, 1, owner=supplier_user).quantity > 1
+    assert StockStripe.objects.filter(quantity__gt=0).exists()
+    assert total_quantity(striped_stock.id) == 41
+
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {consumer_token}")
+    assert api_client.get(f"/api/stocks/{striped_stock.id}/").data["quantity"] == 41
+    assert api_client.get("/api/stocks/").data["results"][0]["quantity"] == 41
+    assert rebuild_balances() == {}
+
+
+@pytest.mark.django_db
+def test_consume_falls_back_to_cross_stripe(supplier_user, consumer_user, striped_stock, warehouse, product):
+    StockStripe.objects.update(quantity=5)
+    assert consume_stock(warehouse.id, product.id, 12).quantity == 4
+    assert Stock.objects.get().quantity == 4
+    assert not StockStripe.objects.filter(quantity__gt=0).exists()
+
+    with pytest.raises(StockMutationError) as exc:
+        consume_stock(warehouse.id, product.id, 5)
+    assert str(exc.value) == INSUFFICIENT
+
+    StockStripe.objects.update(quantity=2)
+    results = apply_stock_movements(
+        [{"warehouse": warehouse.id, "product": product.id, "quantity": 9, "direction": "consume"}], consumer_user
+    )
+    assert results[0].quantity == 1
+
+
+@pytest.mark.django_db
+def test_stripe_count_changes_online(api_client, supplier_token, consumer_token, striped_stock):
+    StockStripe.objects.update(quantity=3)
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {supplier_token}")
+    response = api_client.put(f"/api/stocks/{striped_stock.id}/stripes/", {"stripes": 2}, format="json")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == {"id": striped_stock.id, "stripes": 2, "quantity": 10}
+    assert list(StockStripe.objects.values_list("number", "quantity")) == [(1, 3)]
+
+    response = api_client.put(f"/api/stocks/{striped_stock.id}/stripes/", {"stripes": 1000}, format="json")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {consumer_token}")
+    response = api_client.put(f"/api/stocks/{striped_stock.id}/stripes/", {"stripes": 2}, format="json")
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_striped_writes_keep_exact_total(supplier_user, warehouse, product):
+    stock = supply_stock(warehouse.id, product.id, 100, owner=supplier_user)
+    set_stripe_count(stock.id, 4)
+
+    def supply_then_consume():
+        for _ in range(OPERATIONS):
+            supply_stock(warehouse.id, product.id, 3, owner=supplier_user)
+            consume_stock(warehouse.id, product.id, 2)
+
+    assert _run_in_threads(supply_then_consume) == []
+    assert total_quantity(stock.id) == 100 + THREADS * OPERATIONS
+    assert rebuild_balances() == {}
@@ -0,0 +1,73 @@
+# api/tests/test_sync.py
+import pytest
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from rest_framework import status
+from api.models import Product, Stock, Tombstone, Warehouse
+from api.services import supply_stock, consume_stock
+
+pytestmark = pytest.mark.django_db
+
+
+@override_settings(STOCK_SYNC={"SETTLE_SECONDS": 0, "LIMIT": 2})
+def test_sync_returns_changes_since_watermark(consumer_client, supplier_user, warehouse, product):
+    response = consumer_client.get("/api/stocks/changes/")
+    assert response.data["reset"] is True
+    watermark = response.data["watermark"]
+
+    other = Product.objects.create(name="Other", price="2.00")
+    supply_stock(warehouse.id, product.id, 5, owner=supplier_user)
+    supply_stock(warehouse.id, other.id, 3, owner=supplier_user)
+    consume_stock(warehouse.id, product.id, 1)
+
+    # LIMIT=2: первая страница читает две записи журнала, количества — текущие
+    first = consumer_client.get("/api/stocks/changes/", {"since": watermark}).data
+    assert first["has_more"] is True
+    assert [(stock["product"], stock["quantity"]) for stock in first["stocks"]] == [(product.id, 4), (other.id, 3)]
+    assert [row["name"] for row in first["products"]] == ["Other"]
+    second = consumer_client.get("/api/stocks/changes/", {"since": first["watermark"]}).data
+    assert second["has_more"] is False
+    assert [(stock["product"], stock["quantity"]) for stock in second["stocks"]] == [(product.id, 4)]
+
+    third = consumer_client.get("/api/stocks/changes/", {"since": second["watermark"]}).data
+    assert (third["stocks"], third["products"], third["warehouses"]) == ([], [], [])
+
+
+@override_settings(STOCK_SYNC={"SETTLE_SECONDS": 0})
+def test_sync_reports_tombstones(consumer_client, supplier_user, warehouse, product):
+    other = Product.objects.create(name="Other", price="2.00")
+    supply_stock(warehouse.id, product.id, 5, owner=supplier_user)
+    stock = supply_stock(warehouse.id, other.id, 3, owner=supplier_user)
+    watermark = consumer_client.get("/api/stocks/changes/").data["watermark"]
+
+    warehouse_id = warehouse.id
+    Stock.objects.filter(pk=stock.pk).delete()
+    warehouse.delete()
+    response = consumer_client.get("/api/stocks/changes/", {"since": watermark})
+    assert response.data["deleted"] == {"warehouses": [warehouse_id], "products": [], "stocks": [stock.pk]}
+    # Остаток, удалённый каскадом со складом, отдельной отметки не получает
+    assert Tombstone.objects.count() == 2
+
+    response = consumer_client.get("/api/stocks/changes/", {"since": "not-a-watermark"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@override_settings(STOCK_SYNC={"SETTLE_SECONDS": 0})
+def test_supplier_sees_only_own_tombstones(api_client, supplier_user, supplier_token, warehouse, product):
+    stranger = get_user_model().objects.create_user(username="supplier9", email="supplier9@example.com",
+                                                    password="StrongPassword123", user_type="supplier")
+    foreign = Warehouse.objects.create(name="Foreign", address="3 Foreign St", owner=stranger)
+    own_stock = supply_stock(warehouse.id, product.id, 5, owner=supplier_user)
+    foreign_stock = supply_stock(foreign.id, product.id, 5, owner=stranger)
+    api_client.credentials(HTTP_AUTHORIZATION=f"Token {supplier_token}")
+    watermark = api_client.get("/api/stocks/changes/").data["watermark"]
+
+    Stock.objects.filter(pk__in=[own_stock.pk, foreign_stock.pk]).delete()
+    foreign_id = foreign.id
+    foreign.delete()
+    other = Product.objects.create(name="Other", price="2.00")
+    other_id = other.id
+    other.delete()
+    response = api_client.get("/api/stocks/changes/", {"since": watermark})
+    assert response.data["deleted"] == {"warehouses": [], "products": [other_id], "stocks": [own_stock.pk]}
+    assert Tombstone.objects.filter(kind="warehouse", object_id=foreign_id, owner_id=stranger.pk).exists()
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import views, async_views
 
 urlpatterns = [
     path('users/', views.UserListView.as_view(), name='user-list'),
@@ -10,7 +10,27 @@ urlpatterns = [
     path('products/', views.ProductListCreateView.as_view(), name='product-list-create'),
     path('products/<int:pk>/', views.ProductDetailView.as_view(), name='product-detail'),
     path('stocks/', views.StockListView.as_view(), name='stock-list'),
+    path('stocks/export/', views.StockExportView.as_view(), name='stock-export'),
+    path('stocks/availability/', views.StockAvailabilityView.as_view(), name='stock-availability'),
+    path('stocks/low/', views.LowStockListView.as_view(), name='stock-low'),
+    path('stocks/summary/products/', views.ProductStockTotalsView.as_view(), name='stock-summary-products'),
+    path('stocks/summary/warehouses/', views.WarehouseValuationView.as_view(), name='stock-summary-warehouses'),
+    path('stocks/changes/', views.StockSyncView.as_view(), name='stock-changes'),
+    path('stocks/stream/', async_views.stock_changes, name='stock-stream'),
     path('stocks/<int:pk>/', views.StockDetailView.as_view(), name='stock-detail'),
+    path('stocks/<int:pk>/history/', views.StockHistoryView.as_view(), name='stock-history'),
+    path('stocks/<int:pk>/stripes/', views.StockStripesView.as_view(), name='stock-stripes'),
     path('supply/', views.SupplyProductView.as_view(), name='supply-product'),
     path('consume/', views.ConsumeProductView.as_view(), name='consume-product'),
+    path('reservations/', views.ReservationCreateView.as_view(), name='reservation-create'),
+    path('reservations/<int:pk>/confirm/', views.ReservationConfirmView.as_view(), name='reservation-confirm'),
+    path('reservations/<int:pk>/release/', views.ReservationReleaseView.as_view(), name='reservation-release'),
+    path('consume/plan/', views.FulfillmentPlanView.as_view(), name='consume-plan'),
+    path('stock-movements/batch/', views.StockMovementBatchView.as_view(), name='stock-movement-batch'),
+    path('import/inventory/', views.InventoryImportView.as_view(), name='inventory-import'),
+    path('metrics/', views.metrics_view, name='metrics'),
+    path('async/stocks/', async_views.stock_list, name='async-stock-list'),
+    path('async/stocks/<int:pk>/', async_views.stock_detail, name='async-stock-detail'),
+    path('async/supply/', async_views.supply, name='async-supply-product'),
+    path('async/consume/', async_views.consume, name='async-consume-product'),
 ]
@@ -1,22 +1,59 @@
+import codecs
+import csv
+import json
+from django.conf import settings
+from django.db.models import Sum
+from django.http import HttpResponse, StreamingHttpResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import generics, status
 from rest_framework.response import Response
-from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
 from django.contrib.auth import get_user_model
 from .serializers import (
     UserRegistrationSerializer,
     UserLoginSerializer,
     WarehouseSerializer,
     ProductSerializer,
-    StockSerializer
+    StockSerializer,
+    STOCK_VALUES,
+    stock_rows,
+    ReservationSerializer,
+    StockMovementSerializer,
+    StockMovementBatchSerializer,
+    FulfillmentPlanSerializer,
+    ProductStockTotalSerializer,
+    WarehouseStockTotalSerializer
+)
+from .permissions import IsSupplier, IsConsumer, IsSupplierOrConsumer
+from .models import Warehouse, Product, Stock, ProductStockTotal, WarehouseStockTotal
+from .pagination import ProductKeysetPagination, WarehouseKeysetPagination
+from . import availability
+from .authentication import issue_token
+from .idempotency import idempotent
+from .delta import delta_since
+from .importing import READERS, import_inventory
+from .planning import plan_fulfillment, PlanningError
+from .reservations import reserve_stock, confirm_reservation, release_reservation, RESERVATION_NOT_FOUND
+from .metrics import registry
+from .ledger import quantity_at
+from .striping import set_stripe_count, total_quantity
+from .cache import product_cache, warehouse_cache, stock_detail_context, not_modified
+from .services import (
+    supply_stock,
+    consume_stock,
+    apply_stock_movements,
+    StockMutationError,
+    BATCH_ABORTED,
+    WAREHOUSE_NOT_OWNED
 )
-from .permissions import IsSupplier, IsConsumer
-from .models import Warehouse, Product, Stock
 from rest_framework.permissions import AllowAny, IsAuthenticated
 
 User = get_user_model()
 
 class UserListView(generics.ListAPIView):
-    queryset = User.objects.all()
+    queryset = User.objects.only('id', 'username', 'email', 'user_type')
     serializer_class = UserRegistrationSerializer
     permission_classes = [AllowAny]
 
@@ -28,10 +65,9 @@ class UserRegistrationView(generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
-        token, created = Token.objects.get_or_create(user=user)
         return Response({
             "user": serializer.data,
-            "token": token.key
+            "token": issue_token(user)
         }, status=status.HTTP_201_CREATED)
 
 class UserLoginView(generics.GenericAPIView):
@@ -42,133 +78,510 @@ class UserLoginView(generics.GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
-        token, created = Token.objects.get_or_create(user=user)
         return Response({
-            "token": token.key
+            "token": issue_token(user)
         }, status=status.HTTP_200_OK)
 
-class WarehouseListCreateView(generics.ListCreateAPIView):
-    queryset = Warehouse.objects.all()
+class CatalogCacheMixin:
+    """
+    GET списка и объекта с ETag/If-None-Match поверх api.cache.
+
+    Объект отдаётся из кэша без обращения к базе; список по-прежнему читается
+    из базы, но при совпадении ETag клиент получает 304 без запроса к базе.
+    """
+    model_cache = None
+
+    def list(self, request, *args, **kwargs):
+        etag = self.model_cache.list_etag(request)
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+        response = super().list(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        entry = self.model_cache.get(self.kwargs['pk'])
+        if entry is None:
+            raise Http404
+        # Проверки объекта получают облегчённый экземпляр из закэшированных полей
+        obj = self.get_queryset().model(pk=self.kwargs['pk'])
+        if entry['owner_id'] is not None:
+            obj.owner_id = entry['owner_id']
+        self.check_object_permissions(request, obj)
+        cached = not_modified(request, entry['etag'])
+        if cached is not None:
+            return cached
+        return Response(entry['data'], headers={'ETag': entry['etag']})
+
+class WarehouseListCreateView(CatalogCacheMixin, generics.ListCreateAPIView):
+    queryset = Warehouse.objects.with_owner()
     serializer_class = WarehouseSerializer
     permission_classes = [IsAuthenticated, IsSupplier]
+    model_cache = warehouse_cache
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
-class WarehouseDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Warehouse.objects.all()
+class WarehouseDetailView(CatalogCacheMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Warehouse.objects.with_owner()
     serializer_class = WarehouseSerializer
     permission_classes = [IsAuthenticated, IsSupplier]
+    model_cache = warehouse_cache
 
-class ProductListCreateView(generics.ListCreateAPIView):
+class ProductListCreateView(CatalogCacheMixin, generics.ListCreateAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated, IsSupplier]
+    model_cache = product_cache
 
-class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ProductDetailView(CatalogCacheMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated, IsSupplier]
+    model_cache = product_cache
+
+class StockSerializerMixin:
+    """Сериализует остатки со складами и товарами из api.cache вместо JOIN."""
+
+    def get_stock_serializer(self, stocks, many=False):
+        fields = StockSerializer.requested_fields(self.request)
+        context = {
+            **self.get_serializer_context(),
+            **stock_detail_context(stocks if many else [stocks], fields),
+        }
+        return StockSerializer(stocks, many=many, context=context)
 
-class StockListView(generics.ListAPIView):
+class StockListView(StockSerializerMixin, generics.ListAPIView):
     queryset = Stock.objects.all()
     serializer_class = StockSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'supplier':
-            return Stock.objects.filter(warehouse__owner=user)
-        elif user.user_type == 'consumer':
-            return Stock.objects.all()
-        return Stock.objects.none()
-
-class StockDetailView(generics.RetrieveAPIView):
-    queryset = Stock.objects.all()
-    serializer_class = StockSerializer
+        return Stock.objects.visible_to(self.request.user).with_total_quantity()
+
+    def list(self, request, *args, **kwargs):
+        # Список только читается, поэтому строки values() сериализуются
+        # stock_rows без моделей и полей StockSerializer
+        queryset = self.filter_queryset(self.get_queryset()).values(*STOCK_VALUES)
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+        fields = StockSerializer.requested_fields(request)
+        data = stock_rows(rows, {**self.get_serializer_context(), **stock_detail_context(rows, fields)})
+        return Response(data) if page is None else self.get_paginated_response(data)
+
+class LowStockListView(StockListView):
+    """Остатки ниже порога: ?threshold=<n> (по умолчанию STOCK_LOW_THRESHOLD)."""
+
+    def get_queryset(self):
+        threshold = self.request.query_params.get('threshold', getattr(settings, 'STOCK_LOW_THRESHOLD', 10))
+        try:
+            threshold = int(threshold)
+        except (TypeError, ValueError):
+            raise ValidationError({"threshold": "Порог должен быть целым числом."})
+        # Диапазон по индексу (quantity, id); у остатков с полосами основная
+        # строка меньше суммы, поэтому итог проверяется вторым условием
+        return (
+            Stock.objects.visible_to(self.request.user)
+            .filter(quantity__lt=threshold)
+            .with_total_quantity()
+            .filter(total_quantity__lt=threshold)
+        )
+
+class ProductStockTotalsView(generics.ListAPIView):
+    """
+    Количество каждого товара по всем складам.
+
+    Потребителю отдаётся свёртка ProductStockTotal; поставщику — агрегат по
+    остаткам его складов.
+    """
+    serializer_class = ProductStockTotalSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = ProductKeysetPagination
+
+    def get_queryset(self):
+        if self.request.user.user_type == 'consumer':
+            return ProductStockTotal.objects.all()
+        return (
+            Stock.objects.visible_to(self.request.user).with_total_quantity()
+            .values('product_id').annotate(quantity=Sum('total_quantity'))
+        )
+
+class WarehouseValuationView(generics.ListAPIView):
+    """Количество и стоимость товаров на каждом складе из свёртки WarehouseStockTotal."""
+    serializer_class = WarehouseStockTotalSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = WarehouseKeysetPagination
+
+    def get_queryset(self):
+        totals = WarehouseStockTotal.objects.all()
+        if self.request.user.user_type == 'supplier':
+            return totals.filter(warehouse__owner=self.request.user)
+        if self.request.user.user_type == 'consumer':
+            return totals
+        return totals.none()
 
-class SupplyProductView(generics.CreateAPIView):
+class StockDetailView(StockSerializerMixin, generics.RetrieveAPIView):
+    queryset = Stock.objects.with_total_quantity()
     serializer_class = StockSerializer
-    permission_classes = [IsAuthenticated, IsSupplier]
+    permission_classes = [IsAuthenticated]
 
-    def create(self, request, *args, **kwargs):
-        data = request.data
-        warehouse_id = data.get('warehouse')
-        product_id = data.get('product')
-        quantity = data.get('quantity', 0)
+    def retrieve(self, request, *args, **kwargs):
+        return Response(self.get_stock_serializer(self.get_object()).data)
 
-        # Проверка, что склад принадлежит текущему поставщику
-        try:
-            warehouse = Warehouse.objects.get(id=warehouse_id, owner=request.user)
-        except Warehouse.DoesNotExist:
-            return Response({"error": "Склад не найден или вы не являетесь его владельцем."},
+class StockHistoryView(generics.GenericAPIView):
+    """Остаток на момент времени по журналу движений: ?at=<ISO 8601>."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        at = parse_datetime(request.query_params.get('at', ''))
+        if at is None:
+            return Response({"error": "Параметр at должен быть датой и временем в формате ISO 8601."},
                             status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+        stock = get_object_or_404(
+            Stock.objects.visible_to(request.user).only('id', 'warehouse_id', 'product_id'), pk=kwargs['pk']
+        )
+        return Response({
+            "id": stock.id,
+            "warehouse": stock.warehouse_id,
+            "product": stock.product_id,
+            "at": at,
+            "quantity": quantity_at(stock.warehouse_id, stock.product_id, at)
+        })
+
+class StockStripesView(generics.GenericAPIView):
+    """
+    Число полос счётчика остатка (api/striping.py): PUT {"stripes": K}.
 
-        # Проверка, что товар существует
+    Меняется без остановки записи; доступно владельцу склада.
+    """
+    permission_classes = [IsAuthenticated, IsSupplier]
+
+    def put(self, request, *args, **kwargs):
+        stock = get_object_or_404(Stock.objects.visible_to(request.user).only('id'), pk=kwargs['pk'])
+        stripes = request.data.get('stripes')
+        if isinstance(stripes, bool) or not isinstance(stripes, int):
+            return Response({"error": "Число полос должно быть целым."}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            product = Product.objects.get(id=product_id)
-        except Product.DoesNotExist:
-            return Response({"error": "Товар не найден."},
-                            status=status.HTTP_400_BAD_REQUEST)
+            stock = set_stripe_count(stock.id, stripes)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "id": stock.id,
+            "stripes": stock.stripe_count,
+            "quantity": total_quantity(stock.id)
+        })
+
+class _Echo:
+    """Псевдо-файл для csv.writer: возвращает записанную строку вместо буферизации."""
+
+    def write(self, value):
+        return value
 
-        # Проверка, что количество положительное
-        if quantity <= 0:
-            return Response({"error": "Количество должно быть положительным."},
+class StockExportView(generics.GenericAPIView):
+    """
+    Потоковая выгрузка остатков в NDJSON (по умолчанию) или CSV: ?output=csv.
+
+    Строки читаются итератором по курсору порциями EXPORT_CHUNK_SIZE в виде
+    кортежей values_list, без создания моделей и сериализаторов, поэтому
+    память воркера не зависит от числа строк.
+    """
+    permission_classes = [IsAuthenticated]
+    columns = ('id', 'warehouse', 'product', 'quantity')
+    chunk_size = 2000
+
+    def get(self, request, *args, **kwargs):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in ('ndjson', 'csv'):
+            return Response({"error": "Поддерживаются форматы ndjson и csv."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        # Получение или создание записи в Stock
-        stock, created = Stock.objects.get_or_create(warehouse=warehouse, product=product)
-        stock.quantity += quantity
-        stock.save()
+        rows = (
+            Stock.objects.visible_to(request.user)
+            .with_total_quantity()
+            .order_by('id')
+            .values_list('id', 'warehouse_id', 'product_id', 'total_quantity')
+            .iterator(chunk_size=self.chunk_size)
+        )
+        if output == 'csv':
+            content, content_type = self._csv(rows), 'text/csv; charset=utf-8'
+        else:
+            content, content_type = self._ndjson(rows), 'application/x-ndjson'
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="stocks.{output}"'
+        return response
+
+    def _batches(self, lines):
+        batch = []
+        for line in lines:
+            batch.append(line)
+            if len(batch) >= self.chunk_size:
+                yield ''.join(batch)
+                batch = []
+        if batch:
+            yield ''.join(batch)
+
+    def _ndjson(self, rows):
+        return self._batches(
+            json.dumps(dict(zip(self.columns, row)), separators=(',', ':')) + '\n' for row in rows
+        )
+
+    def _csv(self, rows):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(self.columns)
+        yield from self._batches(writer.writerow(row) for row in rows)
+
+class StockAvailabilityView(generics.GenericAPIView):
+    """
+    Доступное количество из кэша доступности (api/availability.py):
+    ?warehouse=1&product=2 или ?items=1:2,1:3 (до STOCK_AVAILABILITY_MAX_KEYS пар).
+
+    При попадании в кэш ответ собирается без ORM и StockSerializer. Поставщик
+    видит только свои склады: принадлежность проверяется по кэшу складов.
+    """
+    permission_classes = [IsAuthenticated, IsSupplierOrConsumer]
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        many = 'items' in params
+        try:
+            if many:
+                pairs = [tuple(int(part) for part in item.split(':'))
+                         for item in params['items'].split(',') if item.strip()]
+            else:
+                pairs = [(int(params.get('warehouse', '')), int(params.get('product', '')))]
+        except ValueError:
+            pairs = None
+        max_keys = getattr(settings, 'STOCK_AVAILABILITY_MAX_KEYS', 100)
+        if not pairs or any(len(pair) != 2 for pair in pairs) or len(pairs) > max_keys:
+            return Response({"error": f"Укажите warehouse и product или items=склад:товар,... "
+                                      f"(не более {max_keys} пар)."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.user.user_type == 'supplier':
+            owned = {
+                pk for pk, entry in warehouse_cache.get_many({w for w, _ in pairs}).items()
+                if entry['owner_id'] == request.user.id
+            }
+            pairs = [pair for pair in pairs if pair[0] in owned]
+            if not many and not pairs:
+                return Response({"error": WAREHOUSE_NOT_OWNED}, status=status.HTTP_404_NOT_FOUND)
+
+        quantities = availability.get_many(pairs)
+        results = [
+            {"warehouse": w, "product": p, "quantity": quantities[w, p], "available": quantities[w, p] > 0}
+            for w, p in dict.fromkeys(pairs)
+        ]
+        return Response({"results": results} if many else results[0])
 
-        serializer = self.get_serializer(stock)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+class StockSyncView(generics.GenericAPIView):
+    """
+    Дельта-синхронизация (api/delta.py): ?since=<watermark> возвращает
+    остатки, склады и товары, изменённые после водяного знака, и id удалённых.
+    Без since или со слишком старым знаком отвечает reset и текущим знаком.
+    """
+    permission_classes = [IsAuthenticated, IsSupplierOrConsumer]
 
-class ConsumeProductView(generics.UpdateAPIView):
+    def get(self, request, *args, **kwargs):
+        try:
+            delta = delta_since(request.user, request.query_params.get('since'))
+        except ValueError:
+            return Response({"error": "Некорректный водяной знак since."}, status=status.HTTP_400_BAD_REQUEST)
+        if not delta['reset']:
+            delta['warehouses'] = WarehouseSerializer(delta['warehouses'], many=True).data
+            delta['products'] = ProductSerializer(delta['products'], many=True).data
+        return Response(delta)
+
+class SupplyProductView(StockSerializerMixin, generics.CreateAPIView):
+    serializer_class = StockSerializer
+    permission_classes = [IsAuthenticated, IsSupplier]
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        data = request.data
+        try:
+            stock = supply_stock(
+                data.get('warehouse'),
+                data.get('product'),
+                data.get('quantity', 0),
+                owner=request.user,
+            )
+        except StockMutationError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Количество берётся из результата изменения, склад и товар — из кэша
+        return Response(self.get_stock_serializer(stock).data, status=status.HTTP_200_OK)
+
+class ConsumeProductView(StockSerializerMixin, generics.UpdateAPIView):
     serializer_class = StockSerializer
     permission_classes = [IsAuthenticated, IsConsumer]
 
+    @idempotent
     def update(self, request, *args, **kwargs):
         data = request.data
-        warehouse_id = data.get('warehouse')
-        product_id = data.get('product')
-        quantity = data.get('quantity', 0)
+        try:
+            stock = consume_stock(
+                data.get('warehouse'),
+                data.get('product'),
+                data.get('quantity', 0),
+            )
+        except StockMutationError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Количество берётся из результата изменения, склад и товар — из кэша
+        return Response(self.get_stock_serializer(stock).data, status=status.HTTP_200_OK)
 
-        # Проверка, что склад существует
+class FulfillmentPlanView(StockSerializerMixin, generics.GenericAPIView):
+    """
+    План списания товара с нескольких складов (api/planning.py): product,
+    quantity, strategy (fewest_warehouses, smallest_first, preferred) и
+    список preferred. С execute=true план исполняется одним атомарным пакетом.
+    """
+    serializer_class = FulfillmentPlanSerializer
+    permission_classes = [IsAuthenticated, IsConsumer]
+
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
         try:
-            warehouse = Warehouse.objects.get(id=warehouse_id)
-        except Warehouse.DoesNotExist:
-            return Response({"error": "Склад не найден."},
-                            status=status.HTTP_400_BAD_REQUEST)
+            allocation, stocks = plan_fulfillment(
+                data['product'], data['quantity'], data['strategy'], data['preferred'],
+                user=request.user if data['execute'] else None,
+            )
+        except PlanningError as exc:
+            body = {"error": str(exc)}
+            if exc.available is not None:
+                body["available"] = exc.available
+                return Response(body, status=status.HTTP_400_BAD_REQUEST)
+            return Response(body, status=status.HTTP_409_CONFLICT)
+        body = {
+            "product": data['product'],
+            "quantity": data['quantity'],
+            "strategy": data['strategy'],
+            "executed": data['execute'],
+            "allocations": [{"warehouse": w, "quantity": amount} for w, amount in allocation],
+        }
+        if stocks is not None:
+            body["stocks"] = self.get_stock_serializer(stocks, many=True).data
+        return Response(body, status=status.HTTP_200_OK)
 
-        # Проверка, что товар существует
+class ReservationCreateView(generics.GenericAPIView):
+    """Резерв остатка потребителем: warehouse, product, quantity и необязательный ttl в секундах."""
+    serializer_class = ReservationSerializer
+    permission_classes = [IsAuthenticated, IsConsumer]
+
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        data = request.data
         try:
-            product = Product.objects.get(id=product_id)
-        except Product.DoesNotExist:
-            return Response({"error": "Товар не найден."},
-                            status=status.HTTP_400_BAD_REQUEST)
+            reservation = reserve_stock(
+                data.get('warehouse'),
+                data.get('product'),
+                data.get('quantity', 0),
+                user=request.user,
+                ttl=data.get('ttl'),
+            )
+        except StockMutationError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(reservation).data, status=status.HTTP_201_CREATED)
 
-        # Проверка, что количество положительное
-        if quantity <= 0:
-            return Response({"error": "Количество должно быть положительным."},
-                            status=status.HTTP_400_BAD_REQUEST)
+class ReservationConfirmView(StockSerializerMixin, generics.GenericAPIView):
+    """Подтверждение резерва: списывает зарезервированное количество."""
+    serializer_class = StockSerializer
+    permission_classes = [IsAuthenticated, IsConsumer]
 
-        # Получение записи в Stock
+    @idempotent
+    def post(self, request, *args, **kwargs):
         try:
-            stock = Stock.objects.get(warehouse=warehouse, product=product)
-        except Stock.DoesNotExist:
-            return Response({"error": "Товар не доступен на данном складе."},
-                            status=status.HTTP_400_BAD_REQUEST)
+            stock = confirm_reservation(kwargs['pk'], request.user)
+        except StockMutationError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self.get_stock_serializer(stock).data, status=status.HTTP_200_OK)
 
-        # Проверка, что доступно достаточно товара
-        if stock.quantity < quantity:
-            return Response({"error": "Недостаточно товара на складе."},
-                            status=status.HTTP_400_BAD_REQUEST)
+class ReservationReleaseView(generics.GenericAPIView):
+    """Отмена резерва: количество снова доступно для списания."""
+    permission_classes = [IsAuthenticated, IsConsumer]
+
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        try:
+            release_reservation(kwargs['pk'], request.user)
+        except StockMutationError:
+            return Response({"error": RESERVATION_NOT_FOUND}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class StockMovementBatchView(StockSerializerMixin, generics.GenericAPIView):
+    serializer_class = StockMovementBatchSerializer
+    permission_classes = [IsAuthenticated, IsSupplierOrConsumer]
+
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['items']
+        atomic = serializer.validated_data['atomic']
+
+        # Каждая позиция проверяется отдельно, чтобы ошибка в одной позиции
+        # не мешала сообщить о результате остальных
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            item_serializer = StockMovementSerializer(data=item)
+            if item_serializer.is_valid():
+                valid.append((index, item_serializer.validated_data))
+            else:
+                results[index] = {"index": index, "status": "error",
+                                  "error": "Некорректные данные позиции.",
+                                  "details": item_serializer.errors}
+
+        if atomic and len(valid) < len(items):
+            outcomes = [StockMutationError(BATCH_ABORTED)] * len(valid)
+        else:
+            outcomes = apply_stock_movements([data for _, data in valid], request.user, atomic=atomic)
+
+        stocks = [outcome for outcome in outcomes if not isinstance(outcome, StockMutationError)]
+        serialized = iter(self.get_stock_serializer(stocks, many=True).data)
+        for (index, _), outcome in zip(valid, outcomes):
+            if isinstance(outcome, StockMutationError):
+                results[index] = {"index": index, "status": "error", "error": str(outcome)}
+            else:
+                results[index] = {"index": index, "status": "ok", "stock": next(serialized)}
+
+        failed = any(result["status"] == "error" for result in results)
+        return Response({
+            "atomic": atomic,
+            "results": results
+        }, status=status.HTTP_400_BAD_REQUEST if atomic and failed else status.HTTP_200_OK)
+
+class InventoryImportView(generics.GenericAPIView):
+    """
+    Импорт товаров, складов и остатков поставщика (api/importing.py).
+
+    Тело запроса — файл CSV (Content-Type: text/csv) или NDJSON
+    (application/x-ndjson); оно читается из потока построчно, не целиком.
+    """
+    permission_classes = [IsAuthenticated, IsSupplier]
+    content_types = {'text/csv': 'csv', 'application/x-ndjson': 'ndjson'}
 
-        # Уменьшение количества товара
-        stock.quantity -= quantity
-        stock.save()
+    def post(self, request, *args, **kwargs):
+        reader = self.content_types.get(request.content_type.split(';')[0].strip())
+        if reader is None:
+            return Response({"error": "Поддерживаются text/csv и application/x-ndjson."},
+                            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        if request.stream is None:
+            return Response({"error": "Пустой файл."}, status=status.HTTP_400_BAD_REQUEST)
+        lines = codecs.iterdecode(request.stream, 'utf-8-sig')
+        try:
+            result = import_inventory(READERS[reader](lines), request.user)
+        except UnicodeDecodeError:
+            return Response({"error": "Файл должен быть в кодировке UTF-8."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result.as_dict(), status=status.HTTP_200_OK)
 
-        serializer = self.get_serializer(stock)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+def metrics_view(request):
+    """Метрики процесса в текстовом формате Prometheus для адресов из API_METRICS_ALLOWED_IPS."""
+    if request.META.get('REMOTE_ADDR') not in getattr(settings, 'API_METRICS_ALLOWED_IPS', ('127.0.0.1', '::1')):
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,117 @@
+# benchmarks/async_vs_sync.py
+"""
+Сравнение синхронных эндпоинтов остатков с асинхронными /api/async/.
+
+    python -m benchmarks.async_vs_sync [--requests 2000] [--concurrency 50]
+
+Синхронный путь — Client (WSGI-обработчик) в пуле из --concurrency потоков;
+асинхронный — AsyncClient (ASGI-обработчик), --concurrency корутин в одном
+цикле событий. Для чтения (GET остатка) и изменения (POST поставки)
+печатается число запросов в секунду и задержка p50/p99 в миллисекундах.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import setup_django, temporary_database, create_user
+
+
+def summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def run_sync(call, requests, concurrency):
+    from django.db import connections
+    from django.test import Client
+
+    def worker(count):
+        client, latencies = Client(), []
+        for _ in range(count):
+            started = time.perf_counter()
+            call(client)
+            latencies.append(time.perf_counter() - started)
+        connections.close_all()
+        return latencies
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        chunks = pool.map(worker, [requests // concurrency] * concurrency)
+        latencies = [value for chunk in chunks for value in chunk]
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def run_async(call, requests, concurrency):
+    from django.test import AsyncClient
+
+    async def worker(count):
+        client, latencies = AsyncClient(), []
+        for _ in range(count):
+            started = time.perf_counter()
+            await call(client)
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    async def main():
+        chunks = await asyncio.gather(*(worker(requests // concurrency) for _ in range(concurrency)))
+        return [value for chunk in chunks for value in chunk]
+
+    started = time.perf_counter()
+    latencies = asyncio.run(main())
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from api.models import Warehouse, Product, Stock
+
+    with temporary_database():
+        supplier, supplier_token = create_user('bench-supplier', 'supplier')
+        warehouse = Warehouse.objects.create(name='Bench Warehouse', address='1 Bench St', owner=supplier)
+        product = Product.objects.create(name='Bench Product', price='1.00')
+        stock = Stock.objects.create(warehouse=warehouse, product=product, quantity=0)
+        headers = {'headers': {'Authorization': f'Token {supplier_token}'}}
+        payload = {'warehouse': warehouse.id, 'product': product.id, 'quantity': 1}
+
+        def check(response):
+            assert response.status_code == 200, response.content
+
+        scenarios = {
+            'read': (
+                lambda client: check(client.get(f'/api/stocks/{stock.id}/', **headers)),
+                lambda client: _acheck(client.get(f'/api/async/stocks/{stock.id}/', **headers)),
+            ),
+            'supply': (
+                lambda client: check(client.post('/api/supply/', payload, content_type='application/json', **headers)),
+                lambda client: _acheck(client.post('/api/async/supply/', payload,
+                                                   content_type='application/json', **headers)),
+            ),
+        }
+        results = {}
+        for name, (sync_call, async_call) in scenarios.items():
+            results[name] = {
+                'sync': run_sync(sync_call, args.requests, args.concurrency),
+                'async': run_async(async_call, args.requests, args.concurrency),
+            }
+    print(json.dumps(results, indent=2))
+
+
+async def _acheck(response):
+    response = await response
+    assert response.status_code == 200, response.content
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# benchmarks/auth_cache.py
+"""
+Сравнение CachedTokenAuthentication со стандартной TokenAuthentication DRF.
+
+    python -m benchmarks.auth_cache [--requests 2000]
+
+Запросы GET /api/stocks/?page_size=1 выполняются в процессе через APIClient;
+печатается число запросов в секунду и SQL-запросов на запрос для каждого
+класса аутентификации.
+"""
+import argparse
+import json
+from unittest import mock
+
+from .common import setup_django, temporary_database, create_user, run_for
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.authentication import TokenAuthentication
+    from rest_framework.test import APIClient
+    from rest_framework.views import APIView
+    from api.authentication import CachedTokenAuthentication
+
+    with temporary_database():
+        _, token = create_user('bench-consumer', 'consumer')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+        def request():
+            response = client.get('/api/stocks/?page_size=1')
+            assert response.status_code == 200, response.content
+
+        results = {}
+        for auth_class in (TokenAuthentication, CachedTokenAuthentication):
+            with mock.patch.object(APIView, 'authentication_classes', [auth_class]):
+                request()
+                with CaptureQueriesContext(connection) as queries:
+                    request()
+                query_count = len(queries)
+                results[auth_class.__name__] = {
+                    'requests_per_second': round(run_for(request, args.requests), 1),
+                    'queries_per_request': query_count,
+                }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
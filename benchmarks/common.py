@@ -0,0 +1,55 @@
+# benchmarks/common.py
+"""
+Общие помощники для скриптов бенчмарков.
+
+Скрипты запускаются из корня проекта: python -m benchmarks.<имя>. Каждый
+создаёт отдельную временную базу (bench_db.sqlite3 или тестовую базу
+PostgreSQL), поэтому рабочая база не затрагивается.
+"""
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'consumer_supply.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def temporary_database():
+    """Создаёт и применяет миграции к временной базе, удаляя её по выходу."""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    if connection.vendor == 'sqlite':
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = str(BASE_DIR / 'bench_db.sqlite3')
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def create_user(username, user_type):
+    from django.contrib.auth import get_user_model
+    from rest_framework.authtoken.models import Token
+
+    user = get_user_model().objects.create_user(
+        username=username, email=f'{username}@example.com', password='StrongPassword123', user_type=user_type
+    )
+    return user, Token.objects.create(user=user).key
+
+
+def run_for(fn, requests):
+    """Вызывает fn requests раз и возвращает число вызовов в секунду."""
+    started = time.perf_counter()
+    for _ in range(requests):
+        fn()
+    return requests / (time.perf_counter() - started)
@@ -0,0 +1,124 @@
+# benchmarks/db_load.py
+"""
+Нагрузочный тест /api/supply/ и /api/consume/ для профилей базы данных.
+
+    python -m benchmarks.db_load [--threads 8] [--requests 200]
+        [--profiles sqlite-default,sqlite-tuned,postgres,postgres-pool]
+
+Каждый профиль запускается в отдельном процессе с нужными переменными
+окружения (см. DATABASES в consumer_supply/settings.py): потоки выполняют
+поставки и списания через APIClient, результат печатается как JSON.
+Профили PostgreSQL требуют доступного сервера (DB_HOST, DB_USER, ...).
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from .common import setup_django, temporary_database, create_user
+
+PROFILES = {
+    'sqlite-default': {'DB_ENGINE': 'sqlite', 'DB_SQLITE_TUNING': '0'},
+    'sqlite-tuned': {'DB_ENGINE': 'sqlite', 'DB_SQLITE_TUNING': '1'},
+    'postgres': {'DB_ENGINE': 'postgres', 'DB_POOL': '0'},
+    'postgres-pool': {'DB_ENGINE': 'postgres', 'DB_POOL': '1'},
+}
+
+
+def run_workload(threads, requests, keys=20):
+    setup_django()
+    from django.db import connection
+    from rest_framework.test import APIClient
+    from api.models import Warehouse, Product, Stock
+
+    with temporary_database():
+        supplier, supplier_token = create_user('bench-supplier', 'supplier')
+        _, consumer_token = create_user('bench-consumer', 'consumer')
+        warehouse = Warehouse.objects.create(name='Bench Warehouse', address='1 Bench St', owner=supplier)
+        products = Product.objects.bulk_create(Product(name=f'Bench {i}', price='1.00') for i in range(keys))
+        Stock.objects.bulk_create(Stock(warehouse=warehouse, product=p, quantity=10 ** 6) for p in products)
+
+        latencies, errors = [], []
+        lock = threading.Lock()
+
+        def worker(seed):
+            rng = random.Random(seed)
+            supplier_client, consumer_client = APIClient(), APIClient()
+            supplier_client.credentials(HTTP_AUTHORIZATION=f'Token {supplier_token}')
+            consumer_client.credentials(HTTP_AUTHORIZATION=f'Token {consumer_token}')
+            local = []
+            try:
+                for i in range(requests):
+                    data = {'warehouse': warehouse.id, 'product': rng.choice(products).id, 'quantity': 1}
+                    started = time.perf_counter()
+                    try:
+                        if i % 2:
+                            response = consumer_client.put('/api/consume/', data, format='json')
+                        else:
+                            response = supplier_client.post('/api/supply/', data, format='json')
+                        if response.status_code != 200:
+                            raise RuntimeError(response.status_code)
+                    except Exception as exc:
+                        with lock:
+                            errors.append(repr(exc))
+                    local.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+            with lock:
+                latencies.extend(local)
+
+        pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        started = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        'vendor': connection.vendor,
+        'threads': threads,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(quantiles[49] * 1000, 2),
+        'p95_ms': round(quantiles[94] * 1000, 2),
+        'p99_ms': round(quantiles[98] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='запросов на поток')
+    parser.add_argument('--profiles', default='sqlite-default,sqlite-tuned')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_workload(args.threads, args.requests)))
+        return
+
+    results = {}
+    for name in args.profiles.split(','):
+        env = {**os.environ, **PROFILES[name]}
+        completed = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.db_load', '--child',
+             '--threads', str(args.threads), '--requests', str(args.requests)],
+            env=env, capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            results[name] = {'error': completed.stderr.strip().splitlines()[-1]}
+        else:
+            results[name] = json.loads(completed.stdout.strip().splitlines()[-1])
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
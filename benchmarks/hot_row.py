@@ -0,0 +1,96 @@
+# benchmarks/hot_row.py
+"""
+Пропускная способность поставок и списаний одной горячей строки Stock.
+
+    python -m benchmarks.hot_row [--threads 16] [--operations 200] [--window-ms 2] [--stripes 8]
+
+Потоки по очереди вызывают supply_stock и consume_stock для одной пары
+(склад, товар): без оптимизаций, с STOCK_WRITE_COALESCING и с полосатым
+счётчиком (api/striping.py). На SQLite запись блокирует всю базу, поэтому
+выигрыш от полос виден только на PostgreSQL. Печатается число операций в секунду, задержка
+p50/p99 в миллисекундах и сверка итогового остатка с журналом.
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+
+from .common import setup_django, temporary_database, create_user
+
+
+def run(threads, operations, warehouse_id, product_id, owner):
+    from django.db import connection
+    from api.services import supply_stock, consume_stock
+
+    latencies, lock = [], threading.Lock()
+
+    def worker():
+        local = []
+        for n in range(operations):
+            started = time.perf_counter()
+            if n % 2:
+                consume_stock(warehouse_id, product_id, 1)
+            else:
+                supply_stock(warehouse_id, product_id, 1, owner=owner)
+            local.append(time.perf_counter() - started)
+        connection.close()
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'operations_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--operations', type=int, default=200)
+    parser.add_argument('--window-ms', type=float, default=2)
+    parser.add_argument('--stripes', type=int, default=8)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import override_settings
+    from api.coalescing import reset_coalescer
+    from api.ledger import rebuild_balances
+    from api.models import Warehouse, Product
+    from api.services import supply_stock
+    from api.striping import set_stripe_count
+
+    with temporary_database():
+        supplier, _ = create_user('bench-supplier', 'supplier')
+        warehouse = Warehouse.objects.create(name='Hot Warehouse', address='1 Hot St', owner=supplier)
+        product = Product.objects.create(name='Hot Product', price='1.00')
+        # Запас покрывает все списания, чтобы сравнивались только записи
+        stock = supply_stock(warehouse.id, product.id, args.threads * args.operations, owner=supplier)
+
+        results = {}
+        modes = {
+            'direct': {'ENABLED': False},
+            'coalesced': {'ENABLED': True, 'WINDOW_MS': args.window_ms, 'MAX_BATCH': args.threads},
+        }
+        for name, options in modes.items():
+            with override_settings(STOCK_WRITE_COALESCING=options):
+                reset_coalescer()
+                results[name] = run(args.threads, args.operations, warehouse.id, product.id, supplier)
+            reset_coalescer()
+        set_stripe_count(stock.id, args.stripes)
+        results['striped'] = run(args.threads, args.operations, warehouse.id, product.id, supplier)
+        results['ledger_drift'] = len(rebuild_balances())
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
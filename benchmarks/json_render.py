@@ -0,0 +1,84 @@
+# benchmarks/json_render.py
+"""
+Время сериализации списка остатков и разбора JSON.
+
+    python -m benchmarks.json_render [--rows 1000,10000,100000] [--repeat 3]
+
+Для каждого размера списка сравниваются четыре пути: StockSerializer или
+stock_rows (строки values()) и JSONRenderer DRF или FastJSONRenderer на
+orjson. Отдельно измеряется чтение из базы моделей и строк values().
+Контекст с представлениями складов и товаров строится заранее: его
+стоимость зависит от кэша, а не от сериализатора. Для разбора сравниваются
+JSONParser и FastJSONParser на отрендеренном теле. Печатается лучшее из
+--repeat время в миллисекундах.
+"""
+import argparse
+import json
+import time
+from io import BytesIO
+
+from .common import setup_django, temporary_database
+from .seed import Scale, seed
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return round(min(timings) * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', default='1000,10000,100000')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.rows.split(',')]
+
+    setup_django()
+    from django.test import RequestFactory
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from api.cache import stock_detail_context
+    from api.models import Stock
+    from api.parsers import FastJSONParser
+    from api.renderers import FastJSONRenderer, orjson
+    from api.serializers import StockSerializer, STOCK_VALUES, stock_rows
+
+    request = RequestFactory().get('/api/stocks/')
+    renderers = {'drf': JSONRenderer(), 'orjson': FastJSONRenderer()}
+
+    results = {'orjson_installed': orjson is not None}
+    with temporary_database():
+        seed(Scale(suppliers=1, consumers=0, warehouses=100, products=1000,
+                   stocks_per_warehouse=max(sizes) // 100, hot_stocks=0))
+        for size in sizes:
+            queryset = Stock.objects.with_total_quantity().order_by('id')[:size]
+            values = Stock.objects.with_total_quantity().order_by('id').values(*STOCK_VALUES)[:size]
+            stocks, rows = list(queryset), list(values)
+            context = {'request': request, **stock_detail_context(rows)}
+            entry = {
+                'query_models_ms': best_of(lambda: list(queryset.all()), args.repeat),
+                'query_values_ms': best_of(lambda: list(values.all()), args.repeat),
+            }
+            paths = {
+                'serializer': lambda: StockSerializer(stocks, many=True, context=context).data,
+                'values': lambda: stock_rows(rows, context),
+            }
+            for path_name, path in paths.items():
+                for renderer_name, renderer in renderers.items():
+                    entry[f'{path_name}+{renderer_name}_ms'] = best_of(
+                        lambda: renderer.render(path()), args.repeat
+                    )
+            body = JSONRenderer().render(stock_rows(rows, context))
+            entry['body_bytes'] = len(body)
+            for parser_name, json_parser in (('drf', JSONParser()), ('orjson', FastJSONParser())):
+                entry[f'parse+{parser_name}_ms'] = best_of(lambda: json_parser.parse(BytesIO(body)), args.repeat)
+            results[size] = entry
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+# benchmarks/load.py
+"""
+Нагрузочный тест API на сгенерированных данных (benchmarks/seed.py).
+
+    python -m benchmarks.load [--workloads read,consume,hot-mixed,login]
+        [--target inprocess|server] [--concurrency 8] [--duration 10]
+        [--scale products=500,...] [--output result.json] [--compare baseline.json]
+
+Каждый сценарий выполняется --duration секунд в --concurrency потоках:
+в процессе через django.test.Client (target=inprocess) или по HTTP через
+локальный сервер manage.py runserver, запущенный на той же временной
+базе (target=server). Печатается JSON с коммитом, параметрами и для
+каждого сценария — запросами в секунду, p50/p95/p99 и SQL-запросами на
+запрос по счётчикам /api/metrics/. С --compare добавляется изменение
+относительно сохранённого результата.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from functools import partial
+from urllib.request import urlopen
+
+from .common import BASE_DIR, setup_django, temporary_database
+from .seed import PASSWORD, Scale, seed
+
+
+# Сценарий по генератору случайных чисел и данным возвращает
+# (метод, путь, тело, токен)
+def read_stocks(rng, data):
+    if rng.random() < 0.8:
+        return 'GET', '/api/stocks/?page_size=50', None, rng.choice(data.consumer_tokens)
+    warehouse, _ = rng.choice(data.stocks)
+    return 'GET', '/api/stocks/?page_size=50&fields=id,product,quantity', None, data.supplier_tokens[warehouse]
+
+
+def consume(rng, data):
+    warehouse, product = rng.choice(data.stocks)
+    body = {'warehouse': warehouse, 'product': product, 'quantity': 1}
+    return 'PUT', '/api/consume/', body, rng.choice(data.consumer_tokens)
+
+
+def hot_mixed(rng, data):
+    warehouse, product = rng.choice(data.hot_stocks)
+    body = {'warehouse': warehouse, 'product': product, 'quantity': rng.randint(1, 3)}
+    if rng.random() < 0.5:
+        return 'POST', '/api/supply/', body, data.supplier_tokens[warehouse]
+    return 'PUT', '/api/consume/', body, rng.choice(data.consumer_tokens)
+
+
+def login(rng, data):
+    return 'POST', '/api/login/', {'username': rng.choice(data.usernames), 'password': PASSWORD}, None
+
+
+WORKLOADS = {'read': read_stocks, 'consume': consume, 'hot-mixed': hot_mixed, 'login': login}
+
+
+class InProcessTransport:
+    def __init__(self):
+        from django.test import Client
+        self.client = Client()
+
+    def request(self, method, path, body, token):
+        headers = {'Authorization': f'Token {token}'} if token else {}
+        response = self.client.generic(
+            method, path, json.dumps(body) if body is not None else '',
+            content_type='application/json', headers=headers,
+        )
+        return response.status_code
+
+    def close(self):
+        from django.db import connections
+        connections.close_all()
+
+
+class HTTPTransport:
+    def __init__(self, port):
+        self.port = port
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+
+    def request(self, method, path, body, token):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Token {token}'
+        payload = json.dumps(body) if body is not None else None
+        try:
+            self.connection.request(method, path, payload, headers)
+        except (http.client.HTTPException, OSError):
+            # Сервер закрыл соединение: повтор на новом
+            self.connection.close()
+            self.connection.request(method, path, payload, headers)
+        response = self.connection.getresponse()
+        response.read()
+        return response.status
+
+    def close(self):
+        self.connection.close()
+
+
+def query_counters(port):
+    """{маршрут: (запросов, SQL-запросов)} из /api/metrics/ сервера или текущего процесса."""
+    if port is None:
+        from api.metrics import registry
+        text = registry.render()
+    else:
+        with urlopen(f'http://127.0.0.1:{port}/api/metrics/', timeout=60) as response:
+            text = response.read().decode()
+    requests = dict(re.findall(r'^api_requests_total\{route="([^"]+)"\} (\d+)$', text, re.MULTILINE))
+    queries = dict(re.findall(r'^api_db_queries_total\{route="([^"]+)"\} (\d+)$', text, re.MULTILINE))
+    return {route: (int(count), int(queries.get(route, 0))) for route, count in requests.items()}
+
+
+def run_workload(scenario, data, transport_factory, port, concurrency, duration, seed_value):
+    latencies, errors, lock = [], [], threading.Lock()
+    before = query_counters(port)
+    deadline = time.perf_counter() + duration
+
+    def worker(n):
+        rng, transport, local = random.Random(seed_value + n), transport_factory(), []
+        try:
+            while time.perf_counter() < deadline:
+                method, path, body, token = scenario(rng, data)
+                started = time.perf_counter()
+                try:
+                    status = transport.request(method, path, body, token)
+                    if status >= 400:
+                        raise RuntimeError(status)
+                except Exception as exc:
+                    with lock:
+                        errors.append(repr(exc))
+                local.append(time.perf_counter() - started)
+        finally:
+            transport.close()
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    after = query_counters(port)
+    served = sum(count - before.get(route, (0, 0))[0] for route, (count, _) in after.items() if route != 'metrics')
+    queries = sum(total - before.get(route, (0, 0))[1] for route, (_, total) in after.items() if route != 'metrics')
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [latencies[0]] * 99
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(quantiles[49] * 1000, 2),
+        'p95_ms': round(quantiles[94] * 1000, 2),
+        'p99_ms': round(quantiles[98] * 1000, 2),
+        'queries_per_request': round(queries / served, 2) if served else None,
+    }
+
+
+def start_server(database_name):
+    """Запускает manage.py runserver на временной базе; возвращает (процесс, порт)."""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{port}', '--noreload'],
+        cwd=BASE_DIR, env={**os.environ, 'DB_NAME': str(database_name)},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('Сервер не запустился')
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BASE_DIR,
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, result):
+    """Изменение запросов в секунду и p99 в процентах относительно baseline."""
+    changes = {}
+    for name, current in result['workloads'].items():
+        previous = baseline.get('workloads', {}).get(name)
+        if not previous:
+            continue
+        changes[name] = {
+            metric: round((current[metric] - previous[metric]) / previous[metric] * 100, 1)
+            for metric in ('requests_per_second', 'p50_ms', 'p99_ms') if previous.get(metric)
+        }
+    return {'baseline_commit': baseline.get('commit'), 'percent_change': changes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workloads', default=','.join(WORKLOADS))
+    parser.add_argument('--target', choices=['inprocess', 'server'], default='inprocess')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10, help='секунд на сценарий')
+    parser.add_argument('--scale', type=Scale.parse, default=Scale(), help='например products=500,suppliers=10')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output')
+    parser.add_argument('--compare')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+
+    with temporary_database():
+        started = time.perf_counter()
+        data = seed(args.scale, random.Random(args.seed))
+        seed_seconds = time.perf_counter() - started
+        server = port = None
+        transport_factory = InProcessTransport
+        if args.target == 'server':
+            connection.close()
+            server, port = start_server(connection.settings_dict['NAME'])
+            transport_factory = partial(HTTPTransport, port)
+        try:
+            workloads = {
+                name: run_workload(WORKLOADS[name], data, transport_factory, port,
+                                   args.concurrency, args.duration, args.seed)
+                for name in args.workloads.split(',')
+            }
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+        vendor = connection.vendor
+
+    result = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'vendor': vendor,
+        'target': args.target,
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'scale': vars(args.scale),
+        'seed_seconds': round(seed_seconds, 2),
+        'workloads': workloads,
+    }
+    if args.compare:
+        with open(args.compare) as baseline:
+            result['comparison'] = compare(json.load(baseline), result)
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as target:
+            target.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# benchmarks/login.py
+"""
+Пропускная способность входа для профилей хэширования паролей.
+
+    python -m benchmarks.login [--concurrency 16] [--duration 5] [--workers 1]
+
+Для каждого профиля (PBKDF2 по умолчанию Django, scrypt с параметрами Django
+и scrypt с p=1) пароли пользователей пересчитываются, после чего
+--concurrency потоков выполняют POST /api/login/, а ещё четыре потока
+одновременно читают /api/stocks/. Сравнивается пул хэширования из --workers
+потоков с неограниченным (по потоку на запрос). Печатаются входы в секунду,
+p99 входа и p99 чтения остатков во время волны входов.
+"""
+import argparse
+import json
+import random
+import threading
+
+from .common import setup_django, temporary_database
+from .load import InProcessTransport, login, read_stocks, run_workload
+from .seed import PASSWORD, Scale, seed
+
+PROFILES = {
+    'pbkdf2': ('api.hashers.TunablePBKDF2PasswordHasher', {}),
+    'scrypt': ('api.hashers.TunableScryptPasswordHasher', {}),
+    'scrypt-p1': ('api.hashers.TunableScryptPasswordHasher', {'scrypt': {'parallelism': 1}}),
+}
+
+
+def storm(data, concurrency, duration):
+    """Волна входов и параллельное чтение остатков; возвращает их результаты."""
+    reads = {}
+    reader = threading.Thread(target=lambda: reads.update(
+        run_workload(read_stocks, data, InProcessTransport, None, 4, duration, seed_value=1000)
+    ))
+    reader.start()
+    logins = run_workload(login, data, InProcessTransport, None, concurrency, duration, seed_value=0)
+    reader.join()
+    return {
+        'logins_per_second': logins['requests_per_second'],
+        'login_p99_ms': logins['p99_ms'],
+        'login_errors': logins['errors'],
+        'read_p99_ms': reads['p99_ms'],
+        'reads_per_second': reads['requests_per_second'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--workers', type=int, default=1, help='потоков в ограниченном пуле хэширования')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.test import override_settings
+    from api.hashers import reset_hashing_pool
+
+    results = {}
+    with temporary_database():
+        data = seed(Scale(suppliers=10, consumers=40, warehouses=10, products=200, stocks_per_warehouse=50),
+                    random.Random(0))
+        for name, (hasher, options) in PROFILES.items():
+            with override_settings(PASSWORD_HASHERS=[hasher], PASSWORD_HASHER_OPTIONS=options):
+                get_user_model().objects.update(password=make_password(PASSWORD))
+                results[name] = {}
+                for pool, workers in (('bounded', args.workers), ('unbounded', args.concurrency)):
+                    with override_settings(PASSWORD_HASHING={'WORKERS': workers, 'QUEUE': 1024, 'TIMEOUT': 60}):
+                        reset_hashing_pool()
+                        results[name][pool] = storm(data, args.concurrency, args.duration)
+        reset_hashing_pool()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+# benchmarks/seed.py
+"""
+Генератор данных для нагрузочных тестов (benchmarks/load.py).
+
+Создаёт поставщиков и потребителей с токенами, склады поставщиков, товары
+и остатки пакетными вставками. Все пользователи получают один пароль,
+хэш которого вычисляется один раз. Журнал движений и свёртки заполняются
+так же, как миграции 0003 и 0005, чтобы данные были согласованы.
+"""
+import random
+from dataclasses import dataclass, field
+
+PASSWORD = 'StrongPassword123'
+
+
+@dataclass
+class Scale:
+    suppliers: int = 50
+    consumers: int = 150
+    warehouses: int = 100
+    products: int = 2000
+    stocks_per_warehouse: int = 200
+    hot_stocks: int = 5
+
+    @classmethod
+    def parse(cls, value):
+        """'suppliers=10,products=500' -> Scale с изменёнными полями."""
+        options = dict(item.split('=') for item in value.split(',') if item)
+        return cls(**{name: int(count) for name, count in options.items()})
+
+
+@dataclass
+class Dataset:
+    supplier_tokens: dict = field(default_factory=dict)   # warehouse_id -> токен владельца
+    consumer_tokens: list = field(default_factory=list)
+    usernames: list = field(default_factory=list)
+    stocks: list = field(default_factory=list)            # [(warehouse_id, product_id), ...]
+    hot_stocks: list = field(default_factory=list)
+
+
+def seed(scale, rng=None):
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from rest_framework.authtoken.models import Token
+    from api.models import Warehouse, Product, Stock, StockMovement
+    from api.rollups import rebuild_rollups
+
+    rng = rng or random.Random(0)
+    User = get_user_model()
+    password = make_password(PASSWORD)
+    users = User.objects.bulk_create(
+        [User(username=f'bench-supplier-{n}', email=f'bench-supplier-{n}@example.com',
+              password=password, user_type='supplier') for n in range(scale.suppliers)]
+        + [User(username=f'bench-consumer-{n}', email=f'bench-consumer-{n}@example.com',
+                password=password, user_type='consumer') for n in range(scale.consumers)],
+        batch_size=500,
+    )
+    tokens = Token.objects.bulk_create(
+        [Token(user=user, key=Token.generate_key()) for user in users], batch_size=500
+    )
+    suppliers, consumers = users[:scale.suppliers], users[scale.suppliers:]
+    token_by_user = {token.user_id: token.key for token in tokens}
+
+    warehouses = Warehouse.objects.bulk_create(
+        [Warehouse(name=f'Bench Warehouse {n}', address=f'{n} Bench St', owner=suppliers[n % len(suppliers)])
+         for n in range(scale.warehouses)],
+        batch_size=500,
+    )
+    products = Product.objects.bulk_create(
+        [Product(name=f'Bench Product {n}', description='', price=f'{rng.randint(100, 100000) / 100:.2f}')
+         for n in range(scale.products)],
+        batch_size=500,
+    )
+    stocks = []
+    for warehouse in warehouses:
+        for product in rng.sample(products, min(scale.stocks_per_warehouse, len(products))):
+            stocks.append(Stock(warehouse=warehouse, product=product, quantity=rng.randint(10 ** 5, 10 ** 6)))
+    Stock.objects.bulk_create(stocks, batch_size=1000)
+    StockMovement.objects.bulk_create(
+        (StockMovement(warehouse_id=s.warehouse_id, product_id=s.product_id, delta=s.quantity) for s in stocks),
+        batch_size=1000,
+    )
+    rebuild_rollups()
+
+    keys = [(stock.warehouse_id, stock.product_id) for stock in stocks]
+    return Dataset(
+        supplier_tokens={warehouse.id: token_by_user[warehouse.owner_id] for warehouse in warehouses},
+        consumer_tokens=[token_by_user[user.id] for user in consumers],
+        usernames=[user.username for user in users],
+        stocks=keys,
+        hot_stocks=rng.sample(keys, min(scale.hot_stocks, len(keys))),
+    )
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -34,6 +35,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,10 +65,89 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'consumer_supply.wsgi.application'
 
-DATABASES = {
+# База данных выбирается переменными окружения.
+#
+# DB_ENGINE=sqlite (по умолчанию): WAL, busy_timeout, synchronous=NORMAL и
+# увеличенный кэш страниц задаются init_command при каждом подключении;
+# транзакции открываются как IMMEDIATE, чтобы писатели ждали блокировку,
+# а не получали "database is locked" при повышении блокировки.
+# DB_SQLITE_TUNING=0 отключает эти настройки (для сравнения в бенчмарках).
+#
+# DB_ENGINE=postgres: постоянные соединения (DB_CONN_MAX_AGE) с проверкой
+# перед использованием либо, при DB_POOL=1, встроенный пул psycopg из
+# Django 5.1 (требует psycopg[pool]; с пулом CONN_MAX_AGE должен быть 0).
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'consumer_supply'),
+            'USER': os.environ.get('DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if os.environ.get('DB_POOL', '0') == '1':
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '20')),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            # Файловая тестовая база: в общей in-memory базе SQLite параллельные
+            # соединения получают "database table is locked" вместо ожидания
+            'TEST': {
+                'NAME': BASE_DIR / 'test_db.sqlite3',
+            },
+        }
+    }
+    if os.environ.get('DB_SQLITE_TUNING', '1') == '1':
+        DATABASES['default']['OPTIONS'] = {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA busy_timeout=20000;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA cache_size=-65536;'
+                'PRAGMA temp_store=MEMORY'
+            ),
+        }
+
+# Кэш Django выбирается переменной CACHE_BACKEND. Версии справочников
+# (api.cache) и доступные количества (api.availability) хранятся в нём и
+# должны быть общими для всех процессов: при нескольких воркерах нужен
+# redis, memcached или database. locmem (по умолчанию) — кэш одного
+# процесса для разработки и тестов; проверка api.W001 предупреждает, если
+# он выбран вместе с PostgreSQL.
+#
+# CACHE_LOCATION: адрес сервера (redis://..., host:port) или имя таблицы
+# для database (создаётся командой createcachetable).
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'consumer-supply'),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/0'),
+    'memcached': ('django.core.cache.backends.memcached.PyMemcacheCache', '127.0.0.1:11211'),
+    'database': ('django.core.cache.backends.db.DatabaseCache', 'api_cache'),
+}
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.environ.get('CACHE_LOCATION', CACHE_BACKENDS[CACHE_BACKEND][1]),
+        'OPTIONS': {
+            # Записей справочников не меньше, чем товаров и складов в одной странице списка
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '50000')),
+        } if CACHE_BACKEND in ('locmem', 'database') else {},
     }
 }
 
@@ -85,6 +166,40 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Хэширование паролей (api/hashers.py). Новые хэши вычисляются алгоритмом
+# профиля PASSWORD_HASHER_PROFILE (scrypt, argon2 — нужен argon2-cffi — или
+# pbkdf2); хэши остальных алгоритмов списка проверяются и пересчитываются
+# при входе. Параметры scrypt по умолчанию — Django (N=2^14, r=8, p=5);
+# PASSWORD_SCRYPT_PARALLELISM=1 уменьшает стоимость входа примерно в 5 раз.
+PASSWORD_HASHER_PROFILES = {
+    'scrypt': 'api.hashers.TunableScryptPasswordHasher',
+    'argon2': 'api.hashers.TunableArgon2PasswordHasher',
+    'pbkdf2': 'api.hashers.TunablePBKDF2PasswordHasher',
+}
+PASSWORD_HASHER_PROFILE = os.environ.get('PASSWORD_HASHER_PROFILE', 'scrypt')
+PASSWORD_HASHERS = [PASSWORD_HASHER_PROFILES[PASSWORD_HASHER_PROFILE]] + [
+    hasher for profile, hasher in PASSWORD_HASHER_PROFILES.items() if profile != PASSWORD_HASHER_PROFILE
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+PASSWORD_HASHER_OPTIONS = {
+    'scrypt': {
+        'work_factor': int(os.environ.get('PASSWORD_SCRYPT_WORK_FACTOR', 2 ** 14)),
+        'parallelism': int(os.environ.get('PASSWORD_SCRYPT_PARALLELISM', 5)),
+    },
+    'argon2': {},
+    'pbkdf2': {},
+}
+# Пул потоков для хэширования: не больше WORKERS хэшей одновременно, до
+# QUEUE ожидающих; вход, не попавший в очередь за TIMEOUT секунд, получает 503.
+# Словари настроек ниже задают только ключи, отличные от значений по
+# умолчанию (DEFAULTS модуля); остальные берутся из DEFAULTS
+PASSWORD_HASHING = {
+    'WORKERS': int(os.environ.get('PASSWORD_HASHING_WORKERS', max(1, (os.cpu_count() or 2) // 2))),
+}
+
+AUTHENTICATION_BACKENDS = ['api.backends.PooledModelBackend']
+
 LANGUAGE_CODE = 'en-us'
 
 TIME_ZONE = 'UTC'
@@ -112,9 +227,90 @@ AUTH_USER_MODEL = 'api.User'
 REST_FRAMEWORK = {
     'EXCEPTION_HANDLER': 'api.exceptions.custom_exception_handler',
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
+    # JSON через orjson, если он установлен (pip install orjson); без него
+    # классы работают как стандартные JSONRenderer и JSONParser
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
+
+# Верхняя граница параметра ?page_size= для списков
+API_MAX_PAGE_SIZE = 1000
+
+# Максимальное число позиций в одном запросе /api/stock-movements/batch/
+STOCK_MOVEMENTS_BATCH_MAX = 1000
+
+# Кэш разрешения токенов для api.authentication.CachedTokenAuthentication
+# (API_TOKEN_CACHE, по умолчанию api.authentication.DEFAULTS). BACKEND:
+# 'local' — LRU в памяти процесса, 'django' — кэш CACHE_ALIAS, общий для
+# всех воркеров. TTL в секундах ограничивает устаревание записи в
+# процессах, которые не получили сигнал об изменении пользователя.
+
+# Время жизни записей кэша товаров и складов (api.cache), в секундах.
+# Изменения инвалидируют кэш сразу через смену версии, таймаут лишь
+# вытесняет записи старых версий.
+API_CATALOG_CACHE_TIMEOUT = 300
+
+# Объединение записей в горячие строки Stock (api.coalescing). При ENABLED
+# одновременные поставки и списания одной пары (склад, товар) в процессе
+# собираются в течение WINDOW_MS и применяются одним суммарным UPDATE;
+# пакет сбрасывается раньше, если набралось MAX_BATCH операций (по
+# умолчанию api.coalescing.DEFAULTS). Включается переменной окружения
+# STOCK_WRITE_COALESCING=1.
+STOCK_WRITE_COALESCING = {
+    'ENABLED': os.environ.get('STOCK_WRITE_COALESCING', '0') == '1',
+    'WINDOW_MS': float(os.environ.get('STOCK_WRITE_COALESCING_WINDOW_MS', '2')),
+}
+
+# Верхняя граница числа полос счётчика остатка (api.striping)
+STOCK_MAX_STRIPES = 64
+
+# Порог /api/stocks/low/ по умолчанию
+STOCK_LOW_THRESHOLD = 10
+
+# Время хранения ответов по заголовку Idempotency-Key (api.idempotency), в секундах
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
+# Метрики запросов (/api/metrics/) и выборочное профилирование медленных запросов
+API_METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+API_PROFILE_SAMPLE_RATE = float(os.environ.get('API_PROFILE_SAMPLE_RATE', 0))
+API_PROFILE_THRESHOLD_MS = 500
+API_PROFILE_DIR = BASE_DIR / 'profiles'
+
+# Импорт товаров и остатков (api.importing): строк в одной транзакции и
+# максимум ошибок строк в отчёте
+INVENTORY_IMPORT_CHUNK_SIZE = 1000
+INVENTORY_IMPORT_MAX_REPORTED_ERRORS = 1000
+
+# Кэш доступности остатков (api.availability): время жизни записи в секундах
+# и максимум пар в одном запросе /api/stocks/availability/?items=
+STOCK_AVAILABILITY_CACHE_TIMEOUT = 300
+STOCK_AVAILABILITY_MAX_KEYS = 100
+
+# Резервы остатков (api.reservations): срок по умолчанию и наибольший срок,
+# который можно запросить параметром ttl, в секундах
+STOCK_RESERVATION_TTL = 15 * 60
+STOCK_RESERVATION_MAX_TTL = 24 * 60 * 60
+
+# Лента изменений остатков /api/stocks/stream/ (STOCK_CHANGEFEED, по
+# умолчанию api.changefeed.DEFAULTS): буфер подписчика в событиях (BUFFER),
+# интервал keepalive (HEARTBEAT) и длительность соединения (MAX_DURATION) в
+# секундах, наибольшее число записей журнала при возобновлении (CATCHUP_LIMIT)
+
+# Дельта-синхронизация /api/stocks/changes/ (STOCK_SYNC, по умолчанию
+# api.delta.DEFAULTS): записей журнала в одном ответе (LIMIT), отставание
+# водяного знака от текущего момента (SETTLE_SECONDS) и срок хранения
+# отметок об удалении (TOMBSTONE_TTL) в секундах